@@ -14,6 +14,8 @@ from app.database import Base
 from app.models.user import User  # noqa: F401
 from app.models.api_key import ApiKey  # noqa: F401
 from app.models.request_log import RequestLog  # noqa: F401
+from app.models.request_rollup import RequestRollupDaily, RequestRollupHourly  # noqa: F401
+from app.models.upstream_key import UpstreamKey  # noqa: F401
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.database_url)
@@ -0,0 +1,26 @@
+"""Prompt-cache token counts on request_logs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('request_logs', sa.Column('cache_creation_input_tokens', sa.Integer, nullable=False, server_default='0'))
+    op.add_column('request_logs', sa.Column('cache_read_input_tokens', sa.Integer, nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'cache_read_input_tokens')
+    op.drop_column('request_logs', 'cache_creation_input_tokens')
@@ -0,0 +1,28 @@
+"""Per-key response cache settings and cache status on request_logs
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('api_keys', sa.Column('response_cache_enabled', sa.Boolean, nullable=False, server_default=sa.false()))
+    op.add_column('api_keys', sa.Column('response_cache_ttl_seconds', sa.Integer))
+    op.add_column('request_logs', sa.Column('cache_status', sa.String(16)))
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'cache_status')
+    op.drop_column('api_keys', 'response_cache_ttl_seconds')
+    op.drop_column('api_keys', 'response_cache_enabled')
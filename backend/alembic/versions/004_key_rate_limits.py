@@ -0,0 +1,28 @@
+"""Per-key rate limits on api_keys
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('api_keys', sa.Column('rpm_limit', sa.Integer))
+    op.add_column('api_keys', sa.Column('tpm_limit', sa.Integer))
+    op.add_column('api_keys', sa.Column('max_concurrency', sa.Integer))
+
+
+def downgrade() -> None:
+    op.drop_column('api_keys', 'max_concurrency')
+    op.drop_column('api_keys', 'tpm_limit')
+    op.drop_column('api_keys', 'rpm_limit')
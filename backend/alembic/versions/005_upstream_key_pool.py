@@ -0,0 +1,42 @@
+"""Pooled upstream keys per proxy key
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'upstream_keys',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('api_key_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('api_keys.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('label', sa.String(100)),
+        sa.Column('key_hint', sa.String(20), nullable=False),
+        sa.Column('anthropic_key_encrypted', sa.String(500), nullable=False),
+        sa.Column('enabled', sa.Boolean, nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_upstream_keys_api_key_id', 'upstream_keys', ['api_key_id'])
+
+    op.add_column(
+        'request_logs',
+        sa.Column('upstream_key_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('upstream_keys.id', ondelete='SET NULL')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'upstream_key_id')
+    op.drop_index('ix_upstream_keys_api_key_id', 'upstream_keys')
+    op.drop_table('upstream_keys')
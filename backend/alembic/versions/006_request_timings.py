@@ -0,0 +1,32 @@
+"""Per-request upstream and proxy timings on request_logs
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('request_logs', sa.Column('upstream_ttfb_ms', sa.Integer))
+    op.add_column('request_logs', sa.Column('ttft_ms', sa.Integer))
+    op.add_column('request_logs', sa.Column('stream_duration_ms', sa.Integer))
+    op.add_column('request_logs', sa.Column('output_tokens_per_sec', sa.Float))
+    op.add_column('request_logs', sa.Column('proxy_overhead_ms', sa.Float))
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'proxy_overhead_ms')
+    op.drop_column('request_logs', 'output_tokens_per_sec')
+    op.drop_column('request_logs', 'stream_duration_ms')
+    op.drop_column('request_logs', 'ttft_ms')
+    op.drop_column('request_logs', 'upstream_ttfb_ms')
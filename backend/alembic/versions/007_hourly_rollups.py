@@ -0,0 +1,57 @@
+"""Hourly request rollups, backfilled from request_logs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_rollups_hourly',
+        sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+        sa.Column('api_key_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('api_keys.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('model', sa.String(100), primary_key=True),
+        sa.Column('request_count', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('output_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_creation_input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_read_input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(18, 6), nullable=False, server_default='0'),
+        sa.Column('latency_ms_sum', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_hits', sa.BigInteger, nullable=False, server_default='0'),
+    )
+    op.create_index('ix_request_rollups_hourly_key_bucket', 'request_rollups_hourly', ['api_key_id', 'bucket'])
+
+    op.execute("""
+        INSERT INTO request_rollups_hourly
+        SELECT date_bin('1 hour', created_at, TIMESTAMPTZ '2000-01-01 00:00:00+00'),
+               api_key_id,
+               model,
+               count(*),
+               sum(input_tokens),
+               sum(output_tokens),
+               sum(cache_creation_input_tokens),
+               sum(cache_read_input_tokens),
+               sum(cost_usd),
+               sum(latency_ms),
+               count(*) FILTER (WHERE cache_status = 'hit')
+        FROM request_logs
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_rollups_hourly_key_bucket', 'request_rollups_hourly')
+    op.drop_table('request_rollups_hourly')
@@ -0,0 +1,89 @@
+"""Range-partition request_logs by month on created_at
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+Rewrites request_logs into a partitioned table with one partition per
+calendar month (UTC), named request_logs_pYYYY_MM, covering the existing
+data through three months ahead. Later partitions are created by the app
+(app/services/partitions.py). The copy runs in the migration transaction;
+on large installs run it in a maintenance window.
+
+The primary key becomes (id, created_at): a partitioned table's unique
+constraints must include the partition key.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_CREATE_MONTHLY_PARTITIONS = """
+DO $$
+DECLARE
+    lower_bound timestamptz := date_trunc(
+        'month', coalesce((SELECT min(created_at) FROM {source}), now()) AT TIME ZONE 'UTC'
+    ) AT TIME ZONE 'UTC';
+    final_bound timestamptz := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '3 months';
+BEGIN
+    WHILE lower_bound <= final_bound LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF {parent} FOR VALUES FROM (%L) TO (%L)',
+            'request_logs_p' || to_char(lower_bound AT TIME ZONE 'UTC', 'YYYY_MM'),
+            lower_bound,
+            lower_bound + interval '1 month'
+        );
+        lower_bound := lower_bound + interval '1 month';
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.execute("UPDATE request_logs SET created_at = now() WHERE created_at IS NULL")
+    op.execute(
+        "CREATE TABLE request_logs_partitioned (LIKE request_logs INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE request_logs_partitioned ALTER COLUMN created_at SET NOT NULL")
+    op.execute(_CREATE_MONTHLY_PARTITIONS.format(source='request_logs', parent='request_logs_partitioned'))
+
+    # Copy before creating indexes; bulk loading unindexed partitions is much faster
+    op.execute("INSERT INTO request_logs_partitioned SELECT * FROM request_logs")
+    op.execute("DROP TABLE request_logs")
+    op.execute("ALTER TABLE request_logs_partitioned RENAME TO request_logs")
+
+    op.execute("ALTER TABLE request_logs ADD CONSTRAINT request_logs_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE request_logs ADD CONSTRAINT request_logs_api_key_id_fkey "
+        "FOREIGN KEY (api_key_id) REFERENCES api_keys (id)"
+    )
+    op.execute(
+        "ALTER TABLE request_logs ADD CONSTRAINT request_logs_upstream_key_id_fkey "
+        "FOREIGN KEY (upstream_key_id) REFERENCES upstream_keys (id) ON DELETE SET NULL"
+    )
+    op.create_index('ix_request_logs_key_created', 'request_logs', ['api_key_id', 'created_at'])
+    op.create_index('ix_request_logs_model_created', 'request_logs', ['model', 'created_at'])
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE request_logs_plain (LIKE request_logs INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO request_logs_plain SELECT * FROM request_logs")
+    op.execute("DROP TABLE request_logs")  # drops every partition with it
+    op.execute("ALTER TABLE request_logs_plain RENAME TO request_logs")
+
+    op.execute("ALTER TABLE request_logs ADD CONSTRAINT request_logs_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE request_logs ADD CONSTRAINT request_logs_api_key_id_fkey "
+        "FOREIGN KEY (api_key_id) REFERENCES api_keys (id)"
+    )
+    op.execute(
+        "ALTER TABLE request_logs ADD CONSTRAINT request_logs_upstream_key_id_fkey "
+        "FOREIGN KEY (upstream_key_id) REFERENCES upstream_keys (id) ON DELETE SET NULL"
+    )
+    op.create_index('ix_request_logs_key_created', 'request_logs', ['api_key_id', 'created_at'])
+    op.create_index('ix_request_logs_model_created', 'request_logs', ['model', 'created_at'])
@@ -0,0 +1,27 @@
+"""Add id to the request_logs key/created_at index for keyset pagination
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_request_logs_key_created', table_name='request_logs')
+    op.create_index(
+        'ix_request_logs_key_created', 'request_logs', ['api_key_id', 'created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_logs_key_created', table_name='request_logs')
+    op.create_index('ix_request_logs_key_created', 'request_logs', ['api_key_id', 'created_at'])
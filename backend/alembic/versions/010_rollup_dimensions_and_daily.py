@@ -0,0 +1,119 @@
+"""Add status_code and endpoint to request rollups, and daily rollups
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_SUMS = """
+    sum(request_count), sum(input_tokens), sum(output_tokens),
+    sum(cache_creation_input_tokens), sum(cache_read_input_tokens),
+    sum(cost_usd), sum(latency_ms_sum), sum(cache_hits)
+"""
+
+
+def _rollup_columns():
+    return [
+        sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+        sa.Column('api_key_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('api_keys.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('model', sa.String(100), primary_key=True),
+        sa.Column('status_code', sa.Integer, primary_key=True),
+        sa.Column('endpoint', sa.String(100), primary_key=True),
+        sa.Column('request_count', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('output_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_creation_input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_read_input_tokens', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(18, 6), nullable=False, server_default='0'),
+        sa.Column('latency_ms_sum', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('cache_hits', sa.BigInteger, nullable=False, server_default='0'),
+    ]
+
+
+def upgrade() -> None:
+    # Hours still covered by raw rows are re-aggregated with the new
+    # dimensions; older hours (past log retention) keep their totals
+    # under status_code 0 and endpoint ''.
+    op.add_column('request_rollups_hourly', sa.Column('status_code', sa.Integer, nullable=False, server_default='0'))
+    op.add_column('request_rollups_hourly', sa.Column('endpoint', sa.String(100), nullable=False, server_default=''))
+    op.drop_constraint('request_rollups_hourly_pkey', 'request_rollups_hourly', type_='primary')
+    op.execute("""
+        DELETE FROM request_rollups_hourly
+        WHERE bucket >= (
+            SELECT date_bin('1 hour', min(created_at), TIMESTAMPTZ '2000-01-01 00:00:00+00')
+            FROM request_logs
+        )
+    """)
+    op.execute("""
+        INSERT INTO request_rollups_hourly (
+            bucket, api_key_id, model, request_count, input_tokens, output_tokens,
+            cache_creation_input_tokens, cache_read_input_tokens, cost_usd,
+            latency_ms_sum, cache_hits, status_code, endpoint
+        )
+        SELECT date_bin('1 hour', created_at, TIMESTAMPTZ '2000-01-01 00:00:00+00'),
+               api_key_id,
+               model,
+               count(*),
+               sum(input_tokens),
+               sum(output_tokens),
+               sum(cache_creation_input_tokens),
+               sum(cache_read_input_tokens),
+               sum(cost_usd),
+               sum(latency_ms),
+               count(*) FILTER (WHERE cache_status = 'hit'),
+               status_code,
+               endpoint
+        FROM request_logs
+        GROUP BY 1, 2, 3, status_code, endpoint
+    """)
+    op.create_primary_key(
+        'request_rollups_hourly_pkey', 'request_rollups_hourly',
+        ['bucket', 'api_key_id', 'model', 'status_code', 'endpoint'],
+    )
+    op.alter_column('request_rollups_hourly', 'status_code', server_default=None)
+    op.alter_column('request_rollups_hourly', 'endpoint', server_default=None)
+
+    op.create_table('request_rollups_daily', *_rollup_columns())
+    op.create_index('ix_request_rollups_daily_key_bucket', 'request_rollups_daily', ['api_key_id', 'bucket'])
+    op.execute(f"""
+        INSERT INTO request_rollups_daily (
+            bucket, api_key_id, model, status_code, endpoint, request_count,
+            input_tokens, output_tokens, cache_creation_input_tokens,
+            cache_read_input_tokens, cost_usd, latency_ms_sum, cache_hits
+        )
+        SELECT date_bin('1 day', bucket, TIMESTAMPTZ '2000-01-01 00:00:00+00'),
+               api_key_id, model, status_code, endpoint, {_SUMS}
+        FROM request_rollups_hourly
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_rollups_daily_key_bucket', 'request_rollups_daily')
+    op.drop_table('request_rollups_daily')
+
+    op.execute(f"""
+        CREATE TEMPORARY TABLE request_rollups_hourly_collapsed ON COMMIT DROP AS
+        SELECT bucket, api_key_id, model, {_SUMS}
+        FROM request_rollups_hourly
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("DELETE FROM request_rollups_hourly")
+    op.drop_constraint('request_rollups_hourly_pkey', 'request_rollups_hourly', type_='primary')
+    op.drop_column('request_rollups_hourly', 'endpoint')
+    op.drop_column('request_rollups_hourly', 'status_code')
+    op.execute("INSERT INTO request_rollups_hourly SELECT * FROM request_rollups_hourly_collapsed")
+    op.create_primary_key(
+        'request_rollups_hourly_pkey', 'request_rollups_hourly', ['bucket', 'api_key_id', 'model']
+    )
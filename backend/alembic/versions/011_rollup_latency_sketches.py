@@ -0,0 +1,107 @@
+"""Latency and TTFT quantile sketches on request rollups
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+"""
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the bin mapping in app/services/sketch.py at this revision
+_LOG_GAMMA = math.log(1.02 / 0.98)
+_MAX_INDEX = math.ceil(math.log(3_600_000) / _LOG_GAMMA)
+
+_TABLES = ('request_rollups_hourly', 'request_rollups_daily')
+_DIMENSIONS = "bucket, api_key_id, model, status_code, endpoint"
+
+
+def _bin(column: str) -> str:
+    return f"least(ceil(ln(greatest({column}::float8, 1)) / {_LOG_GAMMA!r}), {_MAX_INDEX})::int"
+
+
+def _backfill_hourly(sketch: str, column: str) -> None:
+    op.execute(f"""
+        UPDATE request_rollups_hourly AS r
+        SET {sketch} = s.sketch
+        FROM (
+            SELECT {_DIMENSIONS}, jsonb_object_agg(bin::text, n) AS sketch
+            FROM (
+                SELECT date_bin('1 hour', created_at, TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket,
+                       api_key_id, model, status_code, endpoint,
+                       {_bin(column)} AS bin,
+                       count(*) AS n
+                FROM request_logs
+                WHERE {column} IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5, 6
+            ) AS bins
+            GROUP BY {_DIMENSIONS}
+        ) AS s
+        WHERE (r.bucket, r.api_key_id, r.model, r.status_code, r.endpoint)
+            = (s.bucket, s.api_key_id, s.model, s.status_code, s.endpoint)
+    """)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE FUNCTION sketch_merge(a jsonb, b jsonb) RETURNS jsonb
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT coalesce(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, sum(value::bigint) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(coalesce(a, '{}'::jsonb))
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(coalesce(b, '{}'::jsonb))
+                ) AS bins
+                GROUP BY key
+            ) AS merged
+        $$
+    """)
+    op.execute("""
+        CREATE AGGREGATE sketch_merge_agg(jsonb) (
+            SFUNC = sketch_merge,
+            STYPE = jsonb,
+            INITCOND = '{}'
+        )
+    """)
+
+    for table in _TABLES:
+        op.add_column(table, sa.Column('latency_sketch', postgresql.JSONB, nullable=False, server_default='{}'))
+        op.add_column(table, sa.Column('ttft_sketch', postgresql.JSONB, nullable=False, server_default='{}'))
+
+    # Hours whose raw rows are still around get their sketches; days are
+    # then merged from hours.
+    _backfill_hourly('latency_sketch', 'latency_ms')
+    _backfill_hourly('ttft_sketch', 'ttft_ms')
+    op.execute("""
+        UPDATE request_rollups_daily AS r
+        SET latency_sketch = s.latency_sketch, ttft_sketch = s.ttft_sketch
+        FROM (
+            SELECT date_bin('1 day', bucket, TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket,
+                   api_key_id, model, status_code, endpoint,
+                   sketch_merge_agg(latency_sketch) AS latency_sketch,
+                   sketch_merge_agg(ttft_sketch) AS ttft_sketch
+            FROM request_rollups_hourly
+            GROUP BY 1, 2, 3, 4, 5
+        ) AS s
+        WHERE (r.bucket, r.api_key_id, r.model, r.status_code, r.endpoint)
+            = (s.bucket, s.api_key_id, s.model, s.status_code, s.endpoint)
+    """)
+
+
+def downgrade() -> None:
+    for table in _TABLES:
+        op.drop_column(table, 'ttft_sketch')
+        op.drop_column(table, 'latency_sketch')
+    op.execute("DROP AGGREGATE sketch_merge_agg(jsonb)")
+    op.execute("DROP FUNCTION sketch_merge(jsonb, jsonb)")
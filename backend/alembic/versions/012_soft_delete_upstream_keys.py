@@ -0,0 +1,35 @@
+"""Soft-delete pooled upstream keys and index request_logs by upstream key
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Deleting a pool key used to NULL its history, which then read as the
+    # proxy key's own key. Pool keys are now soft-deleted instead. The
+    # foreign key keeps ON DELETE SET NULL: the only hard delete left is
+    # that of a whole proxy key, whose request_logs go with it, and SET NULL
+    # keeps that delete from depending on the order the rows are flushed in.
+    op.add_column('upstream_keys', sa.Column('deleted_at', sa.DateTime(timezone=True)))
+    op.create_index(
+        'ix_request_logs_upstream_key_created', 'request_logs', ['upstream_key_id', 'created_at'],
+        postgresql_where=sa.text('upstream_key_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_logs_upstream_key_created', table_name='request_logs')
+    op.execute("DELETE FROM upstream_keys WHERE deleted_at IS NOT NULL")
+    op.drop_column('upstream_keys', 'deleted_at')
@@ -0,0 +1,114 @@
+"""Upstream TTFB and proxy overhead sketches, stream duration and throughput sums on request rollups
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17
+
+"""
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the bin mapping in app/services/sketch.py at this revision
+_LOG_GAMMA = math.log(1.02 / 0.98)
+_MAX_INDEX = math.ceil(math.log(3_600_000) / _LOG_GAMMA)
+
+_TABLES = ('request_rollups_hourly', 'request_rollups_daily')
+_DIMENSIONS = "bucket, api_key_id, model, status_code, endpoint"
+_SUMS = (
+    'stream_duration_ms_sum', 'stream_duration_count', 'output_tokens_per_sec_sum', 'output_tokens_per_sec_count',
+)
+# Sketch column -> the request_logs value it summarizes (overhead in microseconds)
+_SKETCHES = {
+    'ttfb_sketch': 'upstream_ttfb_ms',
+    'overhead_sketch': 'proxy_overhead_ms * 1000',
+}
+
+
+def _bin(column: str) -> str:
+    return f"least(ceil(ln(greatest(({column})::float8, 1)) / {_LOG_GAMMA!r}), {_MAX_INDEX})::int"
+
+
+def _backfill_hourly_sketch(sketch: str, value: str) -> None:
+    op.execute(f"""
+        UPDATE request_rollups_hourly AS r
+        SET {sketch} = s.sketch
+        FROM (
+            SELECT {_DIMENSIONS}, jsonb_object_agg(bin::text, n) AS sketch
+            FROM (
+                SELECT date_bin('1 hour', created_at, TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket,
+                       api_key_id, model, status_code, endpoint,
+                       {_bin(value)} AS bin,
+                       count(*) AS n
+                FROM request_logs
+                WHERE {value} IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5, 6
+            ) AS bins
+            GROUP BY {_DIMENSIONS}
+        ) AS s
+        WHERE (r.bucket, r.api_key_id, r.model, r.status_code, r.endpoint)
+            = (s.bucket, s.api_key_id, s.model, s.status_code, s.endpoint)
+    """)
+
+
+def upgrade() -> None:
+    for table in _TABLES:
+        op.add_column(table, sa.Column('stream_duration_ms_sum', sa.BigInteger, nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('stream_duration_count', sa.BigInteger, nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('output_tokens_per_sec_sum', sa.Float, nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('output_tokens_per_sec_count', sa.BigInteger, nullable=False, server_default='0'))
+        for sketch in _SKETCHES:
+            op.add_column(table, sa.Column(sketch, postgresql.JSONB, nullable=False, server_default='{}'))
+
+    # Hours whose raw rows are still around get their sums and sketches;
+    # days are then summed and merged from hours.
+    op.execute("""
+        UPDATE request_rollups_hourly AS r
+        SET stream_duration_ms_sum = s.stream_duration_ms_sum,
+            stream_duration_count = s.stream_duration_count,
+            output_tokens_per_sec_sum = s.output_tokens_per_sec_sum,
+            output_tokens_per_sec_count = s.output_tokens_per_sec_count
+        FROM (
+            SELECT date_bin('1 hour', created_at, TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket,
+                   api_key_id, model, status_code, endpoint,
+                   coalesce(sum(stream_duration_ms), 0) AS stream_duration_ms_sum,
+                   count(stream_duration_ms) AS stream_duration_count,
+                   coalesce(sum(output_tokens_per_sec), 0) AS output_tokens_per_sec_sum,
+                   count(output_tokens_per_sec) AS output_tokens_per_sec_count
+            FROM request_logs
+            GROUP BY 1, 2, 3, 4, 5
+        ) AS s
+        WHERE (r.bucket, r.api_key_id, r.model, r.status_code, r.endpoint)
+            = (s.bucket, s.api_key_id, s.model, s.status_code, s.endpoint)
+    """)
+    for sketch, value in _SKETCHES.items():
+        _backfill_hourly_sketch(sketch, value)
+
+    op.execute(f"""
+        UPDATE request_rollups_daily AS r
+        SET {', '.join(f'{name} = s.{name}' for name in (*_SUMS, *_SKETCHES))}
+        FROM (
+            SELECT date_bin('1 day', bucket, TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket,
+                   api_key_id, model, status_code, endpoint,
+                   {', '.join(f'sum({name}) AS {name}' for name in _SUMS)},
+                   {', '.join(f'sketch_merge_agg({name}) AS {name}' for name in _SKETCHES)}
+            FROM request_rollups_hourly
+            GROUP BY 1, 2, 3, 4, 5
+        ) AS s
+        WHERE (r.bucket, r.api_key_id, r.model, r.status_code, r.endpoint)
+            = (s.bucket, s.api_key_id, s.model, s.status_code, s.endpoint)
+    """)
+
+
+def downgrade() -> None:
+    for table in _TABLES:
+        for name in (*_SKETCHES, *reversed(_SUMS)):
+            op.drop_column(table, name)
@@ -0,0 +1,35 @@
+"""DEFAULT partition for request_logs
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Catches rows for months whose partition does not exist (maintenance
+    # fell behind, or a replayed row older than retention), which would
+    # otherwise fail the whole insert. app/services/partitions.py moves them
+    # into monthly partitions on its next run.
+    op.execute("CREATE TABLE request_logs_default PARTITION OF request_logs DEFAULT")
+
+
+def downgrade() -> None:
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM request_logs_default) THEN
+                RAISE EXCEPTION 'request_logs_default still holds rows; run partition maintenance first';
+            END IF;
+        END $$
+    """)
+    op.execute("DROP TABLE request_logs_default")
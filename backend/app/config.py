@@ -7,9 +7,99 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expiry_hours: int = 24
     encryption_key: str = "change-me-32-byte-key-in-prod!!"  # Must be 32 bytes for AES-256
+    # Retired encryption keys, newest first. Still accepted for decryption so
+    # CUA_ENCRYPTION_KEY can be rotated; run rotate_encryption.py to re-encrypt.
+    previous_encryption_keys: list[str] = []
     cors_origins: list[str] = ["http://localhost:3000", "http://localhost:5173"]
 
-    # Pricing per 1M tokens (USD) — updated for current Claude models
+    # Upstream (Anthropic) HTTP client — one pooled client shared by all requests
+    anthropic_base_url: str = "https://api.anthropic.com"
+    upstream_http2: bool = True
+    upstream_max_connections: int = 200
+    upstream_max_keepalive_connections: int = 50
+    upstream_keepalive_expiry: float = 60.0
+    upstream_connect_timeout: float = 10.0
+    upstream_read_timeout: float = 300.0
+    upstream_write_timeout: float = 60.0
+    upstream_pool_timeout: float = 30.0
+
+    # Upstream retries (429/529/5xx) and per-upstream-key circuit breaking
+    upstream_max_retries: int = 2
+    upstream_retry_base_delay: float = 0.5
+    upstream_retry_max_delay: float = 8.0
+    upstream_retry_budget_ratio: float = 0.2
+    upstream_retry_budget_min_per_second: float = 1.0
+    breaker_failure_threshold: int = 5
+    breaker_cooldown_seconds: float = 30.0
+    # How long a pooled upstream key sits out after a 429 without retry-after
+    upstream_key_ejection_seconds: float = 30.0
+
+    # Forward /v1/messages request bodies upstream as they arrive instead of
+    # buffering them; "model"/"stream" are found by an incremental scan.
+    proxy_stream_request_body: bool = False
+
+    # Share one upstream call between concurrent identical deterministic
+    # (temperature 0, non-streaming) requests on the same upstream key
+    proxy_coalesce_requests: bool = False
+
+    # Exact-match response cache (only used for keys that opt in)
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_max_bytes: int = 256 * 1024 * 1024
+    response_cache_max_entry_bytes: int = 4 * 1024 * 1024
+    response_cache_dir: str | None = None  # set to enable the on-disk tier
+    response_cache_disk_max_bytes: int = 4 * 1024 * 1024 * 1024
+
+    # Proxy key authentication cache (per process)
+    proxy_key_cache_size: int = 10_000
+    proxy_key_cache_ttl_seconds: float = 60.0
+
+    # Analytics result cache (per process). Invalidated by this worker's log
+    # writer and by live notifications from the others; the TTL bounds
+    # staleness when live notifications are off.
+    analytics_cache_ttl_seconds: float = 30.0
+    analytics_cache_max_entries: int = 10_000
+    analytics_cache_max_bytes: int = 64 * 1024 * 1024
+
+    # Live dashboard updates over SSE (/analytics/live). Log flushes NOTIFY
+    # per-user deltas; every worker LISTENs and fans them out to its streams.
+    analytics_live_notify: bool = True
+    analytics_live_snapshot_interval_seconds: float = 60.0
+    analytics_live_queue_size: int = 100
+    analytics_live_keepalive_seconds: float = 15.0
+
+    # Batched request-log writer
+    log_queue_size: int = 50_000
+    log_batch_size: int = 500
+    log_flush_interval_seconds: float = 1.0
+    log_db_timeout_seconds: float = 10.0
+    log_retry_interval_seconds: float = 5.0
+    # Durable on-disk spool for request logs; set a directory to enable.
+    # Rows are spooled first and loaded into Postgres from there, so billing
+    # data survives database outages and restarts.
+    log_spool_dir: str | None = None
+    log_spool_segment_bytes: int = 16 * 1024 * 1024
+    log_spool_max_bytes: int = 1024 * 1024 * 1024
+    log_spool_fsync: bool = True
+    # request_logs is partitioned by month: partitions are created this many
+    # months ahead, and with a retention set, whole months older than that are
+    # dropped (the rollups keep their history).
+    log_partition_months_ahead: int = 3
+    log_retention_months: int | None = None
+    log_partition_check_interval_seconds: float = 6 * 3600
+
+    # Raw request log exports (/analytics/export, export_logs.py): rows per
+    # server-side cursor fetch, and rows per Parquet row group.
+    export_batch_rows: int = 10_000
+    export_parquet_row_group_rows: int = 100_000
+
+    # Prometheus metrics. With several uvicorn workers, point metrics_dir at a
+    # directory shared by them (cleared on restart) so /metrics covers all workers.
+    metrics_dir: str | None = None
+    metrics_snapshot_interval_seconds: float = 5.0
+
+    # Pricing per 1M tokens (USD) — updated for current Claude models.
+    # Optional per-model "cache_write"/"cache_read" prices default to 1.25x and
+    # 0.1x the input price (see app/services/pricing.py).
     pricing: dict[str, dict[str, float]] = {
         "claude-opus-4-6": {"input": 15.0, "output": 75.0},
         "claude-sonnet-4-6": {"input": 3.0, "output": 15.0},
@@ -20,6 +110,9 @@ class Settings(BaseSettings):
         "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.0},
         "claude-3-opus-20240229": {"input": 15.0, "output": 75.0},
     }
+    # Later price changes: [{"effective_from": "2026-06-01T00:00:00Z", "pricing": {model: {...}}}].
+    # Each version overrides the listed models from that instant on.
+    pricing_versions: list[dict] = []
 
     model_config = {"env_prefix": "CUA_"}
 
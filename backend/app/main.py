@@ -1,13 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
+from app.middleware.proxy_auth import key_cache_stats
 from app.routers import analytics, auth, keys, proxy
+from app.services import metrics, partitions, resilience, upstream
+from app.services.analytics_cache import analytics_cache
+from app.services.key_pool import key_pool
+from app.services.live import live_hub
+from app.services.log_writer import log_writer
+from app.services.rate_limit import rate_limiter
+from app.services.response_cache import response_cache
+from app.services.singleflight import upstream_flights
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream.start()
+    await log_writer.start()
+    await metrics.start()
+    await partitions.start()
+    await live_hub.start()
+    try:
+        yield
+    finally:
+        await live_hub.stop()
+        await partitions.stop()
+        await log_writer.stop()
+        await upstream.close()
+        await metrics.stop()
+
 
 app = FastAPI(
     title="Claude Usage Analytics",
     description="FinOps for AI — track Claude API usage, cost, and ROI",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,3 +58,28 @@ app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def stats():
+    """
+    Process-local runtime stats for the proxy's in-memory components.
+    Unauthenticated, so it reports totals only, never per-key identifiers.
+    """
+    return {
+        "upstream_pool": upstream.pool_stats(),
+        "proxy_key_cache": key_cache_stats(),
+        "log_writer": log_writer.stats(),
+        "response_cache": response_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "analytics_live": live_hub.stats(),
+        "coalescing": upstream_flights.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "upstream_resilience": resilience.stats(),
+        "upstream_key_pool": key_pool.stats(),
+    }
@@ -1,30 +1,120 @@
 import hashlib
+import uuid
+from dataclasses import dataclass
 
 from fastapi import HTTPException, Request
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
+from app.config import settings
 from app.database import async_session
 from app.models.api_key import ApiKey
+from app.services.cache import TTLCache
 from app.services.encryption import decrypt_value
+from app.services.key_pool import UpstreamCredential
 
 
-async def authenticate_proxy_key(request: Request) -> tuple[ApiKey, str]:
+@dataclass(frozen=True, slots=True)
+class ProxyKey:
+    """Detached snapshot of the ApiKey columns the proxy needs per request."""
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    key_prefix: str
+    label: str | None
+    response_cache_enabled: bool
+    response_cache_ttl_seconds: int | None
+    rpm_limit: int | None
+    tpm_limit: int | None
+    max_concurrency: int | None
+
+    @classmethod
+    def from_model(cls, api_key: ApiKey) -> "ProxyKey":
+        return cls(
+            id=api_key.id,
+            user_id=api_key.user_id,
+            key_prefix=api_key.key_prefix,
+            label=api_key.label,
+            response_cache_enabled=api_key.response_cache_enabled,
+            response_cache_ttl_seconds=api_key.response_cache_ttl_seconds,
+            rpm_limit=api_key.rpm_limit,
+            tpm_limit=api_key.tpm_limit,
+            max_concurrency=api_key.max_concurrency,
+        )
+
+
+# key_hash -> (ProxyKey, upstream credentials)
+_key_cache = TTLCache(
+    max_entries=settings.proxy_key_cache_size,
+    ttl_seconds=settings.proxy_key_cache_ttl_seconds,
+)
+# Bumped by every invalidation. A lookup only caches its result if no
+# invalidation happened while it was reading, so one that started before a
+# revoke cannot put the revoked key back.
+_generation = 0
+
+
+def hash_proxy_key(proxy_key: str) -> str:
+    return hashlib.sha256(proxy_key.encode()).hexdigest()
+
+
+def invalidate_proxy_key(key_hash: str) -> None:
+    """
+    Drop a cached key so revocation takes effect immediately in this process.
+    Other workers hear of it through live.key_changed(); if that notification
+    is lost, proxy_key_cache_ttl_seconds bounds how long they keep the key.
+    """
+    global _generation
+    _generation += 1
+    _key_cache.invalidate(key_hash)
+
+
+def invalidate_all_proxy_keys() -> None:
+    """Drop every cached key, e.g. after invalidations may have been missed."""
+    global _generation
+    _generation += 1
+    _key_cache.clear()
+
+
+def key_cache_stats() -> dict:
+    return _key_cache.stats()
+
+
+async def authenticate_proxy_key(request: Request) -> tuple[ProxyKey, tuple[UpstreamCredential, ...]]:
     """
     Validate the proxy API key from the x-api-key header.
-    Returns the ApiKey model and the decrypted Anthropic API key.
+    Returns the ProxyKey snapshot and its decrypted upstream credentials:
+    the key's own Anthropic key first, then any enabled pooled keys.
+
+    Successful lookups are cached by key hash, so in steady state the proxy
+    does not touch Postgres or decrypt anything to authenticate a request.
     """
     proxy_key = request.headers.get("x-api-key")
     if not proxy_key:
         raise HTTPException(status_code=401, detail="Missing x-api-key header")
 
-    key_hash = hashlib.sha256(proxy_key.encode()).hexdigest()
+    key_hash = hash_proxy_key(proxy_key)
+
+    cached = _key_cache.get(key_hash)
+    if cached is not None:
+        return cached
 
+    generation = _generation
     async with async_session() as db:
-        result = await db.execute(select(ApiKey).where(ApiKey.key_hash == key_hash))
+        result = await db.execute(
+            select(ApiKey).where(ApiKey.key_hash == key_hash).options(selectinload(ApiKey.upstream_keys))
+        )
         api_key = result.scalar_one_or_none()
 
     if not api_key:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
-    anthropic_key = decrypt_value(api_key.anthropic_key_encrypted)
-    return api_key, anthropic_key
+    credentials = (UpstreamCredential.create(None, decrypt_value(api_key.anthropic_key_encrypted)),) + tuple(
+        UpstreamCredential.create(upstream_key.id, decrypt_value(upstream_key.anthropic_key_encrypted))
+        for upstream_key in api_key.upstream_keys
+        if upstream_key.enabled
+    )
+    entry = (ProxyKey.from_model(api_key), credentials)
+    if generation == _generation:
+        _key_cache.set(key_hash, entry)
+    return entry
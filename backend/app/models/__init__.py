@@ -0,0 +1,13 @@
+"""
+ORM models. Importing the package registers every model, so relationships
+declared by name (ApiKey.upstream_keys, ...) resolve whichever model a
+module happens to import first.
+"""
+
+from app.models.api_key import ApiKey
+from app.models.request_log import RequestLog
+from app.models.request_rollup import RequestRollupDaily, RequestRollupHourly
+from app.models.upstream_key import UpstreamKey
+from app.models.user import User
+
+__all__ = ["ApiKey", "RequestLog", "RequestRollupDaily", "RequestRollupHourly", "UpstreamKey", "User"]
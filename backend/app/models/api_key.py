@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, String, func
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, func, false
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -17,7 +17,16 @@ class ApiKey(Base):
     key_prefix: Mapped[str] = mapped_column(String(12), nullable=False)
     label: Mapped[str | None] = mapped_column(String(100))
     anthropic_key_encrypted: Mapped[str] = mapped_column(String(500), nullable=False)
+    response_cache_enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
+    response_cache_ttl_seconds: Mapped[int | None] = mapped_column(Integer)
+    # Proxy admission limits; NULL means unlimited
+    rpm_limit: Mapped[int | None] = mapped_column(Integer)
+    tpm_limit: Mapped[int | None] = mapped_column(Integer)
+    max_concurrency: Mapped[int | None] = mapped_column(Integer)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="api_keys")
     request_logs = relationship("RequestLog", back_populates="api_key", cascade="all, delete-orphan")
+    upstream_keys = relationship(
+        "UpstreamKey", back_populates="api_key", cascade="all, delete-orphan", order_by="UpstreamKey.created_at"
+    )
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import DateTime, ForeignKey, Index, Integer, Numeric, String, func
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, Numeric, String, func, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -17,16 +17,39 @@ class RequestLog(Base):
     model: Mapped[str] = mapped_column(String(100), nullable=False)
     input_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     output_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cache_creation_input_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     cost_usd: Mapped[Decimal] = mapped_column(Numeric(12, 6), nullable=False, default=0)
     status_code: Mapped[int] = mapped_column(Integer, nullable=False)
     latency_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Timings on a monotonic clock. NULL when not applicable: no upstream call
+    # (cache hits), or stream-only fields on non-streaming requests.
+    upstream_ttfb_ms: Mapped[int | None] = mapped_column(Integer)  # first send -> response headers, incl. retries
+    ttft_ms: Mapped[int | None] = mapped_column(Integer)  # proxy request start -> first content_block_delta
+    stream_duration_ms: Mapped[int | None] = mapped_column(Integer)  # response headers -> end of stream
+    output_tokens_per_sec: Mapped[float | None] = mapped_column(Float)  # output tokens / (first token -> end)
+    proxy_overhead_ms: Mapped[float | None] = mapped_column(Float)  # latency not spent waiting on Anthropic
     endpoint: Mapped[str] = mapped_column(String(100), nullable=False, default="/v1/messages")
+    # Pooled upstream key that served the call; NULL means the proxy key's own
+    # Anthropic key. Pool keys are soft-deleted, so this never goes stale; they
+    # are only hard-deleted along with their proxy key and its logs, and SET
+    # NULL keeps that delete independent of flush order.
+    upstream_key_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("upstream_keys.id", ondelete="SET NULL")
+    )
+    cache_status: Mapped[str | None] = mapped_column(String(16))  # "hit" (response cache) or "coalesced"
     metadata_: Mapped[dict | None] = mapped_column("metadata", JSONB)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the monthly range partitions, hence part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
     api_key = relationship("ApiKey", back_populates="request_logs")
 
     __table_args__ = (
-        Index("ix_request_logs_key_created", "api_key_id", "created_at"),
+        Index("ix_request_logs_key_created", "api_key_id", "created_at", "id"),
         Index("ix_request_logs_model_created", "model", "created_at"),
+        Index(
+            "ix_request_logs_upstream_key_created", "upstream_key_id", "created_at",
+            postgresql_where=text("upstream_key_id IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
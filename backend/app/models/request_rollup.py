@@ -0,0 +1,69 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class RequestRollupColumns:
+    """
+    request_logs pre-aggregated per time bucket, key, model, status code and
+    endpoint; maintained by the log writer in the same transaction as the
+    rows it inserts (app/services/rollups.py).
+
+    Rows rolled up before status codes and endpoints were tracked, whose raw
+    rows have since been dropped, carry status_code 0 and endpoint ''.
+
+    latency_sketch, ttft_sketch and ttfb_sketch are mergeable quantile
+    sketches of latency_ms, ttft_ms and upstream_ttfb_ms; overhead_sketch
+    is one of proxy_overhead_ms in microseconds (app/services/sketch.py).
+    The *_count columns count the rows where the summed column is not NULL.
+    """
+
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    api_key_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("api_keys.id", ondelete="CASCADE"), primary_key=True
+    )
+    model: Mapped[str] = mapped_column(String(100), primary_key=True)
+    status_code: Mapped[int] = mapped_column(Integer, primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String(100), primary_key=True)
+    request_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    input_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    output_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cache_creation_input_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cost_usd: Mapped[Decimal] = mapped_column(Numeric(18, 6), nullable=False, default=0)
+    latency_ms_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cache_hits: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    stream_duration_ms_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    stream_duration_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    output_tokens_per_sec_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    output_tokens_per_sec_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    latency_sketch: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    ttft_sketch: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    ttfb_sketch: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    overhead_sketch: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+
+
+class RequestRollupHourly(RequestRollupColumns, Base):
+    """Rollups per UTC hour."""
+
+    __tablename__ = "request_rollups_hourly"
+
+    __table_args__ = (
+        Index("ix_request_rollups_hourly_key_bucket", "api_key_id", "bucket"),
+    )
+
+
+class RequestRollupDaily(RequestRollupColumns, Base):
+    """Rollups per UTC day, for long ranges that would touch too many hourly rows."""
+
+    __tablename__ = "request_rollups_daily"
+
+    __table_args__ = (
+        Index("ix_request_rollups_daily_key_bucket", "api_key_id", "bucket"),
+    )
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, String, func, true
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.database import Base
+
+
+class UpstreamKey(Base):
+    """
+    An extra Anthropic key pooled behind a proxy key, alongside ApiKey.anthropic_key_encrypted.
+
+    Deleting one only sets ``deleted_at`` (and disables it): request_logs
+    keep pointing at the key that served them, since a NULL upstream_key_id
+    means the proxy key's own Anthropic key.
+    """
+
+    __tablename__ = "upstream_keys"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    api_key_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("api_keys.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    label: Mapped[str | None] = mapped_column(String(100))
+    key_hint: Mapped[str] = mapped_column(String(20), nullable=False)
+    anthropic_key_encrypted: Mapped[str] = mapped_column(String(500), nullable=False)
+    enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True, server_default=true())
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    api_key = relationship("ApiKey", back_populates="upstream_keys")
@@ -1,56 +1,296 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+from datetime import datetime, timezone
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.config import settings
+from app.database import async_session, get_db
 from app.models.user import User
-from app.routers.auth import get_current_user
-from app.services import analytics_service
+from app.routers.auth import decode_user_id, get_current_user, get_token_user_id, load_user
+from app.services import analytics_service, export
+from app.services.analytics_cache import analytics_cache
+from app.services.live import live_hub
 
 router = APIRouter()
+optional_bearer = HTTPBearer(auto_error=False)
+
+PERIOD = "^(7d|30d|90d|1y)$"
+GRANULARITY = "^(hour|day|week|month)$"
+
+
+def usage_query(
+    period: str = Query("30d", pattern=PERIOD),
+    start: datetime | None = None,
+    end: datetime | None = None,
+    tz: str = "UTC",
+    key_id: UUID | None = None,
+    model: str | None = None,
+    status_code: int | None = Query(None, ge=100, le=599),
+    endpoint: str | None = None,
+) -> analytics_service.UsageQuery:
+    """
+    Range and filters shared by the aggregate endpoints. ``start``/``end``
+    override ``period``; times without an offset are read in ``tz``, which
+    also sets the day/week/month boundaries of time series.
+    """
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {tz}")
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=zone)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=zone)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return analytics_service.UsageQuery(
+        period=period,
+        start=start,
+        end=end,
+        tz=tz,
+        api_key_id=key_id,
+        model=model,
+        status_code=status_code,
+        endpoint=endpoint,
+    )
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def _cached(request: Request, db: AsyncSession, user_id: UUID, query: tuple, compute) -> Response:
+    """
+    Serve an analytics result from the per-user cache, computing it on a miss.
+    A hit costs no database work at all: the token alone identifies the
+    user, and entries only exist for users that were loaded when computed.
+    """
+    version = analytics_cache.version(user_id)
+    entry = analytics_cache.get(user_id, version, query)
+    if entry is None:
+        await load_user(db, user_id)
+        entry = analytics_cache.put(user_id, version, query, await compute())
+
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 
 @router.get("/summary")
 async def summary(
-    period: str = Query("30d", pattern="^(7d|30d|90d)$"),
-    user: User = Depends(get_current_user),
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    user_id: UUID = Depends(get_token_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    return await analytics_service.get_summary(db, user.id, period)
+    return await _cached(
+        request, db, user_id, ("summary", query),
+        lambda: analytics_service.get_summary(db, user_id, query),
+    )
 
 
 @router.get("/cost-over-time")
 async def cost_over_time(
-    period: str = Query("30d", pattern="^(7d|30d|90d)$"),
-    granularity: str = Query("day", pattern="^(hour|day|week)$"),
-    user: User = Depends(get_current_user),
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    granularity: str = Query("day", pattern=GRANULARITY),
+    user_id: UUID = Depends(get_token_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    return await analytics_service.get_cost_over_time(db, user.id, period, granularity)
+    return await _cached(
+        request, db, user_id, ("cost-over-time", query, granularity),
+        lambda: analytics_service.get_cost_over_time(db, user_id, query, granularity),
+    )
 
 
 @router.get("/by-model")
 async def by_model(
-    period: str = Query("30d", pattern="^(7d|30d|90d)$"),
-    user: User = Depends(get_current_user),
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    user_id: UUID = Depends(get_token_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    return await analytics_service.get_by_model(db, user.id, period)
+    return await _cached(
+        request, db, user_id, ("by-model", query),
+        lambda: analytics_service.get_by_model(db, user_id, query),
+    )
 
 
 @router.get("/by-key")
 async def by_key(
-    period: str = Query("30d", pattern="^(7d|30d|90d)$"),
-    user: User = Depends(get_current_user),
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    user_id: UUID = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    return await _cached(
+        request, db, user_id, ("by-key", query),
+        lambda: analytics_service.get_by_key(db, user_id, query),
+    )
+
+
+@router.get("/dashboard")
+async def dashboard(
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    granularity: str = Query("day", pattern=GRANULARITY),
+    user_id: UUID = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    return await _cached(
+        request, db, user_id, ("dashboard", query, granularity),
+        lambda: analytics_service.get_dashboard(db, user_id, query, granularity),
+    )
+
+
+@router.get("/latency")
+async def latency(
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    group_by: str | None = Query(None, pattern="^(model|key)$"),
+    user_id: UUID = Depends(get_token_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    return await analytics_service.get_by_key(db, user.id, period)
+    return await _cached(
+        request, db, user_id, ("latency", query, group_by),
+        lambda: analytics_service.get_latency(db, user_id, query, group_by),
+    )
+
+
+@router.get("/performance")
+async def performance(
+    request: Request,
+    query: analytics_service.UsageQuery = Depends(usage_query),
+    group_by: str = Query("model", pattern="^(model|key)$"),
+    user_id: UUID = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    return await _cached(
+        request, db, user_id, ("performance", query, group_by),
+        lambda: analytics_service.get_performance(db, user_id, query, group_by),
+    )
+
+
+@router.get("/live")
+async def live(
+    access_token: str | None = None,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+):
+    """
+    Server-sent events: a ``snapshot`` of today's totals per key and model,
+    then ``delta`` events to add to it as requests are logged, with a fresh
+    snapshot every minute. Browsers' EventSource cannot set headers, so the
+    token may also be passed as ``access_token``.
+    """
+    token = credentials.credentials if credentials is not None else access_token
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = decode_user_id(token)
+    # Not get_db: the session would otherwise stay open for the whole stream
+    async with async_session() as db:
+        await load_user(db, user_id)
+
+    async def stream():
+        subscriber = live_hub.subscribe(user_id)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(), settings.analytics_live_keepalive_seconds
+                    )
+                except asyncio.TimeoutError:
+                    message = b": keepalive\n\n"
+                yield message
+        finally:
+            live_hub.unsubscribe(user_id, subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_requests(
+    start: datetime,
+    end: datetime,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    compression: str | None = Query(None, pattern="^(gzip|zstd)$"),
+    key_id: UUID | None = None,
+    model: str | None = None,
+    user: User = Depends(get_current_user),
+):
+    """
+    Raw request logs in [start, end) as a streamed CSV, NDJSON or Parquet
+    file, oldest first. Times without an offset are UTC.
+    """
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        encoder = export.encoder(format, compression)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    query = export.ExportQuery(user_id=user.id, start=start, end=end, api_key_id=key_id, model=model)
+
+    async def stream():
+        # Its own session: get_db's is closed before the body is sent
+        async with async_session() as db:
+            async for chunk in export.export(db, query, encoder):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type=export.media_type(format, compression),
+        headers={
+            "Content-Disposition": f'attachment; filename="{export.filename(query, format, compression)}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
 
 @router.get("/requests")
 async def request_logs(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
+    key_id: UUID | None = None,
+    model: str | None = None,
+    status_code: int | None = Query(None, ge=100, le=599),
+    endpoint: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_total: bool = False,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    return await analytics_service.get_request_logs(db, user.id, page, limit)
+    try:
+        return await analytics_service.get_request_logs(
+            db,
+            user.id,
+            page,
+            limit,
+            cursor=cursor,
+            api_key_id=key_id,
+            model=model,
+            status_code=status_code,
+            endpoint=endpoint,
+            start=start,
+            end=end,
+            exact_total=exact_total,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
@@ -53,18 +53,25 @@ def create_access_token(user_id: UUID) -> str:
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
+def decode_user_id(token: str) -> UUID:
+    """User id from a valid access token, without loading the user."""
     try:
-        payload = jwt.decode(credentials.credentials, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
+        return UUID(user_id)
+    except (JWTError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
+
+def get_token_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> UUID:
+    return decode_user_id(credentials.credentials)
+
+
+async def load_user(db: AsyncSession, user_id: UUID) -> User:
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None:
@@ -72,6 +79,13 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    user_id: UUID = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    return await load_user(db, user_id)
+
+
 # --- Routes ---
 
 @router.post("/signup", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
@@ -1,17 +1,20 @@
-import hashlib
 import secrets
 from datetime import datetime
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import select
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.middleware.proxy_auth import hash_proxy_key, invalidate_proxy_key
 from app.models.api_key import ApiKey
+from app.models.upstream_key import UpstreamKey
 from app.models.user import User
 from app.routers.auth import get_current_user
+from app.services import live
+from app.services.analytics_cache import analytics_cache
 from app.services.encryption import encrypt_value
 
 router = APIRouter()
@@ -22,12 +25,62 @@ router = APIRouter()
 class CreateKeyRequest(BaseModel):
     label: str | None = None
     anthropic_api_key: str
+    response_cache_enabled: bool = False
+    response_cache_ttl_seconds: int | None = Field(None, gt=0)
+    rpm_limit: int | None = Field(None, gt=0)
+    tpm_limit: int | None = Field(None, gt=0)
+    max_concurrency: int | None = Field(None, gt=0)
+
+
+def _not_null(value):
+    # Omitting a field leaves it alone; an explicit null would hit a NOT NULL column
+    if value is None:
+        raise ValueError("may not be null")
+    return value
+
+
+class UpdateKeyRequest(BaseModel):
+    label: str | None = None
+    response_cache_enabled: bool | None = None
+    response_cache_ttl_seconds: int | None = Field(None, gt=0)
+    rpm_limit: int | None = Field(None, gt=0)
+    tpm_limit: int | None = Field(None, gt=0)
+    max_concurrency: int | None = Field(None, gt=0)
+
+    _response_cache_enabled_not_null = field_validator("response_cache_enabled")(_not_null)
 
 
 class KeyResponse(BaseModel):
     id: UUID
     key_prefix: str
     label: str | None
+    response_cache_enabled: bool
+    response_cache_ttl_seconds: int | None
+    rpm_limit: int | None
+    tpm_limit: int | None
+    max_concurrency: int | None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class CreateUpstreamKeyRequest(BaseModel):
+    label: str | None = None
+    anthropic_api_key: str
+
+
+class UpdateUpstreamKeyRequest(BaseModel):
+    label: str | None = None
+    enabled: bool | None = None
+
+    _enabled_not_null = field_validator("enabled")(_not_null)
+
+
+class UpstreamKeyResponse(BaseModel):
+    id: UUID
+    label: str | None
+    key_hint: str
+    enabled: bool
     created_at: datetime
 
     model_config = {"from_attributes": True}
@@ -47,8 +100,42 @@ def _generate_proxy_key() -> str:
     return f"cua-{secrets.token_hex(24)}"
 
 
-def _hash_key(key: str) -> str:
-    return hashlib.sha256(key.encode()).hexdigest()
+def _key_hint(anthropic_api_key: str) -> str:
+    return f"{anthropic_api_key[:7]}...{anthropic_api_key[-4:]}"
+
+
+async def _get_owned_key(key_id: UUID, user: User, db: AsyncSession) -> ApiKey:
+    result = await db.execute(
+        select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == user.id)
+    )
+    api_key = result.scalar_one_or_none()
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return api_key
+
+
+async def _get_upstream_key(api_key: ApiKey, upstream_key_id: UUID, db: AsyncSession) -> UpstreamKey:
+    result = await db.execute(
+        select(UpstreamKey).where(
+            UpstreamKey.id == upstream_key_id,
+            UpstreamKey.api_key_id == api_key.id,
+            UpstreamKey.deleted_at.is_(None),
+        )
+    )
+    upstream_key = result.scalar_one_or_none()
+    if not upstream_key:
+        raise HTTPException(status_code=404, detail="Upstream key not found")
+    return upstream_key
+
+
+async def _commit_key_change(db: AsyncSession, user: User, key_hash: str) -> None:
+    """
+    Commit a change to a proxy key or its pool, and drop the key from the
+    authentication cache here and (via NOTIFY on commit) in every worker.
+    """
+    await live.key_changed(db, user.id, key_hash)
+    await db.commit()
+    invalidate_proxy_key(key_hash)
 
 
 # --- Routes ---
@@ -63,10 +150,15 @@ async def create_key(
 
     api_key = ApiKey(
         user_id=user.id,
-        key_hash=_hash_key(proxy_key),
+        key_hash=hash_proxy_key(proxy_key),
         key_prefix=proxy_key[:12],
         label=body.label,
         anthropic_key_encrypted=encrypt_value(body.anthropic_api_key),
+        response_cache_enabled=body.response_cache_enabled,
+        response_cache_ttl_seconds=body.response_cache_ttl_seconds,
+        rpm_limit=body.rpm_limit,
+        tpm_limit=body.tpm_limit,
+        max_concurrency=body.max_concurrency,
     )
     db.add(api_key)
     await db.commit()
@@ -92,18 +184,104 @@ async def list_keys(
     return result.scalars().all()
 
 
+@router.patch("/{key_id}", response_model=KeyResponse)
+async def update_key(
+    key_id: UUID,
+    body: UpdateKeyRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    api_key = await _get_owned_key(key_id, user, db)
+    for field, value in body.model_dump(exclude_unset=True).items():
+        setattr(api_key, field, value)
+    await _commit_key_change(db, user, api_key.key_hash)
+    await db.refresh(api_key)
+    # Labels appear in the by-key analytics
+    analytics_cache.bump([user.id])
+    return api_key
+
+
 @router.delete("/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_key(
     key_id: UUID,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    api_key = await _get_owned_key(key_id, user, db)
+    key_hash = api_key.key_hash
+    await db.delete(api_key)
+    await _commit_key_change(db, user, key_hash)
+    analytics_cache.bump([user.id])
+
+
+# --- Upstream key pool ---
+# Extra Anthropic keys a proxy key load-balances across, in addition to the
+# key it was created with. Changes take effect at once in every worker.
+
+@router.get("/{key_id}/upstream-keys", response_model=list[UpstreamKeyResponse])
+async def list_upstream_keys(
+    key_id: UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    api_key = await _get_owned_key(key_id, user, db)
     result = await db.execute(
-        select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == user.id)
+        select(UpstreamKey)
+        .where(UpstreamKey.api_key_id == api_key.id, UpstreamKey.deleted_at.is_(None))
+        .order_by(UpstreamKey.created_at)
     )
-    api_key = result.scalar_one_or_none()
-    if not api_key:
-        raise HTTPException(status_code=404, detail="API key not found")
+    return result.scalars().all()
 
-    await db.delete(api_key)
-    await db.commit()
+
+@router.post("/{key_id}/upstream-keys", response_model=UpstreamKeyResponse, status_code=status.HTTP_201_CREATED)
+async def add_upstream_key(
+    key_id: UUID,
+    body: CreateUpstreamKeyRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    api_key = await _get_owned_key(key_id, user, db)
+    upstream_key = UpstreamKey(
+        api_key_id=api_key.id,
+        label=body.label,
+        key_hint=_key_hint(body.anthropic_api_key),
+        anthropic_key_encrypted=encrypt_value(body.anthropic_api_key),
+    )
+    db.add(upstream_key)
+    await _commit_key_change(db, user, api_key.key_hash)
+    await db.refresh(upstream_key)
+    return upstream_key
+
+
+@router.patch("/{key_id}/upstream-keys/{upstream_key_id}", response_model=UpstreamKeyResponse)
+async def update_upstream_key(
+    key_id: UUID,
+    upstream_key_id: UUID,
+    body: UpdateUpstreamKeyRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    api_key = await _get_owned_key(key_id, user, db)
+    upstream_key = await _get_upstream_key(api_key, upstream_key_id, db)
+
+    for field, value in body.model_dump(exclude_unset=True).items():
+        setattr(upstream_key, field, value)
+    await _commit_key_change(db, user, api_key.key_hash)
+    await db.refresh(upstream_key)
+    return upstream_key
+
+
+@router.delete("/{key_id}/upstream-keys/{upstream_key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upstream_key(
+    key_id: UUID,
+    upstream_key_id: UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    api_key = await _get_owned_key(key_id, user, db)
+    upstream_key = await _get_upstream_key(api_key, upstream_key_id, db)
+
+    # Soft delete: request_logs keep attributing past calls to this key
+    upstream_key.enabled = False
+    upstream_key.deleted_at = func.now()
+    await _commit_key_change(db, user, api_key.key_hash)
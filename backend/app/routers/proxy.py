@@ -1,21 +1,37 @@
 import json
 import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 
+import anyio
 import httpx
-from fastapi import APIRouter, BackgroundTasks, Request, Response
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from app.config import settings
 from app.middleware.proxy_auth import authenticate_proxy_key
-from app.services.log_service import log_request
+from app.services import upstream
+from app.services.json_scan import TopLevelKeyScanner
+from app.services.key_pool import UpstreamCredential, key_pool
+from app.services.log_service import FREE_CACHE_STATUSES, log_request
+from app.services.metrics import AUTH_SECONDS, OVERHEAD_SECONDS, REQUESTS, UPSTREAM_TTFB_SECONDS, model_label
+from app.services.rate_limit import rate_limiter, retry_after_header
+from app.services.resilience import CircuitOpenError, RetryTrace, breaker_for, send_with_retries
+from app.services.response_cache import CachedResponse, is_deterministic, request_key, response_cache
+from app.services.singleflight import upstream_flights
+from app.services.sse import SSEUsageSniffer
 
 router = APIRouter()
 
-ANTHROPIC_BASE_URL = "https://api.anthropic.com"
 PASS_THROUGH_HEADERS = {"anthropic-version", "anthropic-beta", "content-type"}
+# Not copied from upstream responses: hop-by-hop headers, plus encoding/length
+# because httpx hands us the decoded body.
+DROPPED_RESPONSE_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length"}
 
 
-def _build_forward_headers(request: Request, anthropic_key: str) -> dict:
-    headers = {"x-api-key": anthropic_key}
+def _build_forward_headers(request: Request) -> dict:
+    """Client headers passed upstream; x-api-key is added per attempt by _send_upstream."""
+    headers = {}
     for header_name in PASS_THROUGH_HEADERS:
         value = request.headers.get(header_name)
         if value:
@@ -23,147 +39,475 @@ def _build_forward_headers(request: Request, anthropic_key: str) -> dict:
     return headers
 
 
+def _response_headers(anthropic_response: httpx.Response) -> dict:
+    return {
+        name: value
+        for name, value in anthropic_response.headers.items()
+        if name.lower() not in DROPPED_RESPONSE_HEADERS
+    }
+
+
+class _RelayResponse(StreamingResponse):
+    """
+    StreamingResponse that always awaits ``on_close`` when it ends, however
+    it ends. The body generator's own ``finally`` is not enough: if the
+    client goes away before the response starts, Starlette cancels the
+    response without ever iterating the generator. ``on_close`` must be
+    safe to call more than once.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+async def _scan_request_body(request: Request, scanner: TopLevelKeyScanner) -> AsyncIterator[bytes]:
+    """Forward the client body as it arrives, scanning it for routing fields on the way."""
+    async for chunk in request.stream():
+        scanner.feed(chunk)
+        yield chunk
+
+
+async def _send_upstream(
+    content, forward_headers: dict, credentials: tuple[UpstreamCredential, ...], trace: RetryTrace
+) -> httpx.Response:
+    """
+    Send the request upstream through the key pool, with retries.
+
+    Each attempt leases a pooled key (``trace.lease``); a retry releases the
+    previous one first, so it may move to a less loaded key. The caller
+    has called ``trace.begin``; the final lease is released by
+    ``trace.finish`` (via _complete) once the response has been relayed.
+    """
+    client = upstream.get_client()
+
+    def choose():
+        trace.release()
+        trace.lease = key_pool.acquire(credentials)
+        return breaker_for(trace.lease.credential.fingerprint)
+
+    async def send():
+        lease = trace.lease
+        anthropic_request = client.build_request(
+            "POST",
+            "/v1/messages",
+            content=content,
+            headers={**forward_headers, "x-api-key": lease.credential.secret},
+        )
+        anthropic_response = await client.send(anthropic_request, stream=True)
+        lease.observe(anthropic_response)
+        return anthropic_response
+
+    try:
+        # Only a buffered body can be sent again
+        anthropic_response = await send_with_retries(
+            choose, send, trace, replayable=isinstance(content, bytes), failover=len(credentials) > 1
+        )
+    except BaseException:
+        trace.finish()
+        raise
+    trace.headers_at = time.monotonic()
+    UPSTREAM_TTFB_SECONDS.observe(trace.headers_at - trace.started, trace.labels[1])
+    return anthropic_response
+
+
+def _rate_limited(wait_seconds: float) -> JSONResponse:
+    # Same error shape as Anthropic's own 429s, so client SDKs back off normally
+    return JSONResponse(
+        status_code=429,
+        content={
+            "type": "error",
+            "error": {"type": "rate_limit_error", "message": "Proxy key rate limit exceeded"},
+        },
+        headers={"retry-after": retry_after_header(wait_seconds)},
+    )
+
+
+def _circuit_open(api_key, request_model, start, exc: CircuitOpenError, trace: RetryTrace) -> JSONResponse:
+    trace.breaker_state = "open"
+    _complete(
+        api_key,
+        start,
+        trace,
+        model=request_model,
+        input_tokens=0,
+        output_tokens=0,
+        status_code=503,
+    )
+    # Shaped like Anthropic's overloaded_error so client SDKs back off normally
+    return JSONResponse(
+        status_code=503,
+        content={
+            "type": "error",
+            "error": {"type": "overloaded_error", "message": "Upstream temporarily unavailable"},
+        },
+        headers={"retry-after": retry_after_header(exc.retry_after)},
+    )
+
+
+def _complete(
+    api_key, start: float, trace: RetryTrace | None = None, first_token_at: float | None = None, **log_fields
+) -> None:
+    """
+    Finish a proxied request: free its rate-limit slot and pooled-key lease,
+    record its metrics, and queue its log row (with the serving key, any
+    retry metadata, and its timings).
+
+    ``start`` and ``first_token_at`` are time.monotonic() values; the latter
+    is only passed for streams.
+
+    Requests served without their own upstream call (FREE_CACHE_STATUSES:
+    response cache hits, coalesced followers) are not debited from the
+    key's tokens/min budget, just as they are not charged: that budget
+    meters upstream usage. They still count against requests/min.
+    """
+    now = time.monotonic()
+    elapsed = now - start
+    upstream_seconds = 0.0
+    if trace is not None:
+        upstream_seconds = trace.finish()
+        log_fields.update(upstream_key_id=trace.upstream_key_id, metadata=trace.as_metadata())
+        if trace.headers_at:
+            log_fields["upstream_ttfb_ms"] = int((trace.headers_at - trace.started) * 1000)
+            if first_token_at is not None:
+                log_fields["ttft_ms"] = int((first_token_at - start) * 1000)
+                log_fields["stream_duration_ms"] = int((now - trace.headers_at) * 1000)
+                generating = now - first_token_at
+                if generating > 0 and log_fields["output_tokens"]:
+                    log_fields["output_tokens_per_sec"] = round(log_fields["output_tokens"] / generating, 2)
+    overhead = max(0.0, elapsed - upstream_seconds)
+    OVERHEAD_SECONDS.observe(overhead)
+    REQUESTS.inc(model_label(log_fields["model"]), str(log_fields["status_code"]))
+    log_fields["latency_ms"] = int(elapsed * 1000)
+    log_fields["proxy_overhead_ms"] = round(overhead * 1000, 3)
+    tokens = 0
+    if log_fields.get("cache_status") not in FREE_CACHE_STATUSES:
+        tokens = log_fields["input_tokens"] + log_fields["output_tokens"]
+    rate_limiter.release(api_key.id, tokens)
+    log_request(api_key_id=api_key.id, **log_fields)
+
+
 @router.post("/v1/messages")
-async def proxy_messages(request: Request, background_tasks: BackgroundTasks):
-    start = time.time()
+async def proxy_messages(request: Request):
+    start = time.monotonic()
 
-    api_key, anthropic_key = await authenticate_proxy_key(request)
-    body = await request.body()
-    forward_headers = _build_forward_headers(request, anthropic_key)
+    auth_started = time.perf_counter()
+    api_key, credentials = await authenticate_proxy_key(request)
+    AUTH_SECONDS.observe(time.perf_counter() - auth_started)
+
+    wait = rate_limiter.acquire(api_key.id, api_key.rpm_limit, api_key.tpm_limit, api_key.max_concurrency)
+    if wait is not None:
+        return _rate_limited(wait)
 
-    # Check if this is a streaming request
     try:
-        request_data = json.loads(body)
-        is_streaming = request_data.get("stream", False)
-        request_model = request_data.get("model", "unknown")
-    except Exception:
-        is_streaming = False
-        request_model = "unknown"
+        return await _forward(request, api_key, credentials, start)
+    except BaseException:
+        # The request never reached a completion path
+        rate_limiter.release(api_key.id)
+        raise
+
+
+async def _forward(request: Request, api_key, credentials: tuple[UpstreamCredential, ...], start: float):
+    forward_headers = _build_forward_headers(request)
+    cache_key = None
+    trace = RetryTrace()
+
+    # The response cache and request coalescing hash the whole body
+    needs_body = api_key.response_cache_enabled or settings.proxy_coalesce_requests
+
+    if settings.proxy_stream_request_body and not needs_body:
+        # The body goes upstream chunk by chunk; "model" and "stream" are picked
+        # out by a bounded incremental scan instead of a full JSON decode.
+        scanner = TopLevelKeyScanner(("model", "stream"))
+        # The model is only known once the body has gone upstream
+        trace.begin(api_key.key_prefix, "unknown")
+        try:
+            anthropic_response = await _send_upstream(
+                _scan_request_body(request, scanner), forward_headers, credentials, trace
+            )
+        except CircuitOpenError as exc:
+            return _circuit_open(api_key, "unknown", start, exc, trace)
+        request_model = scanner.values.get("model")
+        if not isinstance(request_model, str):
+            request_model = "unknown"
+        content_type = anthropic_response.headers.get("content-type", "")
+        is_streaming = content_type.startswith("text/event-stream")
+    else:
+        body = await request.body()
+
+        # Check if this is a streaming request
+        try:
+            request_data = json.loads(body)
+            is_streaming = request_data.get("stream", False)
+            request_model = request_data.get("model")
+            if not isinstance(request_model, str):
+                request_model = "unknown"
+        except Exception:
+            request_data = None
+            is_streaming = False
+            request_model = "unknown"
+
+        if needs_body and request_data is not None and is_deterministic(request_data):
+            # Scoped by the key's own Anthropic key; pooled keys share its account
+            flight_key = request_key(request_data, credentials[0].secret, forward_headers)
+            if api_key.response_cache_enabled:
+                cache_key = flight_key
+                cached = await response_cache.get(cache_key)
+                if cached is not None:
+                    return _serve_cached(api_key, cached, start)
+            if settings.proxy_coalesce_requests:
+                return await _handle_coalesced(
+                    api_key, body, forward_headers, credentials, request_model, start, flight_key, cache_key
+                )
+
+        trace.begin(api_key.key_prefix, str(request_model))
+        try:
+            anthropic_response = await _send_upstream(body, forward_headers, credentials, trace)
+        except CircuitOpenError as exc:
+            return _circuit_open(api_key, request_model, start, exc, trace)
 
     if is_streaming:
-        return await _handle_streaming(
-            api_key, body, forward_headers, request_model, start
-        )
+        return _handle_streaming(api_key, anthropic_response, request_model, start, trace)
     else:
-        return await _handle_non_streaming(
-            api_key, body, forward_headers, request_model, start, background_tasks
-        )
+        return _handle_non_streaming(api_key, anthropic_response, request_model, start, trace, cache_key)
 
 
-async def _handle_non_streaming(
-    api_key, body, forward_headers, request_model, start, background_tasks
-):
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        anthropic_response = await client.post(
-            f"{ANTHROPIC_BASE_URL}/v1/messages",
-            content=body,
-            headers=forward_headers,
-        )
+@dataclass(frozen=True, slots=True)
+class _BufferedResponse:
+    status_code: int
+    headers: dict
+    body: bytes
+    model: str | None
+    usage: dict
+    trace: RetryTrace
 
-    latency_ms = int((time.time() - start) * 1000)
 
-    model = request_model
-    input_tokens = 0
-    output_tokens = 0
+async def _fetch_buffered(
+    body: bytes, forward_headers: dict, credentials, labels: tuple[str, str]
+) -> _BufferedResponse:
+    trace = RetryTrace()
+    trace.begin(*labels)
+    anthropic_response = await _send_upstream(body, forward_headers, credentials, trace)
+    try:
+        content = await anthropic_response.aread()
+    finally:
+        await anthropic_response.aclose()
+        trace.finish()
 
+    model = None
+    usage = {}
     if anthropic_response.status_code == 200:
-        try:
-            response_data = anthropic_response.json()
-            model = response_data.get("model", request_model)
-            usage = response_data.get("usage", {})
-            input_tokens = usage.get("input_tokens", 0)
-            output_tokens = usage.get("output_tokens", 0)
-        except Exception:
-            pass
-
-    background_tasks.add_task(
-        log_request,
-        api_key_id=api_key.id,
-        model=model,
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
+        scanner = TopLevelKeyScanner(("model", "usage"))
+        scanner.feed(content)
+        model = scanner.values.get("model")
+        if isinstance(scanner.values.get("usage"), dict):
+            usage = scanner.values["usage"]
+    return _BufferedResponse(
         status_code=anthropic_response.status_code,
-        latency_ms=latency_ms,
+        headers=_response_headers(anthropic_response),
+        body=content,
+        model=model if isinstance(model, str) else None,
+        usage=usage,
+        trace=trace,
     )
 
+
+async def _handle_coalesced(api_key, body, forward_headers, credentials, request_model, start, flight_key, cache_key):
+    """
+    Share one upstream call among concurrent identical requests.
+
+    Every caller gets the same response bytes and its own request_logs row;
+    callers that joined an in-flight call are logged as "coalesced". Only
+    the caller that made the call is logged with its upstream key, timings
+    and retries. A follower gets a trace of its own with none of those,
+    whose upstream time is how long it waited for the shared response.
+    """
+    labels = (api_key.key_prefix, str(request_model))
+    waiting_since = time.monotonic()
+    try:
+        result, shared = await upstream_flights.do(
+            flight_key, lambda: _fetch_buffered(body, forward_headers, credentials, labels)
+        )
+    except CircuitOpenError as exc:
+        return _circuit_open(api_key, request_model, start, exc, RetryTrace())
+
+    trace = result.trace
+    if shared:
+        trace = RetryTrace(upstream_seconds=time.monotonic() - waiting_since)
+    usage = result.usage
+    _complete(
+        api_key,
+        start,
+        trace,
+        model=result.model or request_model,
+        input_tokens=usage.get("input_tokens") or 0,
+        output_tokens=usage.get("output_tokens") or 0,
+        cache_creation_input_tokens=usage.get("cache_creation_input_tokens") or 0,
+        cache_read_input_tokens=usage.get("cache_read_input_tokens") or 0,
+        status_code=result.status_code,
+        cache_status="coalesced" if shared else None,
+    )
+
+    if cache_key is not None and not shared and result.status_code == 200 and result.model:
+        await response_cache.put(
+            cache_key,
+            CachedResponse(
+                body=result.body,
+                content_type=result.headers.get("content-type", "application/json"),
+                model=result.model,
+                usage=usage,
+            ),
+            ttl_seconds=api_key.response_cache_ttl_seconds,
+        )
+
+    return Response(content=result.body, status_code=result.status_code, headers=result.headers)
+
+
+def _serve_cached(api_key, cached: CachedResponse, start):
+    usage = cached.usage
+    _complete(
+        api_key,
+        start,
+        model=cached.model,
+        input_tokens=usage.get("input_tokens") or 0,
+        output_tokens=usage.get("output_tokens") or 0,
+        cache_creation_input_tokens=usage.get("cache_creation_input_tokens") or 0,
+        cache_read_input_tokens=usage.get("cache_read_input_tokens") or 0,
+        status_code=200,
+        cache_status="hit",
+    )
     return Response(
-        content=anthropic_response.content,
-        status_code=anthropic_response.status_code,
-        headers=dict(anthropic_response.headers),
-        media_type=anthropic_response.headers.get("content-type"),
+        content=cached.body,
+        status_code=200,
+        media_type=cached.content_type,
+        headers={"x-cache": "HIT"},
     )
 
 
-async def _handle_streaming(api_key, body, forward_headers, request_model, start):
+def _handle_non_streaming(api_key, anthropic_response, request_model, start, trace, cache_key=None):
     """
-    Stream SSE events from Anthropic to the client while capturing usage data.
-
-    Anthropic streaming sends:
-    - event: message_start  (contains model, input_tokens in usage)
-    - event: content_block_delta (content chunks)
-    - event: message_delta  (contains output_tokens in usage)
-    - event: message_stop
+    Pass a JSON response through to the client without buffering it.
 
-    We capture usage from message_start and message_delta events.
+    ``model`` and ``usage`` are top-level keys of a Messages response, so a
+    TopLevelKeyScanner picks them out of the chunks as they are forwarded.
+    With a ``cache_key``, a successful body is also collected (up to the
+    cache's entry size limit) and stored in the response cache.
     """
-    client = httpx.AsyncClient(timeout=300.0)
+    scanner = TopLevelKeyScanner(("model", "usage"))
+    scan_usage = anthropic_response.status_code == 200
+    capture = [] if cache_key is not None and scan_usage else None
+    completed = False
+    finished = False
+
+    async def finish():
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        model = scanner.values.get("model")
+        usage = scanner.values.get("usage")
+        if not isinstance(usage, dict):
+            usage = {}
+        # Synchronous, so slots, lease and log row are settled even when cancelled
+        _complete(
+            api_key,
+            start,
+            trace,
+            model=model if isinstance(model, str) else request_model,
+            input_tokens=usage.get("input_tokens") or 0,
+            output_tokens=usage.get("output_tokens") or 0,
+            cache_creation_input_tokens=usage.get("cache_creation_input_tokens") or 0,
+            cache_read_input_tokens=usage.get("cache_read_input_tokens") or 0,
+            status_code=anthropic_response.status_code,
+        )
+        with anyio.CancelScope(shield=True):
+            await anthropic_response.aclose()
+            if completed and capture is not None and isinstance(model, str):
+                await response_cache.put(
+                    cache_key,
+                    CachedResponse(
+                        body=b"".join(capture),
+                        content_type=anthropic_response.headers.get("content-type", "application/json"),
+                        model=model,
+                        usage=usage,
+                    ),
+                    ttl_seconds=api_key.response_cache_ttl_seconds,
+                )
+
+    async def body_generator():
+        nonlocal capture, completed
+        captured_bytes = 0
+        try:
+            async for chunk in anthropic_response.aiter_bytes():
+                if scan_usage:
+                    scanner.feed(chunk)
+                if capture is not None:
+                    captured_bytes += len(chunk)
+                    if captured_bytes > response_cache.max_entry_bytes:
+                        capture = None
+                    else:
+                        capture.append(chunk)
+                yield chunk
+            completed = True
+        finally:
+            await finish()
 
-    anthropic_request = client.build_request(
-        "POST",
-        f"{ANTHROPIC_BASE_URL}/v1/messages",
-        content=body,
-        headers=forward_headers,
+    return _RelayResponse(
+        body_generator(),
+        finish,
+        status_code=anthropic_response.status_code,
+        headers=_response_headers(anthropic_response),
     )
 
-    anthropic_response = await client.send(anthropic_request, stream=True)
 
-    # Mutable state captured by the generator
-    usage_data = {
-        "model": request_model,
-        "input_tokens": 0,
-        "output_tokens": 0,
-        "status_code": anthropic_response.status_code,
-    }
+def _handle_streaming(api_key, anthropic_response, request_model, start, trace):
+    """
+    Stream SSE events from Anthropic to the client while capturing usage data.
+
+    Upstream chunks are forwarded byte-for-byte as they arrive; usage is
+    picked out of message_start / message_delta by SSEUsageSniffer.
+    """
+    sniffer = SSEUsageSniffer(request_model)
+    finished = False
+
+    async def finish():
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        # Log after stream completes
+        _complete(
+            api_key,
+            start,
+            trace,
+            first_token_at=sniffer.first_token_at,
+            model=sniffer.model,
+            input_tokens=sniffer.input_tokens,
+            output_tokens=sniffer.output_tokens,
+            cache_creation_input_tokens=sniffer.cache_creation_input_tokens,
+            cache_read_input_tokens=sniffer.cache_read_input_tokens,
+            status_code=anthropic_response.status_code,
+        )
+        with anyio.CancelScope(shield=True):
+            await anthropic_response.aclose()
 
     async def event_generator():
         try:
-            async for line in anthropic_response.aiter_lines():
-                # Parse SSE data lines to extract usage
-                if line.startswith("data: "):
-                    try:
-                        data = json.loads(line[6:])
-                        event_type = data.get("type", "")
-
-                        if event_type == "message_start":
-                            message = data.get("message", {})
-                            usage_data["model"] = message.get("model", request_model)
-                            usage = message.get("usage", {})
-                            usage_data["input_tokens"] = usage.get("input_tokens", 0)
-
-                        elif event_type == "message_delta":
-                            usage = data.get("usage", {})
-                            usage_data["output_tokens"] = usage.get("output_tokens", 0)
-                    except json.JSONDecodeError:
-                        pass
-
-                yield line + "\n"
+            async for chunk in anthropic_response.aiter_bytes():
+                sniffer.feed(chunk)
+                yield chunk
         finally:
-            await anthropic_response.aclose()
-            await client.aclose()
-
-            # Log after stream completes
-            latency_ms = int((time.time() - start) * 1000)
-            await log_request(
-                api_key_id=api_key.id,
-                model=usage_data["model"],
-                input_tokens=usage_data["input_tokens"],
-                output_tokens=usage_data["output_tokens"],
-                status_code=usage_data["status_code"],
-                latency_ms=latency_ms,
-            )
+            await finish()
 
-    return StreamingResponse(
+    return _RelayResponse(
         event_generator(),
+        finish,
         status_code=anthropic_response.status_code,
         media_type="text/event-stream",
         headers={
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Hashable
+from uuid import UUID
+
+from app.config import settings
+from app.services.cache import TTLCache
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResult:
+    body: bytes
+    etag: str
+
+
+class AnalyticsCache:
+    """
+    Per-user cache of serialized analytics results.
+
+    Entries are keyed by (user, data version, query). The log writer bumps a
+    user's version after each flush that touched their keys, so new rows
+    make earlier results unreachable at once; they are never served again
+    and age out of the LRU. Versions are per process; flushes on other
+    workers arrive as live notifications (app/services/live.py), and
+    without those, become visible here when the TTL expires.
+
+    ETags are content hashes, so they agree across workers and restarts and
+    a client holding an unchanged result gets a 304 even after a recompute.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int):
+        self._results = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+        self._versions: dict[UUID, int] = {}
+
+    def version(self, user_id: UUID) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_ids) -> None:
+        for user_id in user_ids:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def get(self, user_id: UUID, version: int, query: Hashable) -> CachedResult | None:
+        return self._results.get((user_id, version, query))
+
+    def put(self, user_id: UUID, version: int, query: Hashable, result) -> CachedResult:
+        """
+        Serialize and store a result computed while ``version`` was current.
+        If the version moved on in the meantime the entry is simply never hit.
+        """
+        body = json.dumps(result, separators=(",", ":")).encode()
+        entry = CachedResult(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        self._results.set((user_id, version, query), entry, size=len(body))
+        return entry
+
+    def stats(self) -> dict:
+        return {**self._results.stats(), "tracked_users": len(self._versions)}
+
+
+analytics_cache = AnalyticsCache(
+    max_entries=settings.analytics_cache_max_entries,
+    ttl_seconds=settings.analytics_cache_ttl_seconds,
+    max_bytes=settings.analytics_cache_max_bytes,
+)
@@ -1,70 +1,381 @@
+import base64
+import binascii
+import json
+from collections import defaultdict
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from uuid import UUID
+from zoneinfo import ZoneInfo
 
-from sqlalchemy import func, select, text
+from sqlalchemy import BigInteger, DateTime, Integer, and_, cast, func, literal, literal_column, select, true, tuple_, union_all
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
+from app.config import settings
 from app.models.api_key import ApiKey
 from app.models.request_log import RequestLog
+from app.models.request_rollup import RequestRollupDaily, RequestRollupHourly
+from app.services import partitions, rollups, sketch
 
 
-def _get_period_start(period: str) -> datetime:
-    now = datetime.now(timezone.utc)
-    days = {"7d": 7, "30d": 30, "90d": 90}.get(period, 30)
-    return now - timedelta(days=days)
+PERIODS = {"7d": timedelta(days=7), "30d": timedelta(days=30), "90d": timedelta(days=90), "1y": timedelta(days=365)}
+
+
+@dataclass(frozen=True)
+class UsageQuery:
+    """
+    A time range and filters to aggregate over. ``start`` and ``end`` are
+    absolute; without ``start`` the range is ``period`` back from ``end``,
+    and without ``end`` it runs up to now. Immutable and hashable so it can
+    key the analytics cache: relative ranges resolve when they are run.
+    """
+
+    period: str = "30d"
+    start: datetime | None = None
+    end: datetime | None = None
+    tz: str = "UTC"
+    api_key_id: UUID | None = None
+    model: str | None = None
+    status_code: int | None = None
+    endpoint: str | None = None
+
+    def time_range(self) -> tuple[datetime, datetime | None]:
+        """(start, end), where an end of None means "up to now"."""
+        if self.start is not None:
+            return self.start, self.end
+        return (self.end or datetime.now(timezone.utc)) - PERIODS[self.period], self.end
+
+    def describe(self) -> dict:
+        start, end = self.time_range()
+        return {
+            "period": None if self.start is not None else self.period,
+            "start": start.isoformat(),
+            "end": end.isoformat() if end is not None else None,
+            "tz": self.tz,
+        }
+
+
+@dataclass(frozen=True)
+class Span:
+    """One piece of a query plan: read [start, end) from ``source``."""
+
+    source: str  # "raw", "hourly" or "daily"
+    start: datetime
+    end: datetime | None
+
+
+def plan(start: datetime, end: datetime | None, daily: bool) -> list[Span]:
+    """
+    Cheapest sources covering [start, end): raw request_logs only for the
+    partial hours at either edge, daily rollups for whole UTC days when
+    ``daily`` allows it, hourly rollups for the rest. An open end reads the
+    rollups up to now, since the log writer keeps the current hour and day
+    live. A year-long range costs about as much as a week-long one.
+
+    Rollup hours are UTC hours; in zones with :30 or :45 offsets the
+    caller reads the hours a local period starts in from raw rows as well
+    (see ``straddled_hours``).
+    """
+    first_hour = rollups.hour_ceil(start)
+    last_hour = rollups.hour_floor(end) if end is not None else None
+    if last_hour is not None and last_hour < first_hour:
+        return [Span("raw", start, end)]
+
+    spans = [Span("raw", start, first_hour)]
+    first_day = rollups.day_ceil(first_hour)
+    if last_hour is None:
+        last_day = None if first_day <= datetime.now(timezone.utc) else first_day
+    else:
+        last_day = max(rollups.day_floor(last_hour), first_day)
+    if daily and (last_day is None or first_day < last_day):
+        spans.append(Span("hourly", first_hour, first_day))
+        spans.append(Span("daily", first_day, last_day))
+        if last_day is not None:
+            spans.append(Span("hourly", last_day, last_hour))
+    else:
+        spans.append(Span("hourly", first_hour, last_hour))
+    if last_hour is not None:
+        spans.append(Span("raw", last_hour, end))
+
+    return [span for span in spans if span.end is None or span.start < span.end]
+
+
+def _period_starts(start: datetime, end: datetime, granularity: str, tz: str):
+    """Starts of the ``granularity`` periods in time zone ``tz`` that fall in [start, end)."""
+    zone = ZoneInfo(tz)
+    current = start.astimezone(zone).replace(minute=0, second=0, microsecond=0)
+    if granularity != "hour":
+        current = current.replace(hour=0)
+        if granularity == "week":
+            current -= timedelta(days=current.weekday())
+        elif granularity == "month":
+            current = current.replace(day=1)
+    while current < end:
+        if current >= start:
+            yield current
+        if granularity == "hour":
+            current = (current.astimezone(timezone.utc) + rollups.HOUR).astimezone(zone)
+        elif granularity == "month":
+            month = current.month % 12 + 1
+            current = current.replace(year=current.year + (month == 1), month=month)
+        else:
+            # Wall-clock arithmetic: local midnights stay midnights across DST
+            current += timedelta(days=7 if granularity == "week" else 1)
+
+
+def straddled_hours(start: datetime, end: datetime, granularity: str, tz: str) -> list[datetime]:
+    """
+    UTC hours in which a ``granularity`` period of ``tz`` begins partway
+    through, so an hourly rollup row cannot be attributed to a single
+    period: every local midnight in Asia/Kolkata (+05:30) or Australia/
+    Adelaide (+09:30/+10:30), for instance. Empty for whole-hour offsets.
+    Hours whose raw rows are past ``log_retention_months`` are left out;
+    those stay approximate, attributed to the period the hour starts in.
+    """
+    cutoff = None
+    if settings.log_retention_months:
+        now = datetime.now(timezone.utc)
+        cutoff = partitions.add_months(partitions.month_floor(now), -settings.log_retention_months)
+    hours = set()
+    for boundary in _period_starts(start, end, granularity, tz):
+        hour = rollups.hour_floor(boundary)
+        if hour != boundary and (cutoff is None or hour >= cutoff):
+            hours.add(hour)
+    return sorted(hours)
+
+
+def _user_keys_filter(user_id: UUID, api_key_id: UUID | None = None):
+    """Subquery to get the API key IDs belonging to a user, optionally just one of them."""
+    query = select(ApiKey.id).where(ApiKey.user_id == user_id)
+    if api_key_id is not None:
+        query = query.where(ApiKey.id == api_key_id)
+    return query.scalar_subquery()
+
+
+def _filters(table, query: UsageQuery) -> list:
+    conditions = []
+    if query.model is not None:
+        conditions.append(table.model == query.model)
+    if query.status_code is not None:
+        conditions.append(table.status_code == query.status_code)
+    if query.endpoint is not None:
+        conditions.append(table.endpoint == query.endpoint)
+    return conditions
+
+
+def _raw_usage(keys_subq, query: UsageQuery, *conditions):
+    """request_logs summed like a rollup, in 15-minute buckets (see rollups.quarter_hour_bucket)."""
+    bucket = rollups.quarter_hour_bucket(RequestLog.created_at)
+    return (
+        select(
+            bucket.label("bucket"),
+            RequestLog.api_key_id,
+            RequestLog.model,
+            func.count(RequestLog.id).label("request_count"),
+            func.sum(RequestLog.input_tokens).label("input_tokens"),
+            func.sum(RequestLog.output_tokens).label("output_tokens"),
+            func.sum(RequestLog.cost_usd).label("cost_usd"),
+            func.sum(RequestLog.latency_ms).label("latency_ms_sum"),
+            func.count(RequestLog.id).filter(RequestLog.cache_status == "hit").label("cache_hits"),
+        )
+        .where(RequestLog.api_key_id.in_(keys_subq), *conditions, *_filters(RequestLog, query))
+        .group_by(bucket, RequestLog.api_key_id, RequestLog.model)
+    )
+
+
+def _usage_source(user_id: UUID, query: UsageQuery, granularity: str | None = None):
+    """
+    Usage rows (bucket, api_key_id, model, sums) matching ``query``, read
+    from the sources chosen by ``plan``. Daily rollups are UTC days, so
+    they are only used where no time series is needed or where the series
+    is per UTC day or coarser.
+
+    For a time series in a zone with a :30 or :45 offset, the hours in
+    which a local period begins (``straddled_hours``) are read from the
+    raw rows instead of the hourly rollups, so buckets split exactly.
+    """
+    keys_subq = _user_keys_filter(user_id, query.api_key_id)
+    start, end = query.time_range()
+    daily = granularity is None or (granularity != "hour" and query.tz == "UTC")
+    split = []
+    if granularity is not None and query.tz != "UTC":
+        split = straddled_hours(start, end or datetime.now(timezone.utc), granularity, query.tz)
+
+    parts = []
+    split_hours = []
+    for span in plan(start, end, daily):
+        if span.source == "raw":
+            parts.append(_raw_usage(keys_subq, query, RequestLog.created_at >= span.start, RequestLog.created_at < span.end))
+            continue
 
+        rollup = RequestRollupDaily if span.source == "daily" else RequestRollupHourly
+        conditions = [rollup.api_key_id.in_(keys_subq), rollup.bucket >= span.start]
+        if span.end is not None:
+            conditions.append(rollup.bucket < span.end)
+        if span.source == "hourly":
+            inside = [hour for hour in split if hour >= span.start and (span.end is None or hour < span.end)]
+            if inside:
+                conditions.append(rollup.bucket.not_in(inside))
+                split_hours.extend(inside)
+        parts.append(
+            select(
+                rollup.bucket,
+                rollup.api_key_id,
+                rollup.model,
+                rollup.request_count,
+                rollup.input_tokens,
+                rollup.output_tokens,
+                rollup.cost_usd,
+                rollup.latency_ms_sum,
+                rollup.cache_hits,
+            ).where(*conditions, *_filters(rollup, query))
+        )
+
+    if split_hours:
+        hours = select(
+            func.unnest(literal(split_hours, ARRAY(DateTime(timezone=True)))).label("hour")
+        ).subquery("split_hours")
+        parts.append(
+            _raw_usage(keys_subq, query).join(
+                hours,
+                and_(
+                    RequestLog.created_at >= hours.c.hour,
+                    RequestLog.created_at < hours.c.hour + literal_column("interval '1 hour'"),
+                ),
+            )
+        )
+    return union_all(*parts).subquery("usage")
+
+
+_QUANTILES = (0.5, 0.95, 0.99)
 
-def _user_keys_filter(user_id: UUID):
-    """Subquery to get all API key IDs belonging to a user."""
-    return select(ApiKey.id).where(ApiKey.user_id == user_id).scalar_subquery()
+# Output name -> (sketch column on the rollups, request_logs column)
+_LATENCY_METRICS = {
+    "latency_ms": ("latency_sketch", RequestLog.latency_ms),
+    "ttft_ms": ("ttft_sketch", RequestLog.ttft_ms),
+}
+# Same for get_performance; proxy overhead is sketched in microseconds
+_PERFORMANCE_METRICS = {
+    "upstream_ttfb_ms": ("ttfb_sketch", RequestLog.upstream_ttfb_ms),
+    "ttft_ms": ("ttft_sketch", RequestLog.ttft_ms),
+    "proxy_overhead_us": ("overhead_sketch", rollups.sketched_value("overhead_sketch")),
+}
 
 
-async def get_summary(db: AsyncSession, user_id: UUID, period: str = "30d") -> dict:
-    period_start = _get_period_start(period)
-    keys_subq = _user_keys_filter(user_id)
+def _sketch_bins(user_id: UUID, query: UsageQuery, group_by: str | None, metrics: dict = _LATENCY_METRICS):
+    """
+    Merged sketch bins (group, metric, bin, count) for ``query``. Rollup
+    spans contribute their stored sketches, unpacked with jsonb_each_text;
+    raw edge spans are binned on the fly with the same mapping. The result
+    is at most a few hundred rows per group and metric, whatever the range.
+    """
+    keys_subq = _user_keys_filter(user_id, query.api_key_id)
+    start, end = query.time_range()
+
+    parts = []
+    for span in plan(start, end, daily=True):
+        for metric, (sketch_column, value) in metrics.items():
+            if span.source == "raw":
+                group = RequestLog.model if group_by == "model" else RequestLog.api_key_id
+                index = sketch.bin_index_sql(value)
+                parts.append(
+                    select(
+                        (group if group_by else literal(None)).label("group"),
+                        literal(metric).label("metric"),
+                        index.label("bin"),
+                        func.count().label("n"),
+                    )
+                    .where(
+                        RequestLog.api_key_id.in_(keys_subq),
+                        RequestLog.created_at >= span.start,
+                        RequestLog.created_at < span.end,
+                        value.is_not(None),
+                        *_filters(RequestLog, query),
+                    )
+                    .group_by(*((group,) if group_by else ()), index)
+                )
+                continue
+
+            rollup = RequestRollupDaily if span.source == "daily" else RequestRollupHourly
+            group = rollup.model if group_by == "model" else rollup.api_key_id
+            bins = func.jsonb_each_text(getattr(rollup, sketch_column)).table_valued("key", "value")
+            conditions = [rollup.api_key_id.in_(keys_subq), rollup.bucket >= span.start]
+            if span.end is not None:
+                conditions.append(rollup.bucket < span.end)
+            parts.append(
+                select(
+                    (group if group_by else literal(None)).label("group"),
+                    literal(metric).label("metric"),
+                    cast(bins.c.key, Integer).label("bin"),
+                    cast(bins.c.value, BigInteger).label("n"),
+                )
+                .select_from(rollup)
+                .join(bins, true())
+                .where(*conditions, *_filters(rollup, query))
+            )
+
+    merged = union_all(*parts).subquery("bins")
+    return (
+        select(merged.c.group, merged.c.metric, merged.c.bin, func.sum(merged.c.n).label("n"))
+        .group_by(merged.c.group, merged.c.metric, merged.c.bin)
+    )
+
+
+def _latency_quantiles(bins) -> dict:
+    estimates = sketch.quantiles(bins, _QUANTILES)
+    return {f"p{round(fraction * 100)}": _rounded(estimates[fraction]) for fraction in _QUANTILES}
+
+
+def _time_bucket(column, granularity: str, tz: str):
+    """Start of the ``granularity`` period containing ``column``, in time zone ``tz``."""
+    return func.date_trunc(granularity, column, tz, type_=DateTime(timezone=True))
+
+
+async def get_summary(db: AsyncSession, user_id: UUID, query: UsageQuery) -> dict:
+    usage = _usage_source(user_id, query)
 
     result = await db.execute(
         select(
-            func.count(RequestLog.id).label("total_requests"),
-            func.coalesce(func.sum(RequestLog.input_tokens), 0).label("total_input_tokens"),
-            func.coalesce(func.sum(RequestLog.output_tokens), 0).label("total_output_tokens"),
-            func.coalesce(func.sum(RequestLog.cost_usd), 0).label("total_cost"),
-            func.coalesce(func.avg(RequestLog.latency_ms), 0).label("avg_latency_ms"),
-        ).where(
-            RequestLog.api_key_id.in_(keys_subq),
-            RequestLog.created_at >= period_start,
+            func.coalesce(func.sum(usage.c.request_count), 0).label("total_requests"),
+            func.coalesce(func.sum(usage.c.input_tokens), 0).label("total_input_tokens"),
+            func.coalesce(func.sum(usage.c.output_tokens), 0).label("total_output_tokens"),
+            func.coalesce(func.sum(usage.c.cost_usd), 0).label("total_cost"),
+            func.coalesce(
+                func.sum(usage.c.latency_ms_sum) / func.nullif(func.sum(usage.c.request_count), 0), 0
+            ).label("avg_latency_ms"),
+            func.coalesce(func.sum(usage.c.cache_hits), 0).label("cache_hits"),
         )
     )
     row = result.one()
     return {
-        "total_requests": row.total_requests,
+        "total_requests": int(row.total_requests),
         "total_input_tokens": int(row.total_input_tokens),
         "total_output_tokens": int(row.total_output_tokens),
         "total_cost": float(row.total_cost),
         "avg_latency_ms": round(float(row.avg_latency_ms)),
-        "period": period,
+        "cache_hits": int(row.cache_hits),
+        **await get_latency(db, user_id, query),
+        **query.describe(),
     }
 
 
 async def get_cost_over_time(
-    db: AsyncSession, user_id: UUID, period: str = "30d", granularity: str = "day"
+    db: AsyncSession, user_id: UUID, query: UsageQuery, granularity: str = "day"
 ) -> list[dict]:
-    period_start = _get_period_start(period)
-    keys_subq = _user_keys_filter(user_id)
+    usage = _usage_source(user_id, query, granularity)
+    tz = ZoneInfo(query.tz)
 
-    trunc_fn = func.date_trunc(granularity, RequestLog.created_at)
+    trunc_fn = _time_bucket(usage.c.bucket, granularity, query.tz)
 
     result = await db.execute(
         select(
             trunc_fn.label("bucket"),
-            func.count(RequestLog.id).label("requests"),
-            func.coalesce(func.sum(RequestLog.cost_usd), 0).label("cost"),
-            func.coalesce(func.sum(RequestLog.input_tokens), 0).label("input_tokens"),
-            func.coalesce(func.sum(RequestLog.output_tokens), 0).label("output_tokens"),
-        )
-        .where(
-            RequestLog.api_key_id.in_(keys_subq),
-            RequestLog.created_at >= period_start,
+            func.sum(usage.c.request_count).label("requests"),
+            func.coalesce(func.sum(usage.c.cost_usd), 0).label("cost"),
+            func.coalesce(func.sum(usage.c.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(usage.c.output_tokens), 0).label("output_tokens"),
         )
         .group_by(trunc_fn)
         .order_by(trunc_fn)
@@ -72,8 +383,8 @@ async def get_cost_over_time(
 
     return [
         {
-            "date": row.bucket.isoformat(),
-            "requests": row.requests,
+            "date": row.bucket.astimezone(tz).isoformat(),
+            "requests": int(row.requests),
             "cost": float(row.cost),
             "input_tokens": int(row.input_tokens),
             "output_tokens": int(row.output_tokens),
@@ -82,30 +393,25 @@ async def get_cost_over_time(
     ]
 
 
-async def get_by_model(db: AsyncSession, user_id: UUID, period: str = "30d") -> list[dict]:
-    period_start = _get_period_start(period)
-    keys_subq = _user_keys_filter(user_id)
+async def get_by_model(db: AsyncSession, user_id: UUID, query: UsageQuery) -> list[dict]:
+    usage = _usage_source(user_id, query)
 
     result = await db.execute(
         select(
-            RequestLog.model,
-            func.count(RequestLog.id).label("requests"),
-            func.coalesce(func.sum(RequestLog.cost_usd), 0).label("cost"),
-            func.coalesce(func.sum(RequestLog.input_tokens), 0).label("input_tokens"),
-            func.coalesce(func.sum(RequestLog.output_tokens), 0).label("output_tokens"),
+            usage.c.model,
+            func.sum(usage.c.request_count).label("requests"),
+            func.coalesce(func.sum(usage.c.cost_usd), 0).label("cost"),
+            func.coalesce(func.sum(usage.c.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(usage.c.output_tokens), 0).label("output_tokens"),
         )
-        .where(
-            RequestLog.api_key_id.in_(keys_subq),
-            RequestLog.created_at >= period_start,
-        )
-        .group_by(RequestLog.model)
-        .order_by(func.sum(RequestLog.cost_usd).desc())
+        .group_by(usage.c.model)
+        .order_by(func.sum(usage.c.cost_usd).desc())
     )
 
     return [
         {
             "model": row.model,
-            "requests": row.requests,
+            "requests": int(row.requests),
             "cost": float(row.cost),
             "input_tokens": int(row.input_tokens),
             "output_tokens": int(row.output_tokens),
@@ -114,32 +420,29 @@ async def get_by_model(db: AsyncSession, user_id: UUID, period: str = "30d") ->
     ]
 
 
-async def get_by_key(db: AsyncSession, user_id: UUID, period: str = "30d") -> list[dict]:
-    period_start = _get_period_start(period)
+async def get_by_key(db: AsyncSession, user_id: UUID, query: UsageQuery) -> list[dict]:
+    usage = _usage_source(user_id, query)
 
     result = await db.execute(
         select(
             ApiKey.key_prefix,
             ApiKey.label,
-            func.count(RequestLog.id).label("requests"),
-            func.coalesce(func.sum(RequestLog.cost_usd), 0).label("cost"),
-            func.coalesce(func.sum(RequestLog.input_tokens), 0).label("input_tokens"),
-            func.coalesce(func.sum(RequestLog.output_tokens), 0).label("output_tokens"),
-        )
-        .join(RequestLog, RequestLog.api_key_id == ApiKey.id)
-        .where(
-            ApiKey.user_id == user_id,
-            RequestLog.created_at >= period_start,
+            func.sum(usage.c.request_count).label("requests"),
+            func.coalesce(func.sum(usage.c.cost_usd), 0).label("cost"),
+            func.coalesce(func.sum(usage.c.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(usage.c.output_tokens), 0).label("output_tokens"),
         )
+        .select_from(usage)
+        .join(ApiKey, usage.c.api_key_id == ApiKey.id)
         .group_by(ApiKey.id, ApiKey.key_prefix, ApiKey.label)
-        .order_by(func.sum(RequestLog.cost_usd).desc())
+        .order_by(func.sum(usage.c.cost_usd).desc())
     )
 
     return [
         {
             "key_prefix": row.key_prefix,
             "label": row.label,
-            "requests": row.requests,
+            "requests": int(row.requests),
             "cost": float(row.cost),
             "input_tokens": int(row.input_tokens),
             "output_tokens": int(row.output_tokens),
@@ -148,43 +451,451 @@ async def get_by_key(db: AsyncSession, user_id: UUID, period: str = "30d") -> li
     ]
 
 
-async def get_request_logs(
-    db: AsyncSession, user_id: UUID, page: int = 1, limit: int = 50
+async def get_dashboard(
+    db: AsyncSession, user_id: UUID, query: UsageQuery, granularity: str = "day"
 ) -> dict:
-    keys_subq = _user_keys_filter(user_id)
-    offset = (page - 1) * limit
+    """
+    Every dashboard widget from two queries. Usage is grouped once by
+    (time bucket, key, model), which is small enough to fold in memory into
+    the summary, cost-over-time, by-model and by-key views; the latency
+    percentiles come from the merged sketches. The result has the same
+    shape as the four separate endpoints.
+    """
+    usage = _usage_source(user_id, query, granularity)
+    trunc_fn = _time_bucket(usage.c.bucket, granularity, query.tz)
+    tz = ZoneInfo(query.tz)
+
+    result = await db.execute(
+        select(
+            trunc_fn.label("bucket"),
+            ApiKey.id.label("api_key_id"),
+            ApiKey.key_prefix,
+            ApiKey.label,
+            usage.c.model,
+            func.sum(usage.c.request_count).label("requests"),
+            func.coalesce(func.sum(usage.c.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(usage.c.output_tokens), 0).label("output_tokens"),
+            func.coalesce(func.sum(usage.c.cost_usd), 0).label("cost"),
+            func.coalesce(func.sum(usage.c.latency_ms_sum), 0).label("latency_ms_sum"),
+            func.coalesce(func.sum(usage.c.cache_hits), 0).label("cache_hits"),
+        )
+        .select_from(usage)
+        .join(ApiKey, usage.c.api_key_id == ApiKey.id)
+        .group_by(trunc_fn, ApiKey.id, ApiKey.key_prefix, ApiKey.label, usage.c.model)
+    )
+
+    def totals() -> dict:
+        return {"requests": 0, "cost": Decimal(0), "input_tokens": 0, "output_tokens": 0}
+
+    def add(entry: dict, row) -> None:
+        entry["requests"] += int(row.requests)
+        entry["cost"] += row.cost
+        entry["input_tokens"] += int(row.input_tokens)
+        entry["output_tokens"] += int(row.output_tokens)
+
+    overall = totals()
+    latency_ms_sum = 0
+    cache_hits = 0
+    buckets: dict[datetime, dict] = {}
+    models: dict[str, dict] = {}
+    keys: dict[UUID, dict] = {}
+    for row in result.all():
+        add(overall, row)
+        latency_ms_sum += int(row.latency_ms_sum)
+        cache_hits += int(row.cache_hits)
+        add(buckets.setdefault(row.bucket, totals()), row)
+        add(models.setdefault(row.model, {"model": row.model, **totals()}), row)
+        add(
+            keys.setdefault(
+                row.api_key_id, {"key_prefix": row.key_prefix, "label": row.label, **totals()}
+            ),
+            row,
+        )
+
+    def widget(entries) -> list[dict]:
+        ranked = sorted(entries, key=lambda entry: entry["cost"], reverse=True)
+        return [{**entry, "cost": float(entry["cost"])} for entry in ranked]
 
-    # Count total
-    count_result = await db.execute(
-        select(func.count(RequestLog.id)).where(RequestLog.api_key_id.in_(keys_subq))
+    latency = await get_latency(db, user_id, query)
+    requests = overall["requests"]
+    return {
+        "summary": {
+            "total_requests": requests,
+            "total_input_tokens": overall["input_tokens"],
+            "total_output_tokens": overall["output_tokens"],
+            "total_cost": float(overall["cost"]),
+            "avg_latency_ms": round(latency_ms_sum / requests) if requests else 0,
+            "cache_hits": cache_hits,
+            **latency,
+            **query.describe(),
+        },
+        "cost_over_time": [
+            {"date": bucket.astimezone(tz).isoformat(), **entry, "cost": float(entry["cost"])}
+            for bucket, entry in sorted(buckets.items())
+        ],
+        "by_model": widget(models.values()),
+        "by_key": widget(keys.values()),
+    }
+
+
+async def get_latency(
+    db: AsyncSession, user_id: UUID, query: UsageQuery, group_by: str | None = None
+):
+    """
+    p50/p95/p99 of total latency and of time to first token (streams only),
+    from the sketches stored on the rollups. Accurate to within
+    sketch.RELATIVE_ACCURACY; without ``group_by`` the result is one dict,
+    otherwise one entry per model or key, busiest first.
+    """
+    result = await db.execute(_sketch_bins(user_id, query, group_by))
+    groups: dict = defaultdict(lambda: {metric: [] for metric in _LATENCY_METRICS})
+    for row in result.all():
+        groups[row.group][row.metric].append((row.bin, row.n))
+
+    def summarize(bins_by_metric: dict) -> dict:
+        return {metric: _latency_quantiles(bins) for metric, bins in bins_by_metric.items()}
+
+    if group_by is None:
+        return summarize(groups[None])
+
+    labels = {}
+    if group_by == "key" and groups:
+        keys = await db.execute(
+            select(ApiKey.id, ApiKey.key_prefix, ApiKey.label).where(ApiKey.id.in_(list(groups)))
+        )
+        labels = {row.id: {"key_prefix": row.key_prefix, "label": row.label} for row in keys.all()}
+
+    entries = []
+    for group, bins_by_metric in groups.items():
+        requests = sum(n for _, n in bins_by_metric["latency_ms"])
+        if group_by == "key":
+            if group not in labels:
+                continue
+            identity = labels[group]
+        else:
+            identity = {"model": group}
+        entries.append({**identity, "requests": int(requests), **summarize(bins_by_metric)})
+    entries.sort(key=lambda entry: entry["requests"], reverse=True)
+    return entries
+
+
+async def get_live_snapshot(db: AsyncSession, user_id: UUID) -> dict:
+    """
+    Today's (UTC) totals per key and model, read from the live daily rollup
+    row; the starting state that /analytics/live deltas are added to.
+    """
+    now = datetime.now(timezone.utc)
+    day = rollups.day_floor(now)
+    rollup = RequestRollupDaily
+    result = await db.execute(
+        select(
+            rollup.api_key_id,
+            ApiKey.key_prefix,
+            ApiKey.label,
+            rollup.model,
+            func.sum(rollup.request_count).label("requests"),
+            func.coalesce(func.sum(rollup.request_count).filter(rollup.status_code >= 400), 0).label("errors"),
+            func.sum(rollup.cost_usd).label("cost"),
+            func.sum(rollup.input_tokens).label("input_tokens"),
+            func.sum(rollup.output_tokens).label("output_tokens"),
+        )
+        .join(ApiKey, rollup.api_key_id == ApiKey.id)
+        .where(ApiKey.user_id == user_id, rollup.bucket == day)
+        .group_by(rollup.api_key_id, ApiKey.key_prefix, ApiKey.label, rollup.model)
     )
-    total = count_result.scalar()
+    return {
+        "as_of": now.isoformat(),
+        "day": day.date().isoformat(),
+        "entries": [
+            {
+                "api_key_id": str(row.api_key_id),
+                "key_prefix": row.key_prefix,
+                "label": row.label,
+                "model": row.model,
+                "requests": int(row.requests),
+                "errors": int(row.errors),
+                "cost": float(row.cost),
+                "input_tokens": int(row.input_tokens),
+                "output_tokens": int(row.output_tokens),
+            }
+            for row in result.all()
+        ],
+    }
+
+
+def _rounded(value) -> float | None:
+    return round(float(value), 1) if value is not None else None
+
+
+def _average(total, count) -> float | None:
+    return _rounded(total / count) if count else None
+
+
+async def get_performance(
+    db: AsyncSession, user_id: UUID, query: UsageQuery, group_by: str = "model"
+) -> list[dict]:
+    """
+    Latency breakdown of upstream calls per model or per key: upstream TTFB,
+    streaming TTFT and throughput, and the proxy's own overhead. Only
+    successful calls unless the query filters on another status code.
+    Cache hits carry no upstream timings and drop out of the upstream columns.
+
+    Read from the rollups like the dashboard (``plan``): counts and averages
+    from their sums, percentiles from their sketches, accurate to within
+    sketch.RELATIVE_ACCURACY.
+    """
+    query = replace(query, status_code=query.status_code or 200)
+    keys_subq = _user_keys_filter(user_id, query.api_key_id)
+    start, end = query.time_range()
+
+    parts = []
+    for span in plan(start, end, daily=True):
+        if span.source == "raw":
+            group = RequestLog.model if group_by == "model" else RequestLog.api_key_id
+            parts.append(
+                select(
+                    group.label("group"),
+                    func.count(RequestLog.id).label("requests"),
+                    func.sum(RequestLog.stream_duration_ms).label("stream_duration_ms_sum"),
+                    func.count(RequestLog.stream_duration_ms).label("stream_duration_count"),
+                    func.sum(RequestLog.output_tokens_per_sec).label("output_tokens_per_sec_sum"),
+                    func.count(RequestLog.output_tokens_per_sec).label("output_tokens_per_sec_count"),
+                )
+                .where(
+                    RequestLog.api_key_id.in_(keys_subq),
+                    RequestLog.created_at >= span.start,
+                    RequestLog.created_at < span.end,
+                    *_filters(RequestLog, query),
+                )
+                .group_by(group)
+            )
+            continue
+
+        rollup = RequestRollupDaily if span.source == "daily" else RequestRollupHourly
+        conditions = [rollup.api_key_id.in_(keys_subq), rollup.bucket >= span.start]
+        if span.end is not None:
+            conditions.append(rollup.bucket < span.end)
+        parts.append(
+            select(
+                (rollup.model if group_by == "model" else rollup.api_key_id).label("group"),
+                rollup.request_count.label("requests"),
+                rollup.stream_duration_ms_sum,
+                rollup.stream_duration_count,
+                rollup.output_tokens_per_sec_sum,
+                rollup.output_tokens_per_sec_count,
+            ).where(*conditions, *_filters(rollup, query))
+        )
 
-    # Get page
+    merged = union_all(*parts).subquery("performance")
     result = await db.execute(
+        select(
+            merged.c.group,
+            func.sum(merged.c.requests).label("requests"),
+            func.sum(merged.c.stream_duration_ms_sum).label("stream_duration_ms_sum"),
+            func.sum(merged.c.stream_duration_count).label("stream_duration_count"),
+            func.sum(merged.c.output_tokens_per_sec_sum).label("output_tokens_per_sec_sum"),
+            func.sum(merged.c.output_tokens_per_sec_count).label("output_tokens_per_sec_count"),
+        )
+        .group_by(merged.c.group)
+        .order_by(func.sum(merged.c.requests).desc())
+    )
+    totals = result.all()
+
+    bins: dict = defaultdict(lambda: {metric: [] for metric in _PERFORMANCE_METRICS})
+    result = await db.execute(_sketch_bins(user_id, query, group_by, _PERFORMANCE_METRICS))
+    for row in result.all():
+        bins[row.group][row.metric].append((row.bin, row.n))
+
+    labels = {}
+    if group_by == "key" and totals:
+        keys = await db.execute(
+            select(ApiKey.id, ApiKey.key_prefix, ApiKey.label).where(ApiKey.id.in_([row.group for row in totals]))
+        )
+        labels = {row.id: {"key_prefix": row.key_prefix, "label": row.label} for row in keys.all()}
+
+    rows = []
+    for row in totals:
+        if not row.requests:
+            continue
+        ttfb, ttft, overhead_us = (
+            sketch.quantiles(bins[row.group][metric], _QUANTILES) for metric in _PERFORMANCE_METRICS
+        )
+        group = labels.get(row.group, {}) if group_by == "key" else {"model": row.group}
+        rows.append({
+            **group,
+            "requests": int(row.requests),
+            "upstream_ttfb_ms": {"p50": _rounded(ttfb[0.5]), "p95": _rounded(ttfb[0.95])},
+            "ttft_ms": {"p50": _rounded(ttft[0.5]), "p95": _rounded(ttft[0.95])},
+            "avg_stream_duration_ms": _average(row.stream_duration_ms_sum, row.stream_duration_count),
+            "avg_output_tokens_per_sec": _average(row.output_tokens_per_sec_sum, row.output_tokens_per_sec_count),
+            "proxy_overhead_ms": {
+                f"p{round(fraction * 100)}": _rounded(value / 1000) if value is not None else None
+                for fraction, value in overhead_us.items()
+            },
+        })
+    return rows
+
+
+def encode_cursor(created_at: datetime, log_id: UUID) -> str:
+    """Opaque cursor for the row a page ended on."""
+    raw = json.dumps([created_at.isoformat(), str(log_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Inverse of ``encode_cursor``. Raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, log_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(log_id)
+    except (TypeError, ValueError, binascii.Error) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def _estimate_log_total(db: AsyncSession, user_id: UUID, query: UsageQuery) -> int:
+    """
+    Row count from the rollups (plus raw rows for partial edge hours) rather
+    than count(*) over request_logs. Rows from the last flush interval may
+    not be rolled up yet, so this can trail the true count slightly.
+    """
+    usage = _usage_source(user_id, query)
+    result = await db.execute(select(func.coalesce(func.sum(usage.c.request_count), 0)))
+    return int(result.scalar())
+
+
+async def get_request_logs(
+    db: AsyncSession,
+    user_id: UUID,
+    page: int = 1,
+    limit: int = 50,
+    cursor: str | None = None,
+    api_key_id: UUID | None = None,
+    model: str | None = None,
+    status_code: int | None = None,
+    endpoint: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_total: bool = False,
+) -> dict:
+    """
+    Newest-first request logs, paginated by keyset on (created_at, id).
+
+    Each of the user's keys is read through a LATERAL subquery that walks
+    ix_request_logs_key_created backwards from the cursor and stops after
+    one page, so the cost of a page depends on the page size and number of
+    keys, not on how deep the page is or how many logs the user has.
+    ``page`` without a cursor is still honoured for older clients, at
+    the cost of reading ``page * limit`` rows per key.
+
+    ``total`` is estimated from the rollups unless ``exact_total`` is set.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+
+    keys = select(ApiKey.id).where(ApiKey.user_id == user_id)
+    if api_key_id is not None:
+        keys = keys.where(ApiKey.id == api_key_id)
+    keys = keys.subquery("keys")
+
+    filters = []
+    if model is not None:
+        filters.append(RequestLog.model == model)
+    if status_code is not None:
+        filters.append(RequestLog.status_code == status_code)
+    if endpoint is not None:
+        filters.append(RequestLog.endpoint == endpoint)
+    if start is not None:
+        filters.append(RequestLog.created_at >= start)
+    if end is not None:
+        filters.append(RequestLog.created_at < end)
+
+    offset = 0
+    position = []
+    if cursor is not None:
+        after_created, after_id = decode_cursor(cursor)
+        position = [
+            tuple_(RequestLog.created_at, RequestLog.id) < tuple_(after_created, after_id),
+            # The row comparison alone does not prune partitions.
+            RequestLog.created_at <= after_created,
+        ]
+    else:
+        offset = (page - 1) * limit
+
+    order = (RequestLog.created_at.desc(), RequestLog.id.desc())
+    per_key = (
         select(RequestLog)
-        .where(RequestLog.api_key_id.in_(keys_subq))
-        .order_by(RequestLog.created_at.desc())
+        .where(RequestLog.api_key_id == keys.c.id, *filters, *position)
+        .order_by(*order)
+        .limit(offset + limit + 1)
+        .lateral("per_key")
+    )
+    paged = aliased(RequestLog, per_key)
+    result = await db.execute(
+        select(paged)
+        .select_from(keys)
+        .join(per_key, true())
+        .order_by(paged.created_at.desc(), paged.id.desc())
         .offset(offset)
-        .limit(limit)
+        .limit(limit + 1)
     )
     logs = result.scalars().all()
 
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1].created_at, logs[-1].id)
+
+    if exact_total:
+        count_result = await db.execute(
+            select(func.count(RequestLog.id)).where(
+                RequestLog.api_key_id.in_(select(keys.c.id)), *filters
+            )
+        )
+        total = count_result.scalar()
+    else:
+        total = await _estimate_log_total(
+            db,
+            user_id,
+            UsageQuery(
+                start=start or rollups.ORIGIN,
+                end=end,
+                api_key_id=api_key_id,
+                model=model,
+                status_code=status_code,
+                endpoint=endpoint,
+            ),
+        )
+
     return {
         "total": total,
-        "page": page,
+        "total_is_estimate": not exact_total,
+        "page": page if cursor is None else None,
         "limit": limit,
+        "next_cursor": next_cursor,
         "data": [
             {
                 "id": str(log.id),
                 "api_key_id": str(log.api_key_id),
+                "upstream_key_id": str(log.upstream_key_id) if log.upstream_key_id else None,
                 "model": log.model,
                 "input_tokens": log.input_tokens,
                 "output_tokens": log.output_tokens,
+                "cache_creation_input_tokens": log.cache_creation_input_tokens,
+                "cache_read_input_tokens": log.cache_read_input_tokens,
                 "cost_usd": float(log.cost_usd),
                 "status_code": log.status_code,
                 "latency_ms": log.latency_ms,
+                "upstream_ttfb_ms": log.upstream_ttfb_ms,
+                "ttft_ms": log.ttft_ms,
+                "output_tokens_per_sec": log.output_tokens_per_sec,
+                "proxy_overhead_ms": log.proxy_overhead_ms,
                 "endpoint": log.endpoint,
+                "cache_status": log.cache_status,
                 "created_at": log.created_at.isoformat(),
             }
             for log in logs
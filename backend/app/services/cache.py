@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with a per-entry time-to-live.
+
+    Bounded by entry count and, optionally, by the total of the ``size``
+    values passed to ``set`` (e.g. bytes).
+
+    Not thread-safe; intended for use from a single asyncio event loop, where
+    every operation runs to completion without yielding.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, size = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.total_bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None, size: int = 0) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        previous = self._data.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[2]
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value, size)
+        self.total_bytes += size
+        while len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry[2]
+        self.invalidations += 1
+        return True
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
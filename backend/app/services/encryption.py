@@ -1,26 +1,63 @@
 import base64
+from functools import lru_cache
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from app.config import settings
 
 
-def _get_fernet() -> Fernet:
+@lru_cache(maxsize=16)
+def _derive_fernet(secret: str) -> Fernet:
+    """Derive a Fernet key from a passphrase. PBKDF2 is slow on purpose, so memoize it."""
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=b"claude-usage-analytics",
         iterations=100_000,
     )
-    key = base64.urlsafe_b64encode(kdf.derive(settings.encryption_key.encode()))
+    key = base64.urlsafe_b64encode(kdf.derive(secret.encode()))
     return Fernet(key)
 
 
+def _key_ring_secrets() -> list[str]:
+    """Encryption secrets, newest first: the current key, then retired ones."""
+    secrets = [settings.encryption_key]
+    for secret in settings.previous_encryption_keys:
+        if secret and secret not in secrets:
+            secrets.append(secret)
+    return secrets
+
+
+@lru_cache(maxsize=1)
+def _get_key_ring() -> MultiFernet:
+    """
+    Encrypts with the newest key and decrypts with any key in the ring.
+
+    All derivations happen once per process; a decrypt that falls back to an
+    older key only costs an extra HMAC check, not another PBKDF2 run.
+    """
+    return MultiFernet([_derive_fernet(secret) for secret in _key_ring_secrets()])
+
+
 def encrypt_value(plaintext: str) -> str:
-    return _get_fernet().encrypt(plaintext.encode()).decode()
+    return _get_key_ring().encrypt(plaintext.encode()).decode()
 
 
 def decrypt_value(ciphertext: str) -> str:
-    return _get_fernet().decrypt(ciphertext.encode()).decode()
+    return _get_key_ring().decrypt(ciphertext.encode()).decode()
+
+
+def rotate_value(ciphertext: str) -> str:
+    """Re-encrypt a token under the newest key (no-op semantics if already current)."""
+    return _get_key_ring().rotate(ciphertext.encode()).decode()
+
+
+def needs_rotation(ciphertext: str) -> bool:
+    """True if the token does not decrypt with the newest key."""
+    try:
+        _derive_fernet(settings.encryption_key).decrypt(ciphertext.encode())
+    except Exception:
+        return True
+    return False
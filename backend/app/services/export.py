@@ -0,0 +1,326 @@
+"""
+Streaming export of raw request logs (CSV, NDJSON or Parquet).
+
+Rows are read through a server-side cursor in batches of
+``export_batch_rows`` and encoded batch by batch, so memory stays flat
+however many rows are exported: at most one batch of rows (one row group
+for Parquet) is held at a time. The range is read one day at a time in
+(created_at, id) order; each day's query prunes to a single partition and
+sorts only that day's rows, so the output comes out ordered without one
+huge sort over the whole range.
+
+CSV and NDJSON can be compressed with gzip or zstd as they are written.
+Parquet compresses its column chunks with the chosen codec instead.
+Encoding and compression are CPU-bound, so they run in a worker thread and
+a large export does not hold up the event loop serving proxy traffic.
+Parquet needs ``pyarrow`` and zstd needs ``zstandard`` (both listed in
+requirements.txt); they are only imported when asked for.
+
+Used by GET /analytics/export and by export_logs.py.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.api_key import ApiKey
+from app.models.request_log import RequestLog
+
+FORMATS = ("csv", "ndjson", "parquet")
+COMPRESSIONS = ("gzip", "zstd")
+WINDOW = timedelta(days=1)
+
+COLUMNS = (
+    RequestLog.id,
+    RequestLog.created_at,
+    RequestLog.api_key_id,
+    ApiKey.key_prefix.label("api_key_prefix"),
+    ApiKey.label.label("api_key_label"),
+    RequestLog.model,
+    RequestLog.endpoint,
+    RequestLog.status_code,
+    RequestLog.input_tokens,
+    RequestLog.output_tokens,
+    RequestLog.cache_creation_input_tokens,
+    RequestLog.cache_read_input_tokens,
+    RequestLog.cost_usd,
+    RequestLog.latency_ms,
+    RequestLog.ttft_ms,
+    RequestLog.cache_status,
+)
+FIELDS = tuple(column.key for column in COLUMNS)
+
+_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+@dataclass(frozen=True)
+class ExportQuery:
+    user_id: UUID
+    start: datetime
+    end: datetime
+    api_key_id: UUID | None = None
+    model: str | None = None
+
+
+# ---------------------------------------------------------------------------
+# Encoders: each turns batches of rows into chunks of output bytes
+# ---------------------------------------------------------------------------
+
+class CsvEncoder:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(FIELDS)
+        return self._take()
+
+    def encode(self, rows) -> bytes:
+        self._writer.writerows(
+            (row[0], row[1].isoformat(), *row[2:]) for row in rows
+        )
+        return self._take()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class NdjsonEncoder:
+    def __init__(self):
+        self._dumps = json.JSONEncoder(separators=(",", ":"), default=_json_default).encode
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows) -> bytes:
+        dumps = self._dumps
+        return "".join(dumps(dict(zip(FIELDS, row))) + "\n" for row in rows).encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    # Decimal costs; as strings so no precision is lost
+    return str(value)
+
+
+class _Sink:
+    """Write-only file that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """
+    Buffers rows up to ``row_group_rows`` and writes each full buffer as one
+    row group, so readers get reasonably sized groups whatever the batch size.
+    """
+
+    def __init__(self, compression: str | None, row_group_rows: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("api_key_id", pa.string()),
+            ("api_key_prefix", pa.string()),
+            ("api_key_label", pa.string()),
+            ("model", pa.string()),
+            ("endpoint", pa.string()),
+            ("status_code", pa.int32()),
+            ("input_tokens", pa.int64()),
+            ("output_tokens", pa.int64()),
+            ("cache_creation_input_tokens", pa.int64()),
+            ("cache_read_input_tokens", pa.int64()),
+            ("cost_usd", pa.decimal128(12, 6)),
+            ("latency_ms", pa.int32()),
+            ("ttft_ms", pa.int32()),
+            ("cache_status", pa.string()),
+        ])
+        self._sink = _Sink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression=compression or "snappy")
+        self._row_group_rows = row_group_rows
+        self._pending: list = []
+
+    def header(self) -> bytes:
+        return self._sink.take()
+
+    def encode(self, rows) -> bytes:
+        self._pending.extend(rows)
+        if len(self._pending) >= self._row_group_rows:
+            self._flush()
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        self._flush()
+        self._writer.close()
+        return self._sink.take()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        columns = [list(column) for column in zip(*self._pending)]
+        for index in (0, 2):  # UUIDs
+            columns[index] = [str(value) for value in columns[index]]
+        arrays = [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        self._pending = []
+
+
+class _Compressed:
+    """Wraps an encoder, compressing its output as a single stream."""
+
+    def __init__(self, encoder, compression: str):
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        else:
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("zstd compression requires zstandard (pip install zstandard)")
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        self._encoder = encoder
+
+    def header(self) -> bytes:
+        return self._compressor.compress(self._encoder.header())
+
+    def encode(self, rows) -> bytes:
+        return self._compressor.compress(self._encoder.encode(rows))
+
+    def finish(self) -> bytes:
+        return self._compressor.compress(self._encoder.finish()) + self._compressor.flush()
+
+
+def encoder(format: str, compression: str | None = None):
+    """
+    Encoder for ``format`` and ``compression``. Raises ValueError for an
+    unknown format or codec, or when the optional library it needs is
+    missing, before anything has been read or sent.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if format == "parquet":
+        return ParquetEncoder(compression, settings.export_parquet_row_group_rows)
+    inner = CsvEncoder() if format == "csv" else NdjsonEncoder()
+    return inner if compression is None else _Compressed(inner, compression)
+
+
+def media_type(format: str, compression: str | None = None) -> str:
+    if format != "parquet" and compression is not None:
+        return "application/gzip" if compression == "gzip" else "application/zstd"
+    return _MEDIA_TYPES[format]
+
+
+def filename(query: ExportQuery, format: str, compression: str | None = None) -> str:
+    name = f"requests-{query.start:%Y%m%dT%H%M%S}-{query.end:%Y%m%dT%H%M%S}.{format}"
+    if format != "parquet" and compression is not None:
+        name += _SUFFIXES[compression]
+    return name
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+def _window_statement(query: ExportQuery, start: datetime, end: datetime):
+    statement = (
+        select(*COLUMNS)
+        .join(ApiKey, ApiKey.id == RequestLog.api_key_id)
+        .where(
+            ApiKey.user_id == query.user_id,
+            RequestLog.created_at >= start,
+            RequestLog.created_at < end,
+        )
+        .order_by(RequestLog.created_at, RequestLog.id)
+    )
+    if query.api_key_id is not None:
+        statement = statement.where(RequestLog.api_key_id == query.api_key_id)
+    if query.model is not None:
+        statement = statement.where(RequestLog.model == query.model)
+    return statement.execution_options(yield_per=settings.export_batch_rows)
+
+
+async def stream_rows(db: AsyncSession, query: ExportQuery) -> AsyncIterator[list]:
+    """Batches of rows (tuples in FIELDS order) for ``query``, oldest first."""
+    window_start = query.start
+    while window_start < query.end:
+        window_end = min(window_start + WINDOW, query.end)
+        result = await db.stream(_window_statement(query, window_start, window_end))
+        async for batch in result.partitions():
+            yield batch
+        window_start = window_end
+
+
+async def export(db: AsyncSession, query: ExportQuery, encoder) -> AsyncIterator[bytes]:
+    """
+    Encoded chunks of the export of ``query``; empty chunks are skipped.
+    The encoder is only ever called from one thread at a time.
+    """
+    chunk = await asyncio.to_thread(encoder.header)
+    if chunk:
+        yield chunk
+    async for batch in stream_rows(db, query):
+        chunk = await asyncio.to_thread(encoder.encode, batch)
+        if chunk:
+            yield chunk
+    chunk = await asyncio.to_thread(encoder.finish)
+    if chunk:
+        yield chunk
@@ -0,0 +1,137 @@
+import json
+import re
+
+# Structural characters outside strings, and the body of a string up to its
+# closing quote (or an escape that straddles the chunk end).
+_STRUCTURAL = re.compile(rb'["{}\[\]:,]')
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*')
+
+_MAX_KEY_BYTES = 64
+
+
+class TopLevelKeyScanner:
+    """
+    Pulls selected top-level keys out of a JSON object fed in arbitrary chunks.
+
+    Memory is bounded regardless of document size: nothing is retained except
+    the raw bytes of wanted values (up to ``max_value_bytes`` each), and long
+    strings are skipped with a single regex match instead of byte-by-byte.
+    Captured values are decoded with ``json.loads`` into ``values``.
+
+    Used on request bodies ("model", "stream") and on non-streaming response
+    bodies ("model", "usage") without holding either document in memory.
+    """
+
+    def __init__(self, keys: tuple[str, ...], max_value_bytes: int = 16 * 1024):
+        self._wanted = {key.encode() for key in keys}
+        self.max_value_bytes = max_value_bytes
+        self.values: dict[str, object] = {}
+
+        self._depth = 0
+        self._in_string = False
+        self._pending_escape = False
+        self._expect_key = False
+        self._key: bytearray | None = None  # key being read, None if not a key string
+        self._current_key: bytes | None = None
+        self._capture: bytearray | None = None
+        self._capture_key = ""
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        """True once every wanted key was found or the top-level object closed."""
+        return self._done or len(self.values) == len(self._wanted)
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done or not chunk:
+            return
+
+        pos = 0
+        length = len(chunk)
+        capture_from = 0
+
+        if self._pending_escape:
+            # Second byte of an escape sequence that straddled the chunk boundary
+            self._pending_escape = False
+            pos = 1
+            if self._key is not None:
+                self._key = None  # escaped keys never match a wanted key
+
+        while pos < length:
+            if self._in_string:
+                end = _STRING_BODY.match(chunk, pos).end()
+                if self._key is not None:
+                    self._key += chunk[pos:end]
+                    if len(self._key) > _MAX_KEY_BYTES:
+                        self._key = None
+                if end >= length:
+                    pos = end
+                    break
+                if chunk[end] == 0x5C:  # lone backslash at chunk end
+                    self._pending_escape = True
+                    pos = length
+                    break
+                # closing quote
+                self._in_string = False
+                if self._key is not None:
+                    self._current_key = bytes(self._key)
+                    self._key = None
+                pos = end + 1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                pos = length
+                break
+            pos = match.start()
+            char = chunk[pos]
+
+            if char == 0x22:  # "
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key = bytearray()
+                    self._expect_key = False
+            elif char in (0x7B, 0x5B):  # { [
+                self._depth += 1
+                if self._depth == 1:
+                    if char != 0x7B:
+                        self._done = True
+                        return
+                    self._expect_key = True
+            elif char in (0x7D, 0x5D):  # } ]
+                self._depth -= 1
+                if self._depth <= 0:
+                    if self._capture is not None:
+                        self._finish_capture(chunk, capture_from, pos)
+                    self._done = True
+                    return
+            elif self._depth == 1:
+                # A top-level value runs from its ':' to the next ',' (or the
+                # closing '}') at depth 1, whether it is a scalar or a container.
+                if char == 0x3A:  # :
+                    if self._current_key in self._wanted:
+                        self._capture = bytearray()
+                        self._capture_key = self._current_key.decode()
+                        capture_from = pos + 1
+                    self._current_key = None
+                elif char == 0x2C:  # ,
+                    if self._capture is not None:
+                        self._finish_capture(chunk, capture_from, pos)
+                    self._expect_key = True
+            pos += 1
+
+            if self.done:
+                return
+
+        if self._capture is not None:
+            self._capture += chunk[capture_from:]
+            if len(self._capture) > self.max_value_bytes:
+                self._capture = None
+
+    def _finish_capture(self, chunk: bytes, start: int, end: int) -> None:
+        raw = bytes(self._capture) + chunk[start:end]
+        self._capture = None
+        try:
+            self.values[self._capture_key] = json.loads(raw)
+        except ValueError:
+            pass
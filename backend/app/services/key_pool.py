@@ -0,0 +1,155 @@
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+import httpx
+
+from app.config import settings
+from app.services.resilience import breaker_for, parse_retry_after
+
+
+@dataclass(frozen=True, slots=True)
+class UpstreamCredential:
+    """One Anthropic key a proxy key may route to. ``id`` is None for the proxy key's own key."""
+
+    id: uuid.UUID | None
+    secret: str
+    fingerprint: str
+
+    @classmethod
+    def create(cls, id: uuid.UUID | None, secret: str) -> "UpstreamCredential":
+        return cls(id=id, secret=secret, fingerprint=hashlib.sha256(secret.encode()).hexdigest()[:16])
+
+
+class _KeyLoad:
+    __slots__ = ("in_flight", "requests_remaining", "tokens_remaining", "quota_reset_at", "ejected_until", "ejections")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests_remaining: int | None = None
+        self.tokens_remaining: int | None = None
+        self.quota_reset_at = 0.0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+
+class Lease:
+    """A credential checked out for one upstream call; release() is idempotent."""
+
+    __slots__ = ("credential", "_load", "_released")
+
+    def __init__(self, credential: UpstreamCredential, load: _KeyLoad):
+        self.credential = credential
+        self._load = load
+        self._released = False
+        load.in_flight += 1
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._load.in_flight -= 1
+
+    def observe(self, response: httpx.Response) -> None:
+        """Learn remaining quota from Anthropic's rate-limit headers; eject the key on a 429."""
+        load = self._load
+        headers = response.headers
+        requests_remaining = _int_header(headers, "anthropic-ratelimit-requests-remaining")
+        if requests_remaining is not None:
+            load.requests_remaining = requests_remaining
+            load.tokens_remaining = _int_header(headers, "anthropic-ratelimit-tokens-remaining")
+            load.quota_reset_at = _reset_header(headers, "anthropic-ratelimit-requests-reset")
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response)
+            load.ejected_until = time.monotonic() + (
+                retry_after if retry_after is not None else settings.upstream_key_ejection_seconds
+            )
+            load.ejections += 1
+
+
+class KeyPool:
+    """
+    Process-wide load state for upstream keys, keyed by key fingerprint so it
+    survives proxy-key cache refreshes.
+
+    ``acquire`` picks, among a proxy key's credentials, one that is not
+    ejected and whose circuit breaker admits calls, preferring keys not
+    known to be out of request quota, then the fewest calls in flight, then
+    the most remaining tokens. If every key is unavailable, the one that recovers
+    first is returned and the caller's breaker check decides.
+    """
+
+    def __init__(self):
+        self._loads: dict[str, _KeyLoad] = {}
+
+    def _load(self, credential: UpstreamCredential) -> _KeyLoad:
+        load = self._loads.get(credential.fingerprint)
+        if load is None:
+            load = self._loads[credential.fingerprint] = _KeyLoad()
+        return load
+
+    def acquire(self, credentials: tuple[UpstreamCredential, ...]) -> Lease:
+        if len(credentials) == 1:
+            credential = credentials[0]
+            return Lease(credential, self._load(credential))
+
+        now = time.monotonic()
+        best = None
+        best_score = None
+        fallback = None
+        fallback_at = None
+        for credential in credentials:
+            load = self._load(credential)
+            breaker = breaker_for(credential.fingerprint)
+            if load.ejected_until > now or not breaker.allows_call():
+                available_at = max(load.ejected_until, breaker.opened_until)
+                if fallback_at is None or available_at < fallback_at:
+                    fallback, fallback_at = credential, available_at
+                continue
+
+            quota_known = load.requests_remaining is not None and load.quota_reset_at > now
+            saturated = quota_known and load.requests_remaining <= load.in_flight
+            tokens = load.tokens_remaining if quota_known and load.tokens_remaining is not None else 0
+            score = (saturated, load.in_flight, -tokens)
+            if best_score is None or score < best_score:
+                best, best_score = credential, score
+
+        credential = best or fallback
+        return Lease(credential, self._load(credential))
+
+    def stats(self) -> dict:
+        # Totals only: /stats is unauthenticated, so no key fingerprints
+        now = time.monotonic()
+        loads = self._loads.values()
+        return {
+            "keys": len(self._loads),
+            "in_flight": sum(load.in_flight for load in loads),
+            "ejected": sum(load.ejected_until > now for load in loads),
+            "ejections": sum(load.ejections for load in loads),
+        }
+
+
+def _int_header(headers: httpx.Headers, name: str) -> int | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _reset_header(headers: httpx.Headers, name: str) -> float:
+    """Convert an RFC 3339 reset timestamp to a monotonic deadline (default: one minute)."""
+    value = headers.get(name)
+    if value:
+        try:
+            remaining = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() - time.time()
+            return time.monotonic() + max(0.0, remaining)
+        except ValueError:
+            pass
+    return time.monotonic() + 60.0
+
+
+key_pool = KeyPool()
@@ -0,0 +1,273 @@
+"""
+Live analytics pushed to dashboards over server-sent events.
+
+Every log-writer flush publishes one compact delta per affected user with
+Postgres NOTIFY, inside the flush transaction, so deltas describe exactly the
+committed rows and reach every worker. Each worker holds one LISTEN
+connection and fans deltas out to its own subscribers in memory; each event
+is encoded once and the same bytes are queued for every subscriber.
+
+Per user with subscribers, a snapshot of today's totals is recomputed every
+``analytics_live_snapshot_interval_seconds`` and sent to all of that user's
+streams (and straight away to a new stream). Snapshots replace client state,
+so anything a client missed or double counted is corrected at the next one.
+A subscriber that falls ``analytics_live_queue_size`` events behind has its
+backlog dropped and gets a fresh snapshot instead.
+
+Notifications also bump the user's analytics cache version, so cached
+results are invalidated on every worker, not just the one that wrote. Key
+changes (key_changed) go out on the same channel and drop the proxy key
+from every worker's authentication cache; if the LISTEN connection drops,
+that whole cache is cleared since invalidations may have been missed.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import async_session, engine
+from app.middleware.proxy_auth import invalidate_all_proxy_keys, invalidate_proxy_key
+from app.services import analytics_service
+from app.services.analytics_cache import analytics_cache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "analytics_live"
+# NOTIFY payloads must stay under 8000 bytes
+_MAX_PAYLOAD_BYTES = 7500
+
+_NOTIFY = text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload")
+
+
+def event(name: str, data: dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def notify_payloads(rows, owners: dict[UUID, UUID]) -> list[str]:
+    """
+    One NOTIFY payload per user: the inserted rows summed per key and model.
+    A user whose delta would not fit gets a resync request instead.
+    """
+    totals: dict[UUID, dict[tuple, list]] = defaultdict(lambda: defaultdict(lambda: [0, 0, Decimal(0), 0, 0]))
+    for row in rows:
+        user_id = owners.get(row.api_key_id)
+        if user_id is None:
+            continue
+        acc = totals[user_id][(row.api_key_id, row.model)]
+        acc[0] += 1
+        acc[1] += row.status_code >= 400
+        acc[2] += row.cost_usd
+        acc[3] += row.input_tokens
+        acc[4] += row.output_tokens
+
+    payloads = []
+    for user_id, entries in totals.items():
+        payload = json.dumps({
+            "user_id": str(user_id),
+            "entries": [
+                {
+                    "api_key_id": str(api_key_id),
+                    "model": model,
+                    "requests": requests,
+                    "errors": errors,
+                    "cost": float(cost),
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                }
+                for (api_key_id, model), (requests, errors, cost, input_tokens, output_tokens) in entries.items()
+            ],
+        }, separators=(",", ":"))
+        if len(payload) > _MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"user_id": str(user_id), "resync": True})
+        payloads.append(payload)
+    return payloads
+
+
+async def notify(db, rows, owners: dict[UUID, UUID]) -> None:
+    """Queue deltas for ``rows`` on the caller's transaction; sent on commit."""
+    payloads = notify_payloads(rows, owners)
+    if payloads:
+        await db.execute(_NOTIFY, {"channel": CHANNEL, "payloads": payloads})
+
+
+async def key_changed(db, user_id: UUID, key_hash: str) -> None:
+    """Tell every worker, on commit, that a proxy key or its upstream keys changed."""
+    payload = json.dumps({"user_id": str(user_id), "key_hash": key_hash}, separators=(",", ":"))
+    await db.execute(_NOTIFY, {"channel": CHANNEL, "payloads": [payload]})
+
+
+class Subscriber:
+    def __init__(self, max_events: int):
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=max_events)
+
+    def offer(self, message: bytes) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class LiveHub:
+    def __init__(self, queue_size: int, snapshot_interval: float, retry_interval: float = 5.0):
+        self.queue_size = queue_size
+        self.snapshot_interval = snapshot_interval
+        self.retry_interval = retry_interval
+        self._subscribers: dict[UUID, set[Subscriber]] = {}
+        self._snapshots: dict[UUID, bytes] = {}
+        self._refresh: dict[UUID, asyncio.Event] = {}
+        self._snapshot_tasks: dict[UUID, asyncio.Task] = {}
+        self._listener: asyncio.Task | None = None
+
+        self.notifications = 0
+        self.events_sent = 0
+        self.overflows = 0
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(), name="analytics-live-listener")
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._listener, *self._snapshot_tasks.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener = None
+        self._snapshot_tasks.clear()
+
+    def subscribe(self, user_id: UUID) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        subscribers = self._subscribers.setdefault(user_id, set())
+        subscribers.add(subscriber)
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is not None:
+            subscriber.offer(snapshot)
+        if user_id not in self._snapshot_tasks:
+            self._refresh[user_id] = asyncio.Event()
+            self._snapshot_tasks[user_id] = asyncio.create_task(
+                self._snapshot_loop(user_id), name=f"analytics-live-snapshot-{user_id}"
+            )
+        return subscriber
+
+    def unsubscribe(self, user_id: UUID, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if subscribers:
+            return
+        del self._subscribers[user_id]
+        self._snapshots.pop(user_id, None)
+        self._refresh.pop(user_id, None)
+        task = self._snapshot_tasks.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def publish(self, user_id: UUID, message: bytes) -> None:
+        for subscriber in self._subscribers.get(user_id, ()):
+            if subscriber.offer(message):
+                self.events_sent += 1
+                continue
+            # Too far behind to catch up from deltas; start over from a snapshot
+            self.overflows += 1
+            subscriber.reset()
+            self._request_snapshot(user_id)
+
+    def _request_snapshot(self, user_id: UUID) -> None:
+        refresh = self._refresh.get(user_id)
+        if refresh is not None:
+            refresh.set()
+
+    async def _snapshot_loop(self, user_id: UUID) -> None:
+        refresh = self._refresh[user_id]
+        while True:
+            try:
+                async with async_session() as db:
+                    snapshot = await analytics_service.get_live_snapshot(db, user_id)
+                message = event("snapshot", snapshot)
+                self._snapshots[user_id] = message
+                self.publish(user_id, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live analytics snapshot failed for user %s", user_id)
+            refresh.clear()
+            try:
+                await asyncio.wait_for(refresh.wait(), self.snapshot_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        self.notifications += 1
+        try:
+            message = json.loads(payload)
+            user_id = UUID(message["user_id"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed live analytics notification")
+            return
+        if message.get("key_hash"):
+            invalidate_proxy_key(message["key_hash"])
+        analytics_cache.bump([user_id])
+        if user_id not in self._subscribers:
+            return
+        if "entries" not in message:  # resync, or a key change
+            self._request_snapshot(user_id)
+        else:
+            self.publish(user_id, event("delta", {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "entries": message["entries"],
+            }))
+
+    async def _listen(self) -> None:
+        """Hold one LISTEN connection, reconnecting whenever it is lost."""
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    lost = asyncio.Event()
+                    driver.add_termination_listener(lambda _: lost.set())
+                    await driver.add_listener(CHANNEL, self._on_notify)
+                    try:
+                        await lost.wait()
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(CHANNEL, self._on_notify)
+                logger.warning("Live analytics LISTEN connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live analytics LISTEN connection failed")
+            # Notifications sent while disconnected are gone; snapshots fill
+            # the gap for dashboards, and cached proxy keys are re-read
+            invalidate_all_proxy_keys()
+            for user_id in self._subscribers:
+                self._request_snapshot(user_id)
+            await asyncio.sleep(self.retry_interval)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._listener is not None and not self._listener.done(),
+            "users": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "notifications": self.notifications,
+            "events_sent": self.events_sent,
+            "overflows": self.overflows,
+        }
+
+
+live_hub = LiveHub(
+    queue_size=settings.analytics_live_queue_size,
+    snapshot_interval=settings.analytics_live_snapshot_interval_seconds,
+)
@@ -1,21 +1,20 @@
 import uuid
+from datetime import datetime, timezone
 from decimal import Decimal
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.config import settings
-from app.database import async_session
 from app.models.request_log import RequestLog
+from app.services.log_writer import log_writer
+from app.services.pricing import calculate_cost
 
+# Requests answered without their own upstream call: served from the response
+# cache, or sharing a concurrent identical call. They cost nothing.
+FREE_CACHE_STATUSES = ("hit", "coalesced")
 
-def calculate_cost(model: str, input_tokens: int, output_tokens: int) -> Decimal:
-    pricing = settings.pricing.get(model, {"input": 3.0, "output": 15.0})
-    input_cost = Decimal(str(pricing["input"])) * input_tokens / 1_000_000
-    output_cost = Decimal(str(pricing["output"])) * output_tokens / 1_000_000
-    return (input_cost + output_cost).quantize(Decimal("0.000001"))
+_MODEL_LENGTH = RequestLog.__table__.c.model.type.length
+_ENDPOINT_LENGTH = RequestLog.__table__.c.endpoint.type.length
 
 
-async def log_request(
+def log_request(
     api_key_id: uuid.UUID,
     model: str,
     input_tokens: int,
@@ -24,21 +23,59 @@ async def log_request(
     latency_ms: int,
     endpoint: str = "/v1/messages",
     metadata: dict | None = None,
+    cache_creation_input_tokens: int = 0,
+    cache_read_input_tokens: int = 0,
+    cache_status: str | None = None,
+    upstream_key_id: uuid.UUID | None = None,
+    upstream_ttfb_ms: int | None = None,
+    ttft_ms: int | None = None,
+    stream_duration_ms: int | None = None,
+    output_tokens_per_sec: float | None = None,
+    proxy_overhead_ms: float | None = None,
 ) -> None:
-    """Log a proxied request to the database. Runs as a background task."""
-    cost = calculate_cost(model, input_tokens, output_tokens)
-
-    async with async_session() as db:
-        log = RequestLog(
-            api_key_id=api_key_id,
-            model=model,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            cost_usd=cost,
-            status_code=status_code,
-            latency_ms=latency_ms,
-            endpoint=endpoint,
-            metadata_=metadata,
-        )
-        db.add(log)
-        await db.commit()
+    """
+    Queue a proxied request for logging. Never blocks and never touches the
+    database; the batched log writer persists it shortly after.
+
+    Requests with a cache_status in FREE_CACHE_STATUSES cost nothing; what
+    they would have cost is kept in metadata["saved_cost_usd"].
+
+    ``model`` can come straight from a client's request body, so anything
+    that is not a string is logged as "unknown" and long values are cut to
+    fit the column: the row goes into a shared batch insert, where one bad
+    value would fail everyone's rows.
+    """
+    if not isinstance(model, str):
+        model = "unknown"
+    model = model[:_MODEL_LENGTH]
+    endpoint = endpoint[:_ENDPOINT_LENGTH]
+    created_at = datetime.now(timezone.utc)
+    cost = calculate_cost(
+        model, input_tokens, output_tokens, cache_creation_input_tokens, cache_read_input_tokens, at=created_at,
+    )
+    if cache_status in FREE_CACHE_STATUSES:
+        metadata = {**(metadata or {}), "saved_cost_usd": str(cost)}
+        cost = Decimal(0)
+
+    log_writer.submit({
+        "id": uuid.uuid4(),
+        "api_key_id": api_key_id,
+        "model": model,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_creation_input_tokens": cache_creation_input_tokens,
+        "cache_read_input_tokens": cache_read_input_tokens,
+        "cost_usd": cost,
+        "status_code": status_code,
+        "latency_ms": latency_ms,
+        "upstream_ttfb_ms": upstream_ttfb_ms,
+        "ttft_ms": ttft_ms,
+        "stream_duration_ms": stream_duration_ms,
+        "output_tokens_per_sec": output_tokens_per_sec,
+        "proxy_overhead_ms": proxy_overhead_ms,
+        "endpoint": endpoint,
+        "cache_status": cache_status,
+        "upstream_key_id": upstream_key_id,
+        "metadata_": metadata,
+        "created_at": created_at,
+    })
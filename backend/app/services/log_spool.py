@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import struct
+import uuid
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from app.models.request_log import RequestLog
+
+logger = logging.getLogger(__name__)
+
+# Record framing: payload length, CRC32 of payload, then the payload itself.
+_HEADER = struct.Struct(">II")
+_SEGMENT_SUFFIX = ".seg"
+_CHECKPOINT_FILE = "checkpoint"
+_QUARANTINE_FILE = "quarantine.ndjson"
+
+
+def _json_default(value):
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool value of type {type(value).__name__}")
+
+
+def _build_decoders() -> dict:
+    converters = {uuid.UUID: uuid.UUID, Decimal: Decimal, datetime: datetime.fromisoformat}
+    decoders = {}
+    for column in RequestLog.__table__.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+        if python_type in converters:
+            decoders[column.key] = converters[python_type]
+    return decoders
+
+
+_DECODERS = _build_decoders()
+
+
+def encode_row(row: dict) -> bytes:
+    return json.dumps(row, default=_json_default, separators=(",", ":")).encode()
+
+
+def decode_row(payload: bytes) -> dict:
+    row = json.loads(payload)
+    for key, decode in _DECODERS.items():
+        value = row.get(key)
+        if value is not None:
+            row[key] = decode(value)
+    return row
+
+
+class LogSpool:
+    """
+    Append-only, segmented on-disk spool for request-log rows.
+
+    Rows are framed as length + CRC32 + JSON payload and appended to the
+    newest segment file, one write and (optionally) one fsync per batch.
+    A checkpoint file records how far rows have been loaded into Postgres;
+    fully loaded segments are deleted. On open, a torn record at the end of
+    the newest segment (crash mid-write) is truncated away. Rows Postgres
+    refuses outright are set aside in quarantine.ndjson, one JSON row per
+    line, so they do not hold up the rows behind them.
+
+    All methods do blocking file I/O; callers run them in a worker thread.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+
+        self._segments: dict[int, int] = {}  # seq -> size in bytes
+        self._active = None
+        self._active_seq = 0
+        self._checkpoint = (0, 0)
+
+        self.rows_appended = 0
+        self.rows_rejected = 0
+        self.rows_replayed = 0
+        self.rows_quarantined = 0
+        self.truncated_bytes = 0
+
+    # --- Lifecycle ---
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.endswith(_SEGMENT_SUFFIX):
+                seq = int(name[: -len(_SEGMENT_SUFFIX)])
+                self._segments[seq] = os.path.getsize(self._path(seq))
+
+        self._checkpoint = self._read_checkpoint()
+        for seq in [seq for seq in self._segments if seq < self._checkpoint[0]]:
+            self._remove_segment(seq)
+
+        if self._segments:
+            self._active_seq = max(self._segments)
+            self._recover_tail(self._active_seq)
+        else:
+            self._active_seq = max(self._checkpoint[0], 1)
+            self._segments[self._active_seq] = 0
+        if self._checkpoint[0] == 0:
+            self._checkpoint = (min(self._segments), 0)
+        self._active = open(self._path(self._active_seq), "ab")
+
+    def close(self) -> None:
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+
+    # --- Writing ---
+
+    def append(self, rows: list[dict]) -> int:
+        """Durably append rows. Returns how many were written (0 if over the size cap)."""
+        data = bytearray()
+        for row in rows:
+            payload = encode_row(row)
+            data += _HEADER.pack(len(payload), zlib.crc32(payload))
+            data += payload
+
+        if self.total_bytes + len(data) > self.max_bytes:
+            # The caller logs and counts the loss
+            self.rows_rejected += len(rows)
+            return 0
+
+        self._active.write(data)
+        self._active.flush()
+        if self.fsync:
+            os.fsync(self._active.fileno())
+        self._segments[self._active_seq] += len(data)
+        self.rows_appended += len(rows)
+
+        if self._segments[self._active_seq] >= self.segment_bytes:
+            self._rotate()
+        return len(rows)
+
+    def _rotate(self) -> None:
+        self._active.close()
+        self._active_seq += 1
+        self._segments[self._active_seq] = 0
+        self._active = open(self._path(self._active_seq), "ab")
+        if self.fsync:
+            self._fsync_directory()
+
+    # --- Replay ---
+
+    def read(self, max_rows: int) -> tuple[list[dict], tuple[int, int]]:
+        """
+        Read up to ``max_rows`` rows past the checkpoint.
+        Returns the rows and the position to pass to ``commit`` once they are stored.
+        """
+        rows: list[dict] = []
+        seq, offset = self._checkpoint
+
+        while len(rows) < max_rows and seq in self._segments:
+            end = self._segments[seq]
+            if offset < end:
+                # Record by record through a buffered file: the cost is the
+                # rows read, not the rest of the segment after the checkpoint
+                with open(self._path(seq), "rb") as f:
+                    f.seek(offset)
+                    while len(rows) < max_rows and offset < end:
+                        record_end = end + 1
+                        if offset + _HEADER.size <= end:
+                            length, crc = _HEADER.unpack(f.read(_HEADER.size))
+                            record_end = offset + _HEADER.size + length
+                        payload = f.read(length) if record_end <= end else b""
+                        if record_end > end or zlib.crc32(payload) != crc:
+                            logger.error("Corrupt record in spool segment %d at offset %d; skipping rest of segment",
+                                         seq, offset)
+                            offset = end
+                            break
+                        rows.append(decode_row(payload))
+                        offset = record_end
+                if offset < end:
+                    break  # stopped at max_rows
+
+            if seq == self._active_seq:
+                break
+            seq, offset = seq + 1, 0
+
+        return rows, (seq, offset)
+
+    def commit(self, position: tuple[int, int]) -> None:
+        """Mark everything before ``position`` as stored and drop finished segments."""
+        seq, _ = position
+        tmp_path = os.path.join(self.directory, _CHECKPOINT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(f"{position[0]} {position[1]}\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, _CHECKPOINT_FILE))
+        self._checkpoint = position
+
+        for old_seq in [old for old in self._segments if old < seq]:
+            self._remove_segment(old_seq)
+
+    def mark_replayed(self, count: int) -> None:
+        self.rows_replayed += count
+
+    def quarantine(self, rows: list[dict]) -> None:
+        """Keep rows that cannot be loaded out of the way, for inspection or a manual fix."""
+        with open(os.path.join(self.directory, _QUARANTINE_FILE), "ab") as f:
+            f.write(b"".join(encode_row(row) + b"\n" for row in rows))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.rows_quarantined += len(rows)
+
+    # --- Introspection ---
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._segments.values())
+
+    @property
+    def pending_bytes(self) -> int:
+        seq, offset = self._checkpoint
+        return sum(size for s, size in self._segments.items() if s >= seq) - offset
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments": len(self._segments),
+            "total_bytes": self.total_bytes,
+            "pending_bytes": self.pending_bytes,
+            "max_bytes": self.max_bytes,
+            "rows_appended": self.rows_appended,
+            "rows_replayed": self.rows_replayed,
+            "rows_rejected": self.rows_rejected,
+            "rows_quarantined": self.rows_quarantined,
+            "truncated_bytes": self.truncated_bytes,
+        }
+
+    # --- Internals ---
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{_SEGMENT_SUFFIX}")
+
+    def _read_checkpoint(self) -> tuple[int, int]:
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT_FILE)) as f:
+                seq, offset = f.read().split()
+            return int(seq), int(offset)
+        except (FileNotFoundError, ValueError):
+            return (0, 0)
+
+    def _remove_segment(self, seq: int) -> None:
+        try:
+            os.remove(self._path(seq))
+        except FileNotFoundError:
+            pass
+        self._segments.pop(seq, None)
+
+    def _recover_tail(self, seq: int) -> None:
+        """Truncate a partially written record at the end of a segment."""
+        path = self._path(seq)
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, pos)
+            payload = data[pos + _HEADER.size: pos + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            pos += _HEADER.size + length
+        if pos < len(data):
+            logger.warning("Truncating %d torn bytes from spool segment %d", len(data) - pos, seq)
+            self.truncated_bytes += len(data) - pos
+            with open(path, "r+b") as f:
+                f.truncate(pos)
+        self._segments[seq] = pos
+
+    def _fsync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
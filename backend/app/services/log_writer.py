@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import async_session
+from app.models.api_key import ApiKey
+from app.models.request_log import RequestLog
+from app.services import live, rollups
+from app.services.analytics_cache import analytics_cache
+from app.services.log_spool import LogSpool
+from app.services.metrics import LOG_FLUSH_SECONDS, LOG_ROWS_LOST
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+# Errors caused by the rows themselves (a value too long for its column, a
+# foreign key or partition that does not exist), as opposed to the database
+# being unreachable or slow: retrying the same batch can never succeed.
+_ROW_ERRORS = (DataError, IntegrityError)
+
+
+class LogWriter:
+    """
+    Buffers request-log rows in a bounded in-process queue and writes them to
+    Postgres in batches from a single background task.
+
+    A batch is flushed when it reaches ``batch_size`` rows or when
+    ``flush_interval`` seconds have passed since its first row, whichever
+    comes first. Each flush is one transaction with a multi-row INSERT that
+    also folds the inserted rows into the rollups and publishes live deltas
+    (NOTIFY, delivered on commit). After it commits, the analytics cache
+    version of every user whose keys it touched is bumped.
+
+    With a spool configured, each batch is first appended to the on-disk
+    LogSpool and then loaded from there, so rows survive a database outage
+    or a restart. Spooled rows carry their own ids and are inserted with
+    ON CONFLICT DO NOTHING, which makes replaying a batch twice harmless.
+
+    A batch that fails because of its rows rather than the database is
+    retried one row at a time; only the rows that still fail are given up
+    (quarantined, with a spool), so one bad row cannot hold up the others.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        spool: LogSpool | None = None,
+        db_timeout: float = 10.0,
+        retry_interval: float = 5.0,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self.db_timeout = db_timeout
+        self.retry_interval = retry_interval
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rows_rejected = 0
+        self.rows_failed = 0
+        self.rows_quarantined = 0
+        self.flushes = 0
+        self.db_failures = 0
+        self._db_retry_at = 0.0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        if self.spool is not None:
+            await asyncio.to_thread(self.spool.open)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="request-log-writer")
+
+    async def stop(self) -> None:
+        """Stop accepting rows and wait until everything queued has been written."""
+        if self._task is None:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        if self.spool is not None:
+            # Anything the database did not take is still on disk for next start
+            await asyncio.to_thread(self.spool.close)
+
+    def submit(self, row: dict) -> bool:
+        """Queue a row without blocking. Returns False if the row was dropped."""
+        if self._queue is None or self._closed:
+            self.rows_dropped += 1
+            LOG_ROWS_LOST.inc("not_running")
+            logger.warning("Request log writer not running; dropped log row")
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.rows_dropped += 1
+            LOG_ROWS_LOST.inc("queue_full")
+            logger.warning("Request log queue full (%d rows); dropped log row", self.max_queue)
+            return False
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            if self._has_backlog():
+                # Wake up periodically to retry loading spooled rows
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), self.retry_interval)
+                except asyncio.TimeoutError:
+                    await self._replay()
+                    continue
+            else:
+                item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        if self._has_backlog():
+            self._db_retry_at = 0.0
+            await self._replay()
+
+    async def _flush(self, rows: list[dict]) -> None:
+        if self.spool is not None:
+            written = await asyncio.to_thread(self.spool.append, rows)
+            if written < len(rows):
+                rejected = len(rows) - written
+                self.rows_rejected += rejected
+                LOG_ROWS_LOST.inc("spool_full", amount=rejected)
+                logger.error(
+                    "Request log spool full (%d bytes pending); dropped %d log rows",
+                    self.spool.pending_bytes, rejected,
+                )
+            await self._replay()
+            return
+
+        try:
+            refused = await self._insert_rows(insert(RequestLog), rows)
+        except Exception:
+            self.rows_failed += len(rows)
+            LOG_ROWS_LOST.inc("db_error", amount=len(rows))
+            logger.exception("Failed to write %d request log rows", len(rows))
+            return
+        if refused:
+            self.rows_failed += len(refused)
+            LOG_ROWS_LOST.inc("rejected_by_db", amount=len(refused))
+
+    async def _replay(self) -> None:
+        """Load spooled rows into Postgres until the spool is drained or the DB fails."""
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._db_retry_at:
+            return
+
+        while self._has_backlog():
+            rows, position = await asyncio.to_thread(self.spool.read, self.batch_size)
+            if rows:
+                try:
+                    refused = await self._insert_rows(pg_insert(RequestLog).on_conflict_do_nothing(), rows)
+                except Exception:
+                    self.db_failures += 1
+                    self._db_retry_at = loop.time() + self.retry_interval
+                    logger.exception(
+                        "Failed to load %d spooled request log rows; retrying in %.0fs",
+                        len(rows), self.retry_interval,
+                    )
+                    return
+                if refused:
+                    await asyncio.to_thread(self.spool.quarantine, refused)
+                    self.rows_quarantined += len(refused)
+                    LOG_ROWS_LOST.inc("rejected_by_db", amount=len(refused))
+                    logger.error("Quarantined %d spooled request log rows the database refused", len(refused))
+                self.spool.mark_replayed(len(rows) - len(refused))
+            await asyncio.to_thread(self.spool.commit, position)
+            if not rows:
+                return
+
+    def _has_backlog(self) -> bool:
+        return self.spool is not None and self.spool.pending_bytes > 0
+
+    async def _insert_rows(self, statement, rows: list[dict]) -> list[dict]:
+        """
+        Insert ``rows``, falling back to one row per insert if the batch is
+        refused because of its contents. Returns the rows that were refused
+        on their own; any other error (connection, timeout) is raised.
+        """
+        try:
+            await self._insert(statement, rows)
+            return []
+        except _ROW_ERRORS:
+            if len(rows) == 1:
+                logger.exception("Database refused request log row %s", rows[0].get("id"))
+                return rows
+            logger.warning("Batch of %d request log rows refused; retrying row by row", len(rows))
+        refused = []
+        for row in rows:
+            refused += await self._insert_rows(statement, [row])
+        return refused
+
+    async def _insert(self, statement, rows: list[dict]) -> None:
+        started = time.perf_counter()
+        async with async_session() as db:
+            user_ids = await asyncio.wait_for(self._write(db, statement, rows), self.db_timeout)
+        analytics_cache.bump(user_ids)
+
+        elapsed = time.perf_counter() - started
+        LOG_FLUSH_SECONDS.observe(elapsed)
+        elapsed_ms = elapsed * 1000
+        self.flushes += 1
+        self.rows_written += len(rows)
+        self.last_flush_rows = len(rows)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    @staticmethod
+    async def _write(db, statement, rows: list[dict]) -> set:
+        """Insert and roll up one batch; returns the owners of the keys it touched."""
+        result = await db.execute(statement.returning(*rollups.SOURCE_COLUMNS), rows)
+        inserted = result.all()
+        await rollups.apply(db, inserted)
+        key_ids = {row.api_key_id for row in inserted}
+        owners = {}
+        if key_ids:
+            result = await db.execute(select(ApiKey.id, ApiKey.user_id).where(ApiKey.id.in_(key_ids)))
+            owners = dict(result.all())
+            if settings.analytics_live_notify:
+                await live.notify(db, inserted, owners)
+        await db.commit()
+        return set(owners.values())
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_max": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "rows_rejected": self.rows_rejected,
+            "rows_failed": self.rows_failed,
+            "rows_quarantined": self.rows_quarantined,
+            "db_failures": self.db_failures,
+            "rows_per_flush_avg": round(self.rows_written / self.flushes, 1) if self.flushes else 0.0,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "spool": self.spool.stats() if self.spool is not None else None,
+        }
+
+
+log_writer = LogWriter(
+    max_queue=settings.log_queue_size,
+    batch_size=settings.log_batch_size,
+    flush_interval=settings.log_flush_interval_seconds,
+    spool=LogSpool(
+        directory=settings.log_spool_dir,
+        segment_bytes=settings.log_spool_segment_bytes,
+        max_bytes=settings.log_spool_max_bytes,
+        fsync=settings.log_spool_fsync,
+    ) if settings.log_spool_dir else None,
+    db_timeout=settings.log_db_timeout_seconds,
+    retry_interval=settings.log_retry_interval_seconds,
+)
@@ -0,0 +1,290 @@
+"""
+In-process Prometheus metrics for the proxy hot path.
+
+Recording is a dict lookup plus a bisect and a few integer adds, cheap
+enough to run on every request. Each process keeps its own registry; with
+``metrics_dir`` set, every worker also writes a JSON snapshot there
+periodically, and ``/metrics`` on any worker merges all snapshots so a
+scrape sees the whole server. Counters and histograms of exited workers
+are kept (their totals must not go backwards); their gauges are dropped.
+Clear the directory when the server restarts.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from bisect import bisect_left
+from pathlib import Path
+
+from app.config import settings
+from app.services.pricing import price_book
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._series: dict[tuple, object] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "labelnames": list(self.labelnames),
+            "series": [[list(labels), value] for labels, value in self._series.items()],
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        value = self._series.get(labels, 0) - amount
+        if value:
+            self._series[labels] = value
+        else:
+            # Keep per-key label sets from accumulating once they go idle
+            self._series.pop(labels, None)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # Per-bucket (non-cumulative) counts, +Inf last, then sum
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+registry = Registry()
+
+# Every model that has ever had a price; label values must not come straight
+# from clients, or any caller could mint unbounded series.
+_KNOWN_MODELS = frozenset(price_book.tables[-1].rates)
+
+
+def model_label(model: str) -> str:
+    """``model`` as a label value: itself if it is a priced model, else "other"."""
+    return model if model in _KNOWN_MODELS else "other"
+
+
+AUTH_SECONDS = registry.register(Histogram(
+    "cua_proxy_auth_seconds", "Time to authenticate a proxy key (cache hit or database lookup)",
+))
+UPSTREAM_TTFB_SECONDS = registry.register(Histogram(
+    "cua_proxy_upstream_ttfb_seconds", "Time from sending upstream to response headers, including retries",
+    ("model",),
+))
+UPSTREAM_SECONDS = registry.register(Histogram(
+    "cua_proxy_upstream_seconds", "Time from sending upstream until the response was fully relayed",
+    ("model",),
+))
+OVERHEAD_SECONDS = registry.register(Histogram(
+    "cua_proxy_overhead_seconds", "Proxy request time not spent waiting on Anthropic",
+))
+LOG_FLUSH_SECONDS = registry.register(Histogram(
+    "cua_log_flush_seconds", "Time to write one batch of request logs to Postgres",
+))
+LOG_ROWS_LOST = registry.register(Counter(
+    "cua_log_rows_lost_total", "Request log rows that never reached Postgres, by reason",
+    ("reason",),
+))
+LOG_DEFAULT_PARTITION_ROWS = registry.register(Counter(
+    "cua_log_default_partition_rows_total",
+    "Request log rows found in the DEFAULT partition because their monthly partition was missing",
+))
+REQUESTS = registry.register(Counter(
+    "cua_proxy_requests_total", "Proxied requests by model and status code",
+    ("model", "status_code"),
+))
+UPSTREAM_IN_FLIGHT = registry.register(Gauge(
+    "cua_proxy_upstream_in_flight", "Upstream calls in flight by proxy key and requested model",
+    ("key", "model"),
+))
+
+
+# ---------------------------------------------------------------------------
+# Multi-process snapshots
+# ---------------------------------------------------------------------------
+
+_task: asyncio.Task | None = None
+
+
+def _snapshot_path() -> Path:
+    return Path(settings.metrics_dir) / f"{os.getpid()}.json"
+
+
+def _local_snapshot() -> dict:
+    # Taken on the event loop thread, which is the only one that records
+    return {"pid": os.getpid(), "metrics": registry.snapshot()}
+
+
+def _write_snapshot(snapshot: dict) -> None:
+    path = _snapshot_path()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot))
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_snapshots() -> list[dict]:
+    snapshots = []
+    for path in Path(settings.metrics_dir).glob("*.json"):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        snapshot["alive"] = _pid_alive(snapshot["pid"])
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _merge(snapshots: list[dict]) -> dict:
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot["metrics"].items():
+            if metric["type"] == "gauge" and not snapshot.get("alive", True):
+                continue
+            target = merged.setdefault(name, {**metric, "series": {}})
+            for labels, value in metric["series"]:
+                key = tuple(labels)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["series"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["series"][key] = current + value
+    return merged
+
+
+def _labels(labelnames, labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render(merged: dict) -> str:
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in metric["series"].items():
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(labelnames, labels)} {_format(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labelnames, labels)} {_format(value[-1])}")
+            lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _render_all(local: dict) -> str:
+    _write_snapshot(local)
+    return _render(_merge(_read_snapshots()))
+
+
+async def render() -> str:
+    """Prometheus text exposition of this process, or of all workers when metrics_dir is set."""
+    local = _local_snapshot()
+    if not settings.metrics_dir:
+        return _render(_merge([local]))
+    return await asyncio.to_thread(_render_all, local)
+
+
+async def _snapshot_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.metrics_snapshot_interval_seconds)
+        try:
+            await asyncio.to_thread(_write_snapshot, _local_snapshot())
+        except OSError:
+            logger.exception("Could not write metrics snapshot")
+
+
+async def start() -> None:
+    global _task
+    if settings.metrics_dir and _task is None:
+        Path(settings.metrics_dir).mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(_write_snapshot, _local_snapshot())
+        _task = asyncio.create_task(_snapshot_loop(), name="metrics-snapshots")
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    # Final totals, so counters of this worker survive it
+    await asyncio.to_thread(_write_snapshot, _local_snapshot())
@@ -0,0 +1,183 @@
+"""
+Monthly range partitions of request_logs (see migration 008).
+
+A background task keeps ``log_partition_months_ahead`` months of future
+partitions in place and applies retention by dropping whole partitions
+older than ``log_retention_months`` instead of running DELETE. Should it
+fall behind, rows for a month without a partition land in the DEFAULT
+partition (migration 014) instead of failing to insert; the next run
+counts them (LOG_DEFAULT_PARTITION_ROWS), logs a warning, and moves them
+into their monthly partitions. The hourly and daily rollups are not
+partitioned and keep their history after raw rows are dropped. Each run
+takes a transaction-level advisory lock, so with several workers only one
+does the DDL at a time.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import engine
+from app.services.metrics import LOG_DEFAULT_PARTITION_ROWS
+
+logger = logging.getLogger(__name__)
+
+PARENT = "request_logs"
+DEFAULT_PARTITION = f"{PARENT}_default"
+_NAME = re.compile(r"^request_logs_p(\d{4})_(\d{2})$")
+_ADVISORY_LOCK_ID = 0x5EC1_0615  # arbitrary, fixed per application
+
+_task: asyncio.Task | None = None
+
+
+def month_floor(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+async def ensure_partitions(conn: AsyncConnection, start: datetime, end: datetime) -> list[str]:
+    """Create any missing monthly partitions covering [start, end]; returns the names created."""
+    existing = set(await _partition_names(conn))
+    created = []
+    month = month_floor(start)
+    while month <= end:
+        name = partition_name(month)
+        if name not in existing:
+            await _create_partition(conn, name, month, add_months(month, 1), DEFAULT_PARTITION in existing)
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+async def ensure_default_partition(conn: AsyncConnection) -> None:
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF {PARENT} DEFAULT'))
+
+
+async def _create_partition(conn: AsyncConnection, name: str, lower: datetime, upper: datetime, has_default: bool):
+    bounds = f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    in_range = "created_at >= :lower AND created_at < :upper"
+    params = {"lower": lower, "upper": upper}
+    if not has_default or not await conn.scalar(
+        text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})'), params
+    ):
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT} {bounds}'))
+        return
+    # Postgres will not create a partition over rows the default partition
+    # already holds for its range: build it beside the table, move the rows
+    # in, then attach it (which adds the parent's indexes)
+    await conn.execute(text(f'CREATE TABLE "{name}" (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    await conn.execute(text(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ), params)
+    await conn.execute(text(f'ALTER TABLE {PARENT} ATTACH PARTITION "{name}" {bounds}'))
+
+
+async def drop_partitions_before(conn: AsyncConnection, cutoff: datetime) -> list[str]:
+    """Drop partitions whose whole month lies before ``cutoff``; returns the names dropped."""
+    dropped = []
+    for name in await _partition_names(conn):
+        match = _NAME.match(name)
+        if match is None:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if add_months(month, 1) <= cutoff:
+            await conn.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION "{name}"'))
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+
+async def _rehome_default_rows(conn: AsyncConnection, cutoff: datetime | None) -> int:
+    """
+    Move rows that landed in the default partition into monthly partitions,
+    creating them as needed; rows older than ``cutoff`` are deleted instead.
+    Returns how many rows were found there.
+    """
+    if DEFAULT_PARTITION not in await _partition_names(conn):
+        return 0
+    count = await conn.scalar(text(f'SELECT count(*) FROM "{DEFAULT_PARTITION}"'))
+    if not count:
+        return 0
+    if cutoff is not None:
+        await conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at < :cutoff'), {"cutoff": cutoff})
+    result = await conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', created_at, 'UTC') FROM \"{DEFAULT_PARTITION}\""
+    ))
+    for month in result.scalars().all():
+        await ensure_partitions(conn, month, month)
+    return count
+
+
+async def _partition_names(conn: AsyncConnection) -> list[str]:
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :parent ORDER BY child.relname"
+    ), {"parent": PARENT})
+    return list(result.scalars())
+
+
+async def maintain() -> None:
+    now = datetime.now(timezone.utc)
+    async with engine.begin() as conn:
+        locked = await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        if not locked:
+            return
+        cutoff = None
+        if settings.log_retention_months:
+            cutoff = add_months(month_floor(now), -settings.log_retention_months)
+        stray = await _rehome_default_rows(conn, cutoff)
+        created = await ensure_partitions(conn, now, add_months(month_floor(now), settings.log_partition_months_ahead))
+        dropped = []
+        if cutoff is not None:
+            dropped = await drop_partitions_before(conn, cutoff)
+    if stray:
+        LOG_DEFAULT_PARTITION_ROWS.inc(amount=stray)
+        logger.warning(
+            "%d request_logs rows had landed in the default partition; moved to monthly partitions", stray
+        )
+    if created or dropped:
+        logger.info("request_logs partitions: created %s, dropped %s", created or "none", dropped or "none")
+
+
+async def _maintenance_loop() -> None:
+    while True:
+        try:
+            await maintain()
+        except Exception:
+            logger.exception("request_logs partition maintenance failed")
+        await asyncio.sleep(settings.log_partition_check_interval_seconds)
+
+
+async def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_maintenance_loop(), name="log-partition-maintenance")
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -0,0 +1,120 @@
+from bisect import bisect_right
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import NamedTuple
+
+from app.config import settings
+
+_MICROS = 1_000_000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Prompt caching multipliers on the base input price, used when a model's
+# price entry does not list cache prices explicitly.
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.10
+
+
+class ModelRates(NamedTuple):
+    """Prices for one model in integer micro-USD per 1M tokens."""
+
+    input: int
+    output: int
+    cache_write: int
+    cache_read: int
+
+    @classmethod
+    def from_prices(cls, prices: dict[str, float]) -> "ModelRates":
+        input_price = prices["input"]
+        return cls(
+            input=_to_micros(input_price),
+            output=_to_micros(prices["output"]),
+            cache_write=_to_micros(prices.get("cache_write", input_price * CACHE_WRITE_MULTIPLIER)),
+            cache_read=_to_micros(prices.get("cache_read", input_price * CACHE_READ_MULTIPLIER)),
+        )
+
+    def cost_micros(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        cache_creation_input_tokens: int = 0,
+        cache_read_input_tokens: int = 0,
+    ) -> int:
+        """Cost in micro-USD, rounded half-up once on the total."""
+        scaled = (
+            input_tokens * self.input
+            + output_tokens * self.output
+            + cache_creation_input_tokens * self.cache_write
+            + cache_read_input_tokens * self.cache_read
+        )
+        return (scaled + _MICROS // 2) // _MICROS
+
+
+def _to_micros(price_per_mtok: float) -> int:
+    return int(Decimal(str(price_per_mtok)) * _MICROS)
+
+
+DEFAULT_RATES = ModelRates.from_prices({"input": 3.0, "output": 15.0})
+
+
+class PriceTable(NamedTuple):
+    effective_from: datetime
+    rates: dict[str, ModelRates]
+
+
+class PriceBook:
+    """
+    Time-versioned price tables, precompiled to integer rates.
+
+    ``settings.pricing`` is the base table. Each entry of
+    ``settings.pricing_versions`` (``{"effective_from": ..., "pricing": {...}}``)
+    overrides the listed models from that instant on; unlisted models keep
+    their previous price.
+    """
+
+    def __init__(self, base: dict[str, dict[str, float]], versions: list[dict]):
+        tables = [PriceTable(_EPOCH, {model: ModelRates.from_prices(p) for model, p in base.items()})]
+        for version in sorted(versions, key=lambda v: _parse_time(v["effective_from"])):
+            rates = dict(tables[-1].rates)
+            rates.update({model: ModelRates.from_prices(p) for model, p in version["pricing"].items()})
+            tables.append(PriceTable(_parse_time(version["effective_from"]), rates))
+        self.tables = tables
+        self._starts = [table.effective_from for table in tables]
+
+    def table_at(self, at: datetime) -> PriceTable:
+        return self.tables[bisect_right(self._starts, at) - 1]
+
+    def rates_for(self, model: str, at: datetime | None = None) -> ModelRates:
+        """Rates for ``model`` in effect at ``at`` (default: now, never a future-dated version)."""
+        table = self.table_at(at if at is not None else datetime.now(timezone.utc))
+        return table.rates.get(model, DEFAULT_RATES)
+
+    def periods(self) -> list[tuple[datetime, datetime | None, dict[str, ModelRates]]]:
+        """(start, end, rates) for each version; ``end`` is None for the current one."""
+        ends = self._starts[1:] + [None]
+        return [(table.effective_from, end, table.rates) for table, end in zip(self.tables, ends)]
+
+
+def _parse_time(value) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+price_book = PriceBook(settings.pricing, settings.pricing_versions)
+
+
+def calculate_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cache_creation_input_tokens: int = 0,
+    cache_read_input_tokens: int = 0,
+    at: datetime | None = None,
+) -> Decimal:
+    """Cost in USD at the price in effect at ``at`` (default: current prices)."""
+    micros = price_book.rates_for(model, at).cost_micros(
+        input_tokens, output_tokens, cache_creation_input_tokens, cache_read_input_tokens
+    )
+    return Decimal(micros).scaleb(-6)
@@ -0,0 +1,118 @@
+import math
+import time
+import uuid
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, per_minute: int, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if they are now)."""
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount  # may go negative; later requests wait it off
+
+
+class KeyLimits:
+    __slots__ = ("rpm", "tpm", "max_concurrency", "requests", "tokens", "in_flight")
+
+    def __init__(self, rpm: int | None, tpm: int | None, max_concurrency: int | None, now: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm, now) if rpm else None
+        self.tokens = TokenBucket(tpm, now) if tpm else None
+        self.in_flight = 0
+
+
+class RateLimiter:
+    """
+    Per-ApiKey admission control for the proxy: requests/min and tokens/min
+    token buckets plus a cap on in-flight requests.
+
+    Token usage is only known once a response completes, so the tokens/min
+    bucket admits a request while it is positive and is debited with the
+    actual input+output tokens in ``release`` (zero for requests answered
+    without an upstream call; see proxy._complete). Everything runs on the event
+    loop with plain arithmetic — no locks, no I/O.
+    """
+
+    def __init__(self):
+        self._keys: dict[uuid.UUID, KeyLimits] = {}
+        self.rejected = 0
+
+    def acquire(self, key_id: uuid.UUID, rpm: int | None, tpm: int | None, max_concurrency: int | None) -> float | None:
+        """
+        Admit a request, or return the number of seconds the client should
+        wait (for a Retry-After header). Admitted requests must be released.
+        """
+        if not (rpm or tpm or max_concurrency):
+            return None
+
+        now = time.monotonic()
+        limits = self._keys.get(key_id)
+        if limits is None or (limits.rpm, limits.tpm, limits.max_concurrency) != (rpm, tpm, max_concurrency):
+            # First request, or the key's limits changed: start fresh buckets
+            in_flight = limits.in_flight if limits is not None else 0
+            limits = KeyLimits(rpm, tpm, max_concurrency, now)
+            limits.in_flight = in_flight
+            self._keys[key_id] = limits
+
+        if limits.max_concurrency and limits.in_flight >= limits.max_concurrency:
+            self.rejected += 1
+            return 1.0
+
+        wait = 0.0
+        if limits.requests is not None:
+            wait = limits.requests.wait_time(1, now)
+        if limits.tokens is not None:
+            # Admit while the bucket is positive; a tiny epsilon keeps the
+            # wait time non-zero when it is exactly empty.
+            wait = max(wait, limits.tokens.wait_time(1e-9, now))
+        if wait > 0:
+            self.rejected += 1
+            return wait
+
+        if limits.requests is not None:
+            limits.requests.take(1, now)
+        limits.in_flight += 1
+        return None
+
+    def release(self, key_id: uuid.UUID, tokens_used: int = 0) -> None:
+        limits = self._keys.get(key_id)
+        if limits is None:
+            return
+        limits.in_flight = max(0, limits.in_flight - 1)
+        if limits.tokens is not None and tokens_used:
+            limits.tokens.take(tokens_used, time.monotonic())
+
+    def stats(self) -> dict:
+        return {
+            "keys_tracked": len(self._keys),
+            "in_flight": sum(limits.in_flight for limits in self._keys.values()),
+            "rejected": self.rejected,
+        }
+
+
+def retry_after_header(wait_seconds: float) -> str:
+    return str(max(1, math.ceil(wait_seconds)))
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,274 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS, model_label
+
+if TYPE_CHECKING:
+    from app.services.key_pool import Lease
+
+# 429 rate_limit_error, 529 overloaded_error, and transient 5xx
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+# Failures where the request provably never reached Anthropic
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Upstream circuit breaker is open")
+        self.retry_after = retry_after
+
+
+@dataclass
+class RetryTrace:
+    """What happened upstream for one request: attempts, retries, and the pooled key that served it."""
+
+    attempts: int = 0
+    retries: int = 0
+    retry_wait_ms: int = 0
+    retry_statuses: list[int] = field(default_factory=list)
+    breaker_state: str = "closed"
+    lease: "Lease | None" = None
+    started: float = 0.0
+    headers_at: float = 0.0
+    labels: tuple[str, str] = ("", "")
+    upstream_seconds: float | None = None
+
+    def begin(self, key: str, model: str) -> None:
+        """Start timing the upstream call and count it as in flight for (key, model)."""
+        self.started = time.monotonic()
+        self.labels = (key, model_label(model))
+        UPSTREAM_IN_FLIGHT.inc(*self.labels)
+
+    def finish(self) -> float:
+        """Release the lease and the in-flight slot (once); returns seconds spent upstream."""
+        self.release()
+        if self.upstream_seconds is None:
+            if not self.started:
+                return 0.0
+            self.upstream_seconds = time.monotonic() - self.started
+            UPSTREAM_IN_FLIGHT.dec(*self.labels)
+            UPSTREAM_SECONDS.observe(self.upstream_seconds, self.labels[1])
+        return self.upstream_seconds
+
+    @property
+    def upstream_key_id(self):
+        return self.lease.credential.id if self.lease is not None else None
+
+    def release(self) -> None:
+        if self.lease is not None:
+            self.lease.release()
+
+    def as_metadata(self) -> dict | None:
+        if not self.retries and self.breaker_state == "closed":
+            return None
+        return {
+            "upstream_attempts": self.attempts,
+            "upstream_retries": self.retries,
+            "upstream_retry_wait_ms": self.retry_wait_ms,
+            "upstream_retry_statuses": self.retry_statuses,
+            "breaker_state": self.breaker_state,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic so retries cannot multiply
+    load during an outage: every first attempt deposits ``ratio`` tokens,
+    every retry withdraws one, and a small trickle allows retries at low volume.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Per-upstream-key breaker. Opens after ``failure_threshold`` consecutive
+    failures (429/529/5xx/connection errors) for ``cooldown`` seconds, or for
+    longer if Anthropic's retry-after says so. Then lets a single probe
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.opened_until else "half_open"
+
+    def allows_call(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def before_call(self) -> str:
+        """Raise CircuitOpenError if calls are not allowed; returns the state."""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self.opened_until - time.monotonic())
+        if state == "half_open":
+            if self._probing:
+                raise CircuitOpenError(1.0)
+            self._probing = True
+        return state
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self, retry_after: float | None = None) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_until = time.monotonic() + max(self.cooldown, retry_after or 0.0)
+
+    def abandon_probe(self) -> None:
+        """The half-open probe ended without an outcome (e.g. cancelled); let another through."""
+        self._probing = False
+
+
+def parse_retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def backoff_delay(retry: int, retry_after: float | None) -> float:
+    """Full-jitter exponential backoff, but never sooner than Anthropic's retry-after."""
+    ceiling = min(settings.upstream_retry_max_delay, settings.upstream_retry_base_delay * (2 ** retry))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+retry_budget = RetryBudget(
+    ratio=settings.upstream_retry_budget_ratio,
+    min_per_second=settings.upstream_retry_budget_min_per_second,
+)
+
+
+def breaker_for(fingerprint: str) -> CircuitBreaker:
+    """The breaker for an upstream key, by key fingerprint (see key_pool.UpstreamCredential)."""
+    breaker = _breakers.get(fingerprint)
+    if breaker is None:
+        breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_cooldown_seconds)
+        _breakers[fingerprint] = breaker
+    return breaker
+
+
+async def send_with_retries(
+    choose: Callable[[], CircuitBreaker],
+    send: Callable[[], Awaitable[httpx.Response]],
+    trace: RetryTrace,
+    replayable: bool,
+    failover: bool = False,
+) -> httpx.Response:
+    """
+    Call ``send`` until it returns a non-retryable response, retries run out,
+    or the retry budget is spent; the last response is returned as-is.
+
+    Only the response status is inspected, so for streams every retry
+    happens before the first byte reaches the client. Bodies that were
+    streamed from the client cannot be replayed (``replayable=False``) and
+    get a single attempt.
+
+    ``choose`` runs before every attempt (so a retry can move to another
+    pooled upstream key) and returns the breaker guarding that attempt.
+    With ``failover`` (more than one pooled key) the failed key's
+    retry-after is ignored, and a retry that lands on a different key goes
+    out at once; only a retry on the same key waits out the backoff.
+    """
+    retry_budget.deposit()
+    failed: CircuitBreaker | None = None
+    delay = 0.0
+    while True:
+        breaker = choose()
+        if breaker is failed:
+            trace.retry_wait_ms += int(delay * 1000)
+            await asyncio.sleep(delay)
+        trace.breaker_state = breaker.before_call()
+        trace.attempts += 1
+
+        try:
+            response = await send()
+        except httpx.TransportError as exc:
+            breaker.record_failure()
+            if not (isinstance(exc, RETRYABLE_ERRORS) and _may_retry(trace, replayable)):
+                raise
+            delay = backoff_delay(trace.retries, None)
+            trace.retry_statuses.append(0)
+        except BaseException:
+            # Cancelled, or the client's streamed body failed: no verdict on
+            # the key, but a half-open probe must not stay claimed forever.
+            if trace.breaker_state == "half_open":
+                breaker.abandon_probe()
+            raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                breaker.record_success()
+                return response
+
+            retry_after = parse_retry_after(response)
+            breaker.record_failure(retry_after)
+            if failover:
+                retry_after = None
+            elif retry_after is not None and retry_after > settings.upstream_retry_max_delay:
+                return response  # the client is better placed to wait that long
+            if not _may_retry(trace, replayable):
+                return response
+            delay = backoff_delay(trace.retries, retry_after)
+            trace.retry_statuses.append(response.status_code)
+            await response.aclose()
+
+        trace.retries += 1
+        failed = breaker
+
+
+def _may_retry(trace: RetryTrace, replayable: bool) -> bool:
+    return replayable and trace.retries < settings.upstream_max_retries and retry_budget.withdraw()
+
+
+def stats() -> dict:
+    return {
+        "retry_budget_tokens": round(retry_budget.tokens, 2),
+        "retry_budget_exhausted": retry_budget.exhausted,
+        # Counts only: /stats is unauthenticated, so no key fingerprints
+        "breakers": dict(Counter(breaker.state for breaker in _breakers.values())),
+    }
@@ -0,0 +1,207 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Request headers that change what Anthropic returns for the same body
+_VARY_HEADERS = ("anthropic-version", "anthropic-beta")
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    body: bytes
+    content_type: str
+    model: str
+    usage: dict
+
+
+def canonical_body_hash(request_data: dict) -> str:
+    """Stable hash of a decoded request body, independent of key order and whitespace."""
+    canonical = json.dumps(request_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def request_key(request_data: dict, anthropic_key: str, forward_headers: dict) -> str:
+    """
+    Identity of an upstream request: canonical body, plus the upstream key
+    (responses never cross Anthropic accounts) and the headers that select
+    API behaviour.
+    """
+    scope = hashlib.sha256(anthropic_key.encode()).hexdigest()
+    vary = "|".join(forward_headers.get(name, "") for name in _VARY_HEADERS)
+    digest = hashlib.sha256(f"{scope}|{vary}|{canonical_body_hash(request_data)}".encode())
+    return digest.hexdigest()
+
+
+def is_deterministic(request_data: dict) -> bool:
+    """Non-streaming with temperature explicitly 0 — safe to share one response."""
+    return not request_data.get("stream", False) and request_data.get("temperature") == 0
+
+
+class ResponseCache:
+    """
+    Exact-match cache of successful non-streaming /v1/messages responses.
+
+    Memory tier: LRU bounded by total body bytes. Optional disk tier: one file
+    per entry (JSON header line + body), bounded by total bytes, oldest files
+    removed first. Disk reads/writes run in worker threads; the disk byte
+    count and eviction are guarded by a lock, so concurrent writers neither
+    skew the count nor evict the same files twice.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entry_bytes: int,
+        ttl_seconds: float,
+        disk_dir: str | None = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(max_entries=1_000_000, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes: int | None = None
+        self._disk_lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+    async def get(self, key: str) -> CachedResponse | None:
+        entry = self._memory.get(key)
+        if entry is not None or not self.disk_dir:
+            return entry
+
+        loaded = await asyncio.to_thread(self._disk_read, key)
+        if loaded is None:
+            return None
+        entry, expires_at = loaded
+        self.disk_hits += 1
+        self._memory.set(key, entry, ttl_seconds=expires_at - time.time(), size=len(entry.body))
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse, ttl_seconds: float | None = None) -> None:
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        ttl = ttl_seconds or self.ttl_seconds
+        self._memory.set(key, entry, ttl_seconds=ttl, size=len(entry.body))
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._disk_write, key, entry, time.time() + ttl)
+            except OSError:
+                logger.exception("Failed to write response cache entry to disk")
+
+    def stats(self) -> dict:
+        return {
+            "memory": self._memory.stats(),
+            "disk_dir": self.disk_dir,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_hits": self.disk_hits,
+            "disk_writes": self.disk_writes,
+        }
+
+    # --- Disk tier ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_read(self, key: str) -> tuple[CachedResponse, float] | None:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                header = json.loads(f.readline())
+                body = f.read()
+            expires_at = float(header["expires_at"])
+            entry = CachedResponse(body, header["content_type"], header["model"], header["usage"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Unreadable or malformed: a miss, and the next put replaces it
+            return None
+        if expires_at <= time.time():
+            with self._disk_lock:
+                try:
+                    stat = os.stat(path)
+                    if stat.st_ino == inode:  # not replaced by a fresh write meanwhile
+                        os.remove(path)
+                        if self._disk_bytes is not None:
+                            self._disk_bytes -= stat.st_size
+                except OSError:
+                    pass
+            return None
+        return entry, expires_at
+
+    def _disk_write(self, key: str, entry: CachedResponse, expires_at: float) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = json.dumps({
+            "expires_at": expires_at,
+            "content_type": entry.content_type,
+            "model": entry.model,
+            "usage": entry.usage,
+        }).encode()
+        # A temp file per write: concurrent writers of one key must not share it
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + b"\n")
+                f.write(entry.body)
+            with self._disk_lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+                try:
+                    previous_size = os.path.getsize(path)
+                except OSError:
+                    previous_size = 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(header) + 1 + len(entry.body) - previous_size
+                self.disk_writes += 1
+                if self._disk_bytes > self.disk_max_bytes:
+                    self._disk_evict()
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    def _disk_evict(self) -> None:
+        """Remove the oldest files down to 90% of the budget. Called with the lock held."""
+        for file_path, size, _ in sorted(self._disk_files(), key=lambda item: item[2]):
+            if self._disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            try:
+                os.remove(file_path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".tmp"):  # being written
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.response_cache_max_bytes,
+    max_entry_bytes=settings.response_cache_max_entry_bytes,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    disk_dir=settings.response_cache_dir,
+    disk_max_bytes=settings.response_cache_disk_max_bytes,
+)
@@ -0,0 +1,281 @@
+"""
+Hourly and daily rollups of request_logs (request_rollups_hourly,
+request_rollups_daily).
+
+The log writer inserts each batch with RETURNING the columns below and
+folds exactly the rows that were inserted into both rollups, in the same
+transaction, so rollups never drift from the raw rows (spool replays that
+hit ON CONFLICT DO NOTHING return nothing and add nothing). Anything that
+rewrites raw rows afterwards (recompute_costs.py, seed.py) calls rebuild()
+for the affected range.
+
+Besides plain sums, each rollup row carries latency, TTFT, upstream TTFB
+and proxy overhead sketches (app/services/sketch.py), merged on upsert by
+the sketch_merge() SQL function.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import DateTime, Text, and_, cast, delete, func, insert, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.request_log import RequestLog
+from app.models.request_rollup import RequestRollupDaily, RequestRollupHourly
+from app.services import sketch
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+# Bucket origin; also the lower bound for "all time" queries
+ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# What the log writer's INSERT ... RETURNING hands to apply()
+SOURCE_COLUMNS = (
+    RequestLog.created_at,
+    RequestLog.api_key_id,
+    RequestLog.model,
+    RequestLog.input_tokens,
+    RequestLog.output_tokens,
+    RequestLog.cache_creation_input_tokens,
+    RequestLog.cache_read_input_tokens,
+    RequestLog.cost_usd,
+    RequestLog.latency_ms,
+    RequestLog.cache_status,
+    RequestLog.status_code,
+    RequestLog.endpoint,
+    RequestLog.ttft_ms,
+    RequestLog.upstream_ttfb_ms,
+    RequestLog.proxy_overhead_ms,
+    RequestLog.stream_duration_ms,
+    RequestLog.output_tokens_per_sec,
+)
+
+# Primary key of both rollup tables
+DIMENSIONS = ("bucket", "api_key_id", "model", "status_code", "endpoint")
+
+_SUMMED = (
+    "request_count",
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+    "cost_usd",
+    "latency_ms_sum",
+    "cache_hits",
+    "stream_duration_ms_sum",
+    "stream_duration_count",
+    "output_tokens_per_sec_sum",
+    "output_tokens_per_sec_count",
+)
+
+# Sketch column -> (the request_logs column it summarizes, scale). Proxy
+# overhead is mostly below a millisecond, the sketches' smallest value, so
+# it is sketched in microseconds.
+_SKETCHED = {
+    "latency_sketch": (RequestLog.__table__.c.latency_ms, 1),
+    "ttft_sketch": (RequestLog.__table__.c.ttft_ms, 1),
+    "ttfb_sketch": (RequestLog.__table__.c.upstream_ttfb_ms, 1),
+    "overhead_sketch": (RequestLog.__table__.c.proxy_overhead_ms, 1000),
+}
+
+
+def sketched_value(name: str, table=RequestLog.__table__):
+    """SQL value that sketch column ``name`` summarizes, read from ``table`` (request_logs)."""
+    column, scale = _SKETCHED[name]
+    value = table.c[column.key]
+    return value * scale if scale != 1 else value
+
+
+def hour_floor(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ceil(value: datetime) -> datetime:
+    floor = hour_floor(value)
+    return floor if floor == value else floor + HOUR
+
+
+def day_floor(value: datetime) -> datetime:
+    return hour_floor(value).replace(hour=0)
+
+
+def day_ceil(value: datetime) -> datetime:
+    floor = day_floor(value)
+    return floor if floor == value else floor + DAY
+
+
+def _bin(interval: str, column):
+    return func.date_bin(literal_column(f"interval '{interval}'"), column, literal(ORIGIN, DateTime(timezone=True)))
+
+
+def hour_bucket(column):
+    """SQL equivalent of hour_floor; independent of the session time zone."""
+    return _bin("1 hour", column)
+
+
+def quarter_hour_bucket(column):
+    """
+    15-minute buckets. Every UTC offset in use is a multiple of 15 minutes,
+    so these never straddle a local hour or day, even at :30 and :45 offsets.
+    """
+    return _bin("15 minutes", column)
+
+
+def day_bucket(column):
+    """SQL equivalent of day_floor; independent of the session time zone."""
+    return _bin("1 day", column)
+
+
+def aggregate(rows, floor=hour_floor) -> list[dict]:
+    """Fold inserted request_logs rows into rollup deltas, in primary-key order."""
+    totals: dict[tuple, list] = defaultdict(lambda: [0, 0, 0, 0, 0, Decimal(0), 0, 0, 0, 0, 0.0, 0])
+    sketches: dict[tuple, dict[str, Counter]] = defaultdict(lambda: {name: Counter() for name in _SKETCHED})
+    for row in rows:
+        key = (floor(row.created_at), row.api_key_id, row.model, row.status_code, row.endpoint)
+        acc = totals[key]
+        acc[0] += 1
+        acc[1] += row.input_tokens
+        acc[2] += row.output_tokens
+        acc[3] += row.cache_creation_input_tokens
+        acc[4] += row.cache_read_input_tokens
+        acc[5] += row.cost_usd
+        acc[6] += row.latency_ms
+        acc[7] += row.cache_status == "hit"
+        if row.stream_duration_ms is not None:
+            acc[8] += row.stream_duration_ms
+            acc[9] += 1
+        if row.output_tokens_per_sec is not None:
+            acc[10] += row.output_tokens_per_sec
+            acc[11] += 1
+        for name, (column, scale) in _SKETCHED.items():
+            value = getattr(row, column.key)
+            if value is not None:
+                sketches[key][name][str(sketch.bin_index(value * scale))] += 1
+
+    # Sorted so concurrent writers lock rollup rows in the same order
+    return [
+        {
+            **dict(zip(DIMENSIONS, key)),
+            **dict(zip(_SUMMED, acc)),
+            **{name: dict(bins) for name, bins in sketches[key].items()},
+        }
+        for key, acc in sorted(totals.items(), key=lambda item: str(item[0]))
+    ]
+
+
+async def _upsert(db: AsyncSession, model, deltas: list[dict]) -> None:
+    table = model.__table__
+    statement = pg_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[name] for name in DIMENSIONS],
+        set_={
+            **{name: table.c[name] + statement.excluded[name] for name in _SUMMED},
+            **{
+                name: func.sketch_merge(table.c[name], statement.excluded[name], type_=JSONB)
+                for name in _SKETCHED
+            },
+        },
+    )
+    await db.execute(statement, deltas)
+
+
+async def apply(db: AsyncSession, rows) -> None:
+    """Add inserted rows to the rollups; runs inside the caller's transaction."""
+    if not rows:
+        return
+    await _upsert(db, RequestRollupHourly, aggregate(rows))
+    await _upsert(db, RequestRollupDaily, aggregate(rows, day_floor))
+
+
+def _raw_sketches(name: str, bucket, lo: datetime, hi: datetime):
+    """Per-dimension sketches of one request_logs column over [lo, hi), as a subquery."""
+    logs = RequestLog.__table__
+    value = sketched_value(name)
+    index = sketch.bin_index_sql(value)
+    dims = (bucket, logs.c.api_key_id, logs.c.model, logs.c.status_code, logs.c.endpoint)
+    bins = (
+        select(*(dim.label(label) for dim, label in zip(dims, DIMENSIONS)), index.label("bin"), func.count().label("n"))
+        .where(logs.c.created_at >= lo, logs.c.created_at < hi, value.is_not(None))
+        .group_by(*dims, index)
+        .subquery()
+    )
+    return (
+        select(*(bins.c[label] for label in DIMENSIONS), func.jsonb_object_agg(cast(bins.c.bin, Text), bins.c.n).label(name))
+        .group_by(*(bins.c[label] for label in DIMENSIONS))
+        .subquery()
+    )
+
+
+async def rebuild(db: AsyncSession, start: datetime, end: datetime) -> None:
+    """
+    Recompute the hourly rollups of every hour overlapping [start, end) from
+    raw rows, then the daily rollups of every day overlapping it from the
+    hourly ones. Safe while the log writer is running; the caller commits.
+    """
+    lo, hi = hour_floor(start), hour_ceil(end)
+    table = RequestRollupHourly.__table__
+    logs = RequestLog.__table__
+
+    await db.execute(delete(table).where(table.c.bucket >= lo, table.c.bucket < hi))
+
+    bucket = hour_bucket(logs.c.created_at)
+    totals = (
+        select(
+            bucket.label("bucket"),
+            logs.c.api_key_id,
+            logs.c.model,
+            logs.c.status_code,
+            logs.c.endpoint,
+            func.count().label("request_count"),
+            func.sum(logs.c.input_tokens).label("input_tokens"),
+            func.sum(logs.c.output_tokens).label("output_tokens"),
+            func.sum(logs.c.cache_creation_input_tokens).label("cache_creation_input_tokens"),
+            func.sum(logs.c.cache_read_input_tokens).label("cache_read_input_tokens"),
+            func.sum(logs.c.cost_usd).label("cost_usd"),
+            func.sum(logs.c.latency_ms).label("latency_ms_sum"),
+            func.count().filter(logs.c.cache_status == "hit").label("cache_hits"),
+            func.coalesce(func.sum(logs.c.stream_duration_ms), 0).label("stream_duration_ms_sum"),
+            func.count(logs.c.stream_duration_ms).label("stream_duration_count"),
+            func.coalesce(func.sum(logs.c.output_tokens_per_sec), 0).label("output_tokens_per_sec_sum"),
+            func.count(logs.c.output_tokens_per_sec).label("output_tokens_per_sec_count"),
+        )
+        .where(and_(logs.c.created_at >= lo, logs.c.created_at < hi))
+        .group_by(bucket, logs.c.api_key_id, logs.c.model, logs.c.status_code, logs.c.endpoint)
+        .subquery()
+    )
+    source = totals
+    sketches = []
+    for name in _SKETCHED:
+        sketched = _raw_sketches(name, bucket, lo, hi)
+        source = source.outerjoin(sketched, and_(*(totals.c[dim] == sketched.c[dim] for dim in DIMENSIONS)))
+        sketches.append(func.coalesce(sketched.c[name], cast("{}", JSONB)))
+    await db.execute(
+        insert(table).from_select(
+            [*DIMENSIONS, *_SUMMED, *_SKETCHED],
+            select(*(totals.c[name] for name in (*DIMENSIONS, *_SUMMED)), *sketches).select_from(source),
+        )
+    )
+
+    lo, hi = day_floor(lo), day_ceil(hi)
+    daily = RequestRollupDaily.__table__
+    await db.execute(delete(daily).where(daily.c.bucket >= lo, daily.c.bucket < hi))
+
+    day = day_bucket(table.c.bucket)
+    await db.execute(
+        insert(daily).from_select(
+            [*DIMENSIONS, *_SUMMED, *_SKETCHED],
+            select(
+                day,
+                table.c.api_key_id,
+                table.c.model,
+                table.c.status_code,
+                table.c.endpoint,
+                *(func.sum(table.c[name]) for name in _SUMMED),
+                *(func.sketch_merge_agg(table.c[name], type_=JSONB) for name in _SKETCHED),
+            )
+            .where(table.c.bucket >= lo, table.c.bucket < hi)
+            .group_by(day, table.c.api_key_id, table.c.model, table.c.status_code, table.c.endpoint),
+        )
+    )
@@ -0,0 +1,101 @@
+"""
+Mergeable quantile sketches for latencies (DDSketch-style).
+
+A sketch is a sparse histogram over logarithmic bins: a value v >= 1 (in
+milliseconds) falls into bin ceil(log_gamma(v)), and every value in a bin is
+within RELATIVE_ACCURACY of the bin's representative value. Two sketches
+merge by adding counts bin by bin, so per-hour sketches stored on the rollup
+rows combine into exact-to-the-bin quantiles for any range and filter.
+
+Values are clamped to [1ms, MAX_VALUE_MS], which bounds a sketch to
+MAX_INDEX + 1 bins (about 400) however many values it holds. Sketches are
+stored as JSONB objects mapping the bin index (as text) to a count; the
+sketch_merge() SQL function and sketch_merge_agg() aggregate in DDL merge
+them inside Postgres (created by migration 011, or by seed.py for a schema
+built with create_all).
+"""
+
+import math
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import Float, Integer, cast, func, literal
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+MAX_VALUE_MS = 3_600_000
+MAX_INDEX = math.ceil(math.log(MAX_VALUE_MS) / _LOG_GAMMA)
+
+
+DDL = (
+    """
+    CREATE OR REPLACE FUNCTION sketch_merge(a jsonb, b jsonb) RETURNS jsonb
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT coalesce(jsonb_object_agg(key, total), '{}'::jsonb)
+        FROM (
+            SELECT key, sum(value::bigint) AS total
+            FROM (
+                SELECT * FROM jsonb_each_text(coalesce(a, '{}'::jsonb))
+                UNION ALL
+                SELECT * FROM jsonb_each_text(coalesce(b, '{}'::jsonb))
+            ) AS bins
+            GROUP BY key
+        ) AS merged
+    $$
+    """,
+    """
+    CREATE OR REPLACE AGGREGATE sketch_merge_agg(jsonb) (
+        SFUNC = sketch_merge,
+        STYPE = jsonb,
+        INITCOND = '{}'
+    )
+    """,
+)
+
+
+def bin_index(value: float) -> int:
+    return min(math.ceil(math.log(max(value, 1)) / _LOG_GAMMA), MAX_INDEX)
+
+
+def bin_value(index: int) -> float:
+    """Representative value of a bin: within RELATIVE_ACCURACY of everything in it."""
+    return 2 * GAMMA**index / (GAMMA + 1)
+
+
+def bin_index_sql(column):
+    """SQL equivalent of bin_index for a numeric column."""
+    index = func.ceil(func.ln(func.greatest(cast(column, Float), 1)) / literal(_LOG_GAMMA, Float))
+    return cast(func.least(index, MAX_INDEX), Integer)
+
+
+def build(values: Iterable[float | None]) -> dict[str, int]:
+    """Sketch of the non-null ``values``, in the stored (JSON) form."""
+    counts = Counter(bin_index(value) for value in values if value is not None)
+    return {str(index): count for index, count in counts.items()}
+
+
+def quantiles(bins: Iterable[tuple[int, int]], fractions: Iterable[float]) -> dict[float, float | None]:
+    """
+    Estimate quantiles from (bin index, count) pairs, which may repeat an
+    index (e.g. straight from several unmerged sketches).
+    """
+    merged: Counter = Counter()
+    for index, count in bins:
+        merged[int(index)] += int(count)
+    total = sum(merged.values())
+    fractions = sorted(fractions)
+    if total == 0:
+        return {fraction: None for fraction in fractions}
+
+    result = {}
+    ordered = sorted(merged.items())
+    position = 0
+    seen = ordered[0][1]
+    for fraction in fractions:
+        rank = fraction * (total - 1)
+        while seen <= rank:
+            position += 1
+            seen += ordered[position][1]
+        result[fraction] = bin_value(ordered[position][0])
+    return result
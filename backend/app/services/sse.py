@@ -0,0 +1,110 @@
+import json
+import time
+
+# Only these events carry usage; everything else (content_block_delta, ping,
+# ...) is forwarded without being decoded.
+_USAGE_EVENTS = (b"message_start", b"message_delta")
+
+
+class SSEUsageSniffer:
+    """
+    Incrementally scans raw SSE bytes from Anthropic for usage data.
+
+    Anthropic streaming sends:
+    - event: message_start  (contains model, input_tokens in usage)
+    - event: content_block_delta (content chunks)
+    - event: message_delta  (contains output_tokens in usage)
+    - event: message_stop
+
+    Chunks are fed exactly as received from upstream. Events are split on
+    blank lines; as soon as an event's first line shows it is not one of the
+    usage events, the rest of it is skipped without buffering or decoding.
+    Only message_start and message_delta payloads go through ``json.loads``.
+    """
+
+    def __init__(self, model: str, max_event_bytes: int = 64 * 1024):
+        self.model = model
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+        # time.monotonic() when the first content_block_delta went by
+        self.first_token_at: float | None = None
+        self.max_event_bytes = max_event_bytes
+        self._pending = b""
+        self._skipping = False
+
+    def feed(self, chunk: bytes) -> None:
+        data = self._pending + chunk if self._pending else chunk
+        pos = 0
+
+        while True:
+            end = data.find(b"\n\n", pos)
+            if end == -1:
+                break
+            if not self._skipping:
+                self._handle_event(data[pos:end])
+            self._skipping = False
+            pos = end + 2
+
+        rest = data[pos:]
+        if not self._skipping:
+            newline = rest.find(b"\n")
+            if newline != -1 and not self._check_header(rest[:newline]):
+                self._skipping = True
+            elif len(rest) > self.max_event_bytes:
+                self._skipping = True
+
+        # While skipping, keep one byte so a blank line split across chunks
+        # is still recognized as the event boundary.
+        self._pending = rest[-1:] if self._skipping else rest
+
+    def _check_header(self, line: bytes) -> bool:
+        """Whether an event with this first line carries usage; notes the first token."""
+        if self.first_token_at is None and b"content_block_delta" in line:
+            self.first_token_at = time.monotonic()
+        return self._is_usage_header(line)
+
+    @staticmethod
+    def _is_usage_header(line: bytes) -> bool:
+        if line.startswith(b"event:"):
+            return line[6:].strip() in _USAGE_EVENTS
+        # No event line: the data line itself is the header.
+        return line.startswith(b"data:") and any(name in line for name in _USAGE_EVENTS)
+
+    def _handle_event(self, block: bytes) -> None:
+        # Events that completed inside one chunk never went through the
+        # header check in feed(), so it is repeated here before decoding.
+        block = block.lstrip(b"\n")
+        newline = block.find(b"\n")
+        if not self._check_header(block if newline == -1 else block[:newline]):
+            return
+        for line in block.split(b"\n"):
+            if line.startswith(b"data:"):
+                try:
+                    data = json.loads(line[5:])
+                except ValueError:
+                    return
+                break
+        else:
+            return
+
+        if not isinstance(data, dict):
+            return
+        event_type = data.get("type")
+        if event_type == "message_start":
+            message = data.get("message") or {}
+            self.model = message.get("model") or self.model
+            self._update_usage(message.get("usage") or {})
+        elif event_type == "message_delta":
+            self._update_usage(data.get("usage") or {})
+
+    def _update_usage(self, usage: dict) -> None:
+        # message_delta usage is cumulative; fields it omits keep their
+        # message_start values.
+        self.input_tokens = usage.get("input_tokens") or self.input_tokens
+        self.output_tokens = usage.get("output_tokens") or self.output_tokens
+        self.cache_creation_input_tokens = (
+            usage.get("cache_creation_input_tokens") or self.cache_creation_input_tokens
+        )
+        self.cache_read_input_tokens = usage.get("cache_read_input_tokens") or self.cache_read_input_tokens
@@ -0,0 +1,82 @@
+import httpx
+
+from app.config import settings
+
+ANTHROPIC_BASE_URL = settings.anthropic_base_url
+
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=ANTHROPIC_BASE_URL,
+        http2=settings.upstream_http2,
+        limits=httpx.Limits(
+            max_connections=settings.upstream_max_connections,
+            max_keepalive_connections=settings.upstream_max_keepalive_connections,
+            keepalive_expiry=settings.upstream_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.upstream_connect_timeout,
+            read=settings.upstream_read_timeout,
+            write=settings.upstream_write_timeout,
+            pool=settings.upstream_pool_timeout,
+        ),
+    )
+
+
+async def start() -> None:
+    """Create the shared upstream client. Called once from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close() -> None:
+    """Close all pooled upstream connections. Called on app shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared upstream client.
+
+    Every proxied request goes through the same pool so TCP+TLS handshakes to
+    Anthropic are amortized across requests (and multiplexed over HTTP/2).
+    """
+    global _client
+    if _client is None:
+        # Lifespan not run (e.g. scripts/tests) — create lazily.
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    """Snapshot of the upstream connection pool, for sizing the limits."""
+    stats = {
+        "http2": settings.upstream_http2,
+        "max_connections": settings.upstream_max_connections,
+        "max_keepalive_connections": settings.upstream_max_keepalive_connections,
+        "connections_open": 0,
+        "connections_idle": 0,
+        "connections_active": 0,
+        "requests_waiting": 0,
+    }
+    if _client is None:
+        return stats
+
+    # httpx does not expose pool state publicly; read it from httpcore's pool.
+    pool = getattr(_client._transport, "_pool", None)
+    if pool is None:
+        return stats
+
+    connections = list(pool.connections)
+    idle = sum(1 for conn in connections if conn.is_idle())
+    stats["connections_open"] = len(connections)
+    stats["connections_idle"] = idle
+    stats["connections_active"] = len(connections) - idle
+    stats["requests_waiting"] = sum(1 for req in getattr(pool, "_requests", []) if req.is_queued())
+    return stats
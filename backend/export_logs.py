@@ -0,0 +1,101 @@
+"""
+Export a user's raw request logs to CSV, NDJSON or Parquet.
+
+Usage:
+    cd backend
+    python export_logs.py --user finance@acme.com --start 2026-01-01 --end 2026-02-01
+                          [--format csv|ndjson|parquet] [--compression gzip|zstd]
+                          [--key-id UUID] [--model claude-opus-4-6] [--output requests.csv.gz]
+
+Rows are streamed from Postgres through a server-side cursor and written as
+they arrive, oldest first, so memory stays flat however large the range is
+(see app/services/export.py). Without --output the file is named after the
+range and format. Use "--output -" to write to stdout.
+
+Parquet needs pyarrow and zstd needs zstandard (both in requirements.txt).
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def parse_day(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+# ---------------------------------------------------------------------------
+# Main export logic
+# ---------------------------------------------------------------------------
+
+async def export_logs(
+    email: str,
+    start: datetime,
+    end: datetime,
+    format: str,
+    compression: str | None,
+    key_id: uuid.UUID | None,
+    model: str | None,
+    output: str | None,
+):
+    # Import here so the script can be run standalone
+    from sqlalchemy import select
+
+    from app.database import async_session
+    from app.models.user import User
+    from app.services import export
+
+    try:
+        encoder = export.encoder(format, compression)
+    except ValueError as exc:
+        sys.exit(str(exc))
+
+    async with async_session() as db:
+        user_id = (await db.execute(select(User.id).where(User.email == email))).scalar_one_or_none()
+    if user_id is None:
+        sys.exit(f"No user with email {email}")
+
+    query = export.ExportQuery(user_id=user_id, start=start, end=end, api_key_id=key_id, model=model)
+    path = output or export.filename(query, format, compression)
+    to_stdout = path == "-"
+    out = sys.stdout.buffer if to_stdout else open(path, "wb")
+
+    written = 0
+    started = time.monotonic()
+    try:
+        async with async_session() as db:
+            async for chunk in export.export(db, query, encoder):
+                out.write(chunk)
+                written += len(chunk)
+    finally:
+        if not to_stdout:
+            out.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Done. Wrote {written / 1e6:.1f} MB to {path} in {elapsed:.1f}s.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--user", required=True, help="email of the user whose logs to export")
+    parser.add_argument("--start", type=parse_day, required=True)
+    parser.add_argument("--end", type=parse_day, required=True)
+    parser.add_argument("--format", choices=("csv", "ndjson", "parquet"), default="csv")
+    parser.add_argument("--compression", choices=("gzip", "zstd"), default=None)
+    parser.add_argument("--key-id", type=uuid.UUID, default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    if args.start >= args.end:
+        parser.error("--start must be before --end")
+    asyncio.run(export_logs(
+        args.user, args.start, args.end, args.format, args.compression, args.key_id, args.model, args.output,
+    ))
@@ -0,0 +1,146 @@
+"""
+Re-cost historical request logs after a price change.
+
+Usage:
+    cd backend
+    python recompute_costs.py [--start 2026-01-01] [--end 2026-02-01] [--model claude-opus-4-6]
+                              [--window-hours 24] [--dry-run]
+
+Prices come from CUA_PRICING / CUA_PRICING_VERSIONS (see app/services/pricing.py).
+Each row is re-costed with the price version in effect at its created_at.
+
+Work is set-based: for every time window (default one day) and every price
+version overlapping it, a single UPDATE ... FROM (VALUES ...) re-costs all
+rows of the known models and a second UPDATE handles models without a price
+entry (default rates). Rows whose cost does not change are not rewritten.
+The hourly and daily rollups of each window are rebuilt from the re-costed rows in the
+same transaction. One transaction per window keeps locks and WAL bursts
+small, and the script can be interrupted and re-run safely.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def parse_day(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def cost_expression(table, input_rate, output_rate, cache_write_rate, cache_read_rate):
+    """SQL expression for a row's cost in USD from micro-USD-per-MTok rates (exact numeric math)."""
+    from sqlalchemy import Numeric, cast, func
+
+    scaled = (
+        cast(table.c.input_tokens, Numeric) * input_rate
+        + cast(table.c.output_tokens, Numeric) * output_rate
+        + cast(table.c.cache_creation_input_tokens, Numeric) * cache_write_rate
+        + cast(table.c.cache_read_input_tokens, Numeric) * cache_read_rate
+    )
+    return func.round(scaled / 1_000_000_000_000, 6)
+
+
+# ---------------------------------------------------------------------------
+# Main recompute logic
+# ---------------------------------------------------------------------------
+
+async def recompute(start: datetime, end: datetime, model: str | None, window: timedelta, dry_run: bool):
+    # Import here so the script can be run standalone
+    from sqlalchemy import BigInteger, String, column, literal, or_, true, update, values
+
+    from app.database import async_session
+    from app.models.request_log import RequestLog
+    from app.services.log_service import FREE_CACHE_STATUSES
+    from app.services import rollups
+    from app.services.pricing import DEFAULT_RATES, price_book
+
+    logs = RequestLog.__table__
+    total = 0
+
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        window_total = 0
+
+        async with async_session() as db:
+            for period_start, period_end, rates in price_book.periods():
+                lo = max(window_start, period_start)
+                hi = window_end if period_end is None else min(window_end, period_end)
+                if lo >= hi:
+                    continue
+
+                # Cache hits and coalesced requests stay free; their would-be
+                # cost lives in metadata
+                in_range = [
+                    logs.c.created_at >= lo,
+                    logs.c.created_at < hi,
+                    or_(logs.c.cache_status.is_(None), logs.c.cache_status.not_in(FREE_CACHE_STATUSES)),
+                ]
+                if model:
+                    in_range.append(logs.c.model == model)
+
+                # Models with an explicit price, joined against a VALUES list
+                priced = {m: r for m, r in rates.items() if not model or m == model}
+                if priced:
+                    price_rows = values(
+                        column("model", String),
+                        column("input_rate", BigInteger),
+                        column("output_rate", BigInteger),
+                        column("cache_write_rate", BigInteger),
+                        column("cache_read_rate", BigInteger),
+                        name="prices",
+                    ).data([(m, *r) for m, r in priced.items()])
+                    new_cost = cost_expression(
+                        logs, price_rows.c.input_rate, price_rows.c.output_rate,
+                        price_rows.c.cache_write_rate, price_rows.c.cache_read_rate,
+                    )
+                    statement = (
+                        update(logs)
+                        .where(logs.c.model == price_rows.c.model, *in_range)
+                        .where(logs.c.cost_usd.is_distinct_from(new_cost))
+                        .values(cost_usd=new_cost)
+                    )
+                    window_total += (await db.execute(statement)).rowcount
+
+                # Everything else falls back to the default rates
+                if not model or model not in rates:
+                    new_cost = cost_expression(logs, *(literal(rate) for rate in DEFAULT_RATES))
+                    statement = (
+                        update(logs)
+                        .where(*in_range)
+                        .where(logs.c.model.not_in(list(rates)) if rates else true())
+                        .where(logs.c.cost_usd.is_distinct_from(new_cost))
+                        .values(cost_usd=new_cost)
+                    )
+                    window_total += (await db.execute(statement)).rowcount
+
+            if dry_run:
+                await db.rollback()
+            else:
+                if window_total:
+                    await rollups.rebuild(db, window_start, window_end)
+                await db.commit()
+
+        total += window_total
+        print(f"  {window_start:%Y-%m-%d %H:%M} → {window_end:%Y-%m-%d %H:%M}: {window_total} rows re-costed")
+        window_start = window_end
+
+    verb = "Would re-cost" if dry_run else "Re-costed"
+    print(f"\nDone. {verb} {total} request logs.")
+
+
+if __name__ == "__main__":
+    now = datetime.now(timezone.utc)
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--start", type=parse_day, default=now - timedelta(days=90))
+    parser.add_argument("--end", type=parse_day, default=now + timedelta(minutes=1))
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--window-hours", type=float, default=24)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(recompute(args.start, args.end, args.model, timedelta(hours=args.window_hours), args.dry_run))
@@ -0,0 +1,101 @@
+"""
+Re-encrypt stored Anthropic API keys under the current encryption key.
+
+Usage:
+    cd backend
+    CUA_ENCRYPTION_KEY=<new key> \\
+    CUA_PREVIOUS_ENCRYPTION_KEYS='["<old key>"]' \\
+    python rotate_encryption.py [--batch-size 500] [--dry-run]
+
+Rotation procedure:
+    1. Deploy with the new CUA_ENCRYPTION_KEY and the old one listed in
+       CUA_PREVIOUS_ENCRYPTION_KEYS. Both keys decrypt; new values use the new key.
+    2. Run this script. It walks api_keys and upstream_keys in primary-key
+       order, one batch per transaction, and rewrites any value not already
+       under the newest key.
+    3. Once it reports zero remaining rows, drop the old key from
+       CUA_PREVIOUS_ENCRYPTION_KEYS.
+
+The script is idempotent and safe to re-run or interrupt.
+"""
+
+import argparse
+import asyncio
+
+from cryptography.fernet import InvalidToken
+
+
+# ---------------------------------------------------------------------------
+# Main rotation logic
+# ---------------------------------------------------------------------------
+
+async def rotate_table(model, batch_size: int, dry_run: bool) -> tuple[int, int, int]:
+    """Rotate ``model.anthropic_key_encrypted``; returns (rotated, current, unreadable)."""
+    from sqlalchemy import select, update
+
+    from app.database import async_session
+    from app.services.encryption import needs_rotation, rotate_value
+
+    rotated = 0
+    current = 0
+    unreadable = 0
+    last_id = None
+
+    while True:
+        async with async_session() as db:
+            query = select(model.id, model.anthropic_key_encrypted).order_by(model.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(model.id > last_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                if not needs_rotation(row.anthropic_key_encrypted):
+                    current += 1
+                    continue
+                try:
+                    updates.append({
+                        "id": row.id,
+                        "anthropic_key_encrypted": rotate_value(row.anthropic_key_encrypted),
+                    })
+                except InvalidToken:
+                    unreadable += 1
+
+            if updates and not dry_run:
+                # ORM bulk UPDATE by primary key: one executemany per batch
+                await db.execute(update(model), updates)
+                await db.commit()
+            rotated += len(updates)
+
+        print(f"  ...{model.__tablename__}: {rotated} rotated, {current} already current, {unreadable} unreadable")
+
+    return rotated, current, unreadable
+
+
+async def rotate(batch_size: int, dry_run: bool) -> None:
+    # Import here so the script can be run standalone
+    from app.models.api_key import ApiKey
+    from app.models.upstream_key import UpstreamKey
+
+    rotated = current = unreadable = 0
+    for model in (ApiKey, UpstreamKey):
+        counts = await rotate_table(model, batch_size, dry_run)
+        rotated += counts[0]
+        current += counts[1]
+        unreadable += counts[2]
+
+    verb = "Would rotate" if dry_run else "Rotated"
+    print(f"\nDone. {verb} {rotated} keys; {current} already current; {unreadable} unreadable.")
+    if unreadable:
+        print("Unreadable values do not decrypt with any key in the ring and were left untouched.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(rotate(args.batch_size, args.dry_run))
@@ -179,8 +179,18 @@ async def seed():
     from app.database import Base, async_session, engine
 
     print("Connecting to database...")
+    from sqlalchemy import text
+    from app.services import sketch
+    from app.services.partitions import add_months, ensure_default_partition, ensure_partitions, month_floor
+
+    now = datetime.now(timezone.utc)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for statement in sketch.DDL:
+            await conn.execute(text(statement))
+        # request_logs is partitioned by month; cover the 90 days being seeded
+        await ensure_default_partition(conn)
+        await ensure_partitions(conn, now - timedelta(days=91), add_months(month_floor(now), 3))
     print("Schema ready.")
 
     async with async_session() as db:
@@ -318,6 +328,11 @@ async def seed():
 
         await db.commit()
 
+        # Seeded rows bypass the log writer, so derive their rollups in one go
+        from app.services import rollups
+        await rollups.rebuild(db, start_date, now + timedelta(hours=1))
+        await db.commit()
+
         # Summary stats
         print(f"\nDone! Seeded {total_logs} request logs across 6 departments over 90 days.")
         print(f"\nLogin credentials:")
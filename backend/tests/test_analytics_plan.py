@@ -0,0 +1,103 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+from app.services.analytics_service import Span, UsageQuery, _usage_source, plan, straddled_hours
+
+UTC = timezone.utc
+
+
+def _at(*args) -> datetime:
+    return datetime(*args, tzinfo=UTC)
+
+
+def _covers(spans, start, end) -> bool:
+    return spans[0].start == start and spans[-1].end == end and all(
+        a.end == b.start for a, b in zip(spans, spans[1:])
+    )
+
+
+def test_partial_hours_at_edges_are_raw():
+    start, end = _at(2026, 3, 2, 10, 15), _at(2026, 3, 2, 14, 40)
+    assert plan(start, end, daily=True) == [
+        Span("raw", start, _at(2026, 3, 2, 11)),
+        Span("hourly", _at(2026, 3, 2, 11), _at(2026, 3, 2, 14)),
+        Span("raw", _at(2026, 3, 2, 14), end),
+    ]
+
+
+def test_within_one_hour_is_raw():
+    start, end = _at(2026, 3, 2, 10, 15), _at(2026, 3, 2, 10, 45)
+    assert plan(start, end, daily=True) == [Span("raw", start, end)]
+
+
+def test_whole_days_across_month_edge_use_daily():
+    start, end = _at(2026, 1, 30, 22, 30), _at(2026, 2, 2, 3)
+    spans = plan(start, end, daily=True)
+    assert spans == [
+        Span("raw", start, _at(2026, 1, 30, 23)),
+        Span("hourly", _at(2026, 1, 30, 23), _at(2026, 1, 31)),
+        Span("daily", _at(2026, 1, 31), _at(2026, 2, 2)),
+        Span("hourly", _at(2026, 2, 2), _at(2026, 2, 2, 3)),
+    ]
+    assert _covers(spans, start, end)
+
+    hourly = plan(start, end, daily=False)
+    assert [span.source for span in hourly] == ["raw", "hourly"]
+    assert _covers(hourly, start, end)
+
+
+def test_open_end_reads_rollups_up_to_now():
+    start = _at(2025, 12, 31, 22, 10)
+    spans = plan(start, None, daily=True)
+    assert [span.source for span in spans] == ["raw", "hourly", "daily"]
+    assert spans[-1].end is None
+
+
+def test_whole_hour_zones_split_nothing():
+    start, end = _at(2026, 3, 1), _at(2026, 4, 1)
+    for tz in ("UTC", "America/New_York", "Europe/Berlin"):
+        for granularity in ("hour", "day", "week", "month"):
+            assert straddled_hours(start, end, granularity, tz) == []
+
+
+def test_kolkata_days_split_at_half_past_six_utc():
+    start, end = _at(2026, 3, 1), _at(2026, 3, 4)
+    assert straddled_hours(start, end, "day", "Asia/Kolkata") == [
+        _at(2026, 3, 1, 18), _at(2026, 3, 2, 18), _at(2026, 3, 3, 18),
+    ]
+    assert len(straddled_hours(start, end, "hour", "Asia/Kolkata")) == 72
+
+
+def test_adelaide_days_across_dst_change():
+    # Adelaide leaves DST (+10:30 -> +09:30) on the morning of 2026-04-05
+    start, end = _at(2026, 4, 3), _at(2026, 4, 7)
+    assert straddled_hours(start, end, "day", "Australia/Adelaide") == [
+        _at(2026, 4, 3, 13), _at(2026, 4, 4, 13), _at(2026, 4, 5, 14), _at(2026, 4, 6, 14),
+    ]
+
+
+def test_month_and_week_edges():
+    start, end = _at(2026, 1, 1), _at(2026, 4, 1)
+    assert straddled_hours(start, end, "month", "Asia/Kolkata") == [
+        _at(2026, 1, 31, 18), _at(2026, 2, 28, 18), _at(2026, 3, 31, 18),
+    ]
+    # Mondays only
+    weeks = straddled_hours(_at(2026, 3, 1), _at(2026, 3, 16), "week", "Asia/Kolkata")
+    assert weeks == [_at(2026, 3, 1, 18), _at(2026, 3, 8, 18), _at(2026, 3, 15, 18)]
+
+
+def test_hours_past_retention_are_left_out(monkeypatch):
+    monkeypatch.setattr(settings, "log_retention_months", 1)
+    assert straddled_hours(_at(2020, 1, 1), _at(2020, 1, 3), "day", "Asia/Kolkata") == []
+
+
+@pytest.mark.parametrize("tz, split", [("UTC", False), ("Asia/Kolkata", True)])
+def test_usage_source_reads_straddled_hours_raw(tz, split):
+    query = UsageQuery(start=_at(2026, 3, 1), end=_at(2026, 3, 3), tz=tz)
+    sql = str(_usage_source(uuid.uuid4(), query, "day").compile(dialect=postgresql.dialect()))
+    assert ("unnest" in sql) is split
+    assert ("NOT IN" in sql) is split
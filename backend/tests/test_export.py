@@ -0,0 +1,54 @@
+import asyncio
+import gzip
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.services import export
+from app.services.export import FIELDS, CsvEncoder
+
+ROW = (
+    uuid.UUID(int=1), datetime(2026, 1, 1, tzinfo=timezone.utc), uuid.UUID(int=2), "cua-abc", "prod",
+    "claude-sonnet-4-5", "/v1/messages", 200, 10, 20, 0, 0, Decimal("0.000330"), 120, 40, None,
+)
+QUERY = export.ExportQuery(
+    user_id=uuid.UUID(int=3),
+    start=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    end=datetime(2026, 1, 2, tzinfo=timezone.utc),
+)
+
+
+def _export(monkeypatch, encoder) -> bytes:
+    async def stream_rows(db, query):
+        for _ in range(3):
+            yield [ROW, ROW]
+
+    async def collect():
+        return b"".join([chunk async for chunk in export.export(None, QUERY, encoder)])
+
+    monkeypatch.setattr(export, "stream_rows", stream_rows)
+    return asyncio.run(collect())
+
+
+def test_ndjson_gzip(monkeypatch):
+    data = gzip.decompress(_export(monkeypatch, export.encoder("ndjson", "gzip")))
+    lines = [json.loads(line) for line in data.decode().splitlines()]
+    assert len(lines) == 6
+    assert list(lines[0]) == list(FIELDS)
+    assert lines[0]["cost_usd"] == "0.000330"
+
+
+def test_encoding_runs_off_the_event_loop(monkeypatch):
+    threads = set()
+
+    class Recording(CsvEncoder):
+        def encode(self, rows):
+            threads.add(threading.get_ident())
+            return super().encode(rows)
+
+    data = _export(monkeypatch, Recording())
+    assert data.decode().splitlines()[0] == ",".join(FIELDS)
+    assert len(data.decode().splitlines()) == 7
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from app.services.json_scan import TopLevelKeyScanner
+
+DOCUMENT = json.dumps({
+    "messages": [
+        {"role": "user", "content": 'say "model": {"stream": true}, \\ and } ] , :'},
+        {"role": "assistant", "content": [{"type": "text", "text": "x" * 5000}]},
+    ],
+    "metadata": {"model": "nested-does-not-count", "stream": False},
+    "escaped\"key": 1,
+    "model": "claude-opus-4-6",
+    "max_tokens": 1024,
+    "usage": {"input_tokens": 12, "output_tokens": 34, "cache_read_input_tokens": None},
+    "stream": True,
+}).encode()
+
+
+def _scan(data: bytes, size: int, keys=("model", "stream", "usage"), **kwargs) -> TopLevelKeyScanner:
+    scanner = TopLevelKeyScanner(keys, **kwargs)
+    for pos in range(0, len(data), size):
+        scanner.feed(data[pos:pos + size])
+    return scanner
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 64, 4096, len(DOCUMENT)])
+def test_top_level_values_at_any_chunk_boundary(size):
+    scanner = _scan(DOCUMENT, size)
+    assert scanner.values == {
+        "model": "claude-opus-4-6",
+        "stream": True,
+        "usage": {"input_tokens": 12, "output_tokens": 34, "cache_read_input_tokens": None},
+    }
+    assert scanner.done
+
+
+def test_escape_straddling_chunks_in_key():
+    # The backslash of \" inside a key lands at the end of a chunk
+    data = b'{"mo\\"del": "wrong", "model": "right"}'
+    split = data.index(b"\\") + 1
+    scanner = TopLevelKeyScanner(("model", 'mo"del'))
+    scanner.feed(data[:split])
+    scanner.feed(data[split:])
+    assert scanner.values == {"model": "right"}
+
+
+def test_last_value_is_closed_by_brace():
+    scanner = _scan(b'{"a": 1, "model": 42}', 4, keys=("model",))
+    assert scanner.values == {"model": 42}
+
+
+def test_oversized_values_are_dropped():
+    data = json.dumps({"usage": {"blob": "y" * 1000}, "model": "m"}).encode()
+    scanner = _scan(data, 16, keys=("usage", "model"), max_value_bytes=100)
+    assert scanner.values == {"model": "m"}
+
+
+def test_missing_keys_and_non_objects():
+    scanner = _scan(b'{"other": 1}', 3, keys=("model",))
+    assert scanner.values == {} and scanner.done
+
+    scanner = _scan(b'[{"model": "m"}]', 3, keys=("model",))
+    assert scanner.values == {} and scanner.done
+
+
+def test_stops_once_everything_is_found():
+    scanner = TopLevelKeyScanner(("model",))
+    scanner.feed(b'{"model": "m", ')
+    assert scanner.done
+    scanner.feed(b"this is not json at all")
+    assert scanner.values == {"model": "m"}
@@ -0,0 +1,30 @@
+import uuid
+
+import pytest
+
+from app.services import log_service
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    rows = []
+    monkeypatch.setattr(log_service.log_writer, "submit", rows.append)
+    return rows
+
+
+def _log(**fields):
+    log_service.log_request(
+        api_key_id=uuid.uuid4(), input_tokens=1, output_tokens=1, status_code=200, latency_ms=5, **fields,
+    )
+
+
+def test_client_supplied_model_fits_the_column(submitted):
+    _log(model="m" * 500, endpoint="/v1/" + "x" * 500)
+    assert len(submitted[0]["model"]) == 100
+    assert len(submitted[0]["endpoint"]) == 100
+
+
+@pytest.mark.parametrize("model", [None, 42, ["claude-opus-4-6"], {"name": "x"}])
+def test_non_string_model_is_unknown(submitted, model):
+    _log(model=model)
+    assert submitted[0]["model"] == "unknown"
@@ -0,0 +1,123 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.services.log_spool import LogSpool, decode_row, encode_row
+
+
+def _row(n: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "api_key_id": uuid.UUID(int=1),
+        "model": "claude-sonnet-4-5",
+        "input_tokens": n,
+        "output_tokens": 2 * n,
+        "cost_usd": Decimal("0.000123"),
+        "status_code": 200,
+        "latency_ms": 10,
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+    }
+
+
+def _open(directory, segment_bytes=1024, max_bytes=1 << 20) -> LogSpool:
+    spool = LogSpool(str(directory), segment_bytes=segment_bytes, max_bytes=max_bytes, fsync=False)
+    spool.open()
+    return spool
+
+
+def _drain(spool: LogSpool, batch: int = 7) -> list[dict]:
+    rows = []
+    while True:
+        batch_rows, position = spool.read(batch)
+        spool.commit(position)
+        rows.extend(batch_rows)
+        if not batch_rows:
+            return rows
+
+
+def test_row_round_trip():
+    row = _row(3)
+    assert decode_row(encode_row(row)) == row
+
+
+def test_replay_in_order_across_segments(tmp_path):
+    spool = _open(tmp_path)
+    written = [_row(n) for n in range(100)]
+    for start in range(0, 100, 10):
+        assert spool.append(written[start:start + 10]) == 10
+    assert spool.stats()["segments"] > 1
+
+    assert [row["input_tokens"] for row in _drain(spool)] == list(range(100))
+    assert spool.pending_bytes == 0
+    assert spool.stats()["segments"] == 1
+
+
+def test_checkpoint_survives_reopen(tmp_path):
+    spool = _open(tmp_path)
+    spool.append([_row(n) for n in range(30)])
+    rows, position = spool.read(12)
+    spool.commit(position)
+    spool.close()
+
+    spool = _open(tmp_path)
+    assert [row["input_tokens"] for row in _drain(spool)] == list(range(12, 30))
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    spool = _open(tmp_path, segment_bytes=1 << 20)
+    spool.append([_row(n) for n in range(5)])
+    spool.close()
+    segment = next(tmp_path.glob("*.seg"))
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x00\x01\x00\xde\xad")  # header of a record that never got written
+
+    spool = _open(tmp_path, segment_bytes=1 << 20)
+    assert spool.truncated_bytes == 6
+    spool.append([_row(5)])
+    assert [row["input_tokens"] for row in _drain(spool)] == list(range(6))
+
+
+def test_corrupt_frame_skips_rest_of_segment(tmp_path):
+    spool = _open(tmp_path, segment_bytes=1 << 20)
+    spool.append([_row(n) for n in range(3)])
+    first_segment_bytes = spool.total_bytes
+    spool._rotate()
+    spool.append([_row(n) for n in range(3, 6)])
+
+    segment = sorted(tmp_path.glob("*.seg"))[0]
+    data = bytearray(segment.read_bytes())
+    data[first_segment_bytes // 2] ^= 0xFF  # inside the second record's payload
+    segment.write_bytes(bytes(data))
+
+    # The first record survives, the rest of the damaged segment is
+    # skipped, and replay carries on with the next segment
+    assert [row["input_tokens"] for row in _drain(spool, batch=100)] == [0, 3, 4, 5]
+
+
+def test_corrupt_length_does_not_overread(tmp_path):
+    spool = _open(tmp_path, segment_bytes=1 << 20)
+    spool.append([_row(0)])
+    segment = next(tmp_path.glob("*.seg"))
+    data = bytearray(segment.read_bytes())
+    data[0:4] = (1 << 30).to_bytes(4, "big")
+    segment.write_bytes(bytes(data))
+
+    rows, position = spool.read(10)
+    assert rows == []
+    assert position[1] == spool.total_bytes
+
+
+def test_append_over_cap_is_rejected(tmp_path):
+    spool = _open(tmp_path, max_bytes=600)
+    assert spool.append([_row(0)]) == 1
+    assert spool.append([_row(n) for n in range(10)]) == 0
+    assert spool.rows_rejected == 10
+
+
+@pytest.mark.parametrize("batch", [1, 3, 500])
+def test_batch_size_does_not_change_output(tmp_path, batch):
+    spool = _open(tmp_path, segment_bytes=700)
+    spool.append([_row(n) for n in range(40)])
+    assert [row["input_tokens"] for row in _drain(spool, batch)] == list(range(40))
@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import json
+
+import pytest
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+
+from app.services import log_writer as log_writer_module
+from app.services.log_spool import LogSpool
+from app.services.log_writer import LogWriter
+from app.services.metrics import LOG_ROWS_LOST
+
+from tests.test_log_spool import _row
+
+POISON = 13
+
+
+class FakeDatabase:
+    """Stands in for LogWriter._write: refuses any batch holding the poison row."""
+
+    def __init__(self, error=IntegrityError):
+        self.error = error
+        self.stored: list[int] = []
+        self.batches = 0
+
+    async def write(self, db, statement, rows):
+        self.batches += 1
+        if any(row["input_tokens"] == POISON for row in rows):
+            raise self.error("INSERT INTO request_logs", {}, Exception("insert or update violates foreign key"))
+        self.stored.extend(row["input_tokens"] for row in rows)
+        return set()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(log_writer_module, "async_session", contextlib.nullcontext)
+    monkeypatch.setattr(LogWriter, "_write", staticmethod(database.write))
+    return database
+
+
+def _lost(reason: str) -> float:
+    return LOG_ROWS_LOST._series.get((reason,), 0)
+
+
+def _writer(spool=None) -> LogWriter:
+    return LogWriter(max_queue=100, batch_size=50, flush_interval=0.01, spool=spool, retry_interval=0.01)
+
+
+async def _run(writer: LogWriter, rows: list[dict]) -> None:
+    await writer.start()
+    for row in rows:
+        assert writer.submit(row)
+    await writer.stop()
+
+
+def test_poison_row_is_quarantined_and_spool_drains(tmp_path, database):
+    spool = LogSpool(str(tmp_path), segment_bytes=1 << 20, max_bytes=1 << 20, fsync=False)
+    writer = _writer(spool)
+    lost = _lost("rejected_by_db")
+
+    asyncio.run(_run(writer, [_row(n) for n in range(30)]))
+
+    assert database.stored == [n for n in range(30) if n != POISON]
+    assert spool.pending_bytes == 0
+    assert writer.rows_quarantined == spool.rows_quarantined == 1
+    assert _lost("rejected_by_db") == lost + 1
+    quarantined = (tmp_path / "quarantine.ndjson").read_text().splitlines()
+    assert [json.loads(line)["input_tokens"] for line in quarantined] == [POISON]
+
+
+def test_connection_errors_keep_rows_spooled(tmp_path, database):
+    database.error = OperationalError
+    spool = LogSpool(str(tmp_path), segment_bytes=1 << 20, max_bytes=1 << 20, fsync=False)
+    writer = _writer(spool)
+
+    asyncio.run(_run(writer, [_row(n) for n in range(20)]))
+
+    # Nothing is given up: the whole batch waits in the spool for the next start
+    assert spool.rows_quarantined == 0
+    assert spool.pending_bytes > 0
+    assert writer.db_failures >= 1
+
+
+def test_without_spool_only_the_bad_row_is_lost(database):
+    database.error = DataError
+    writer = _writer()
+    lost = _lost("rejected_by_db")
+
+    asyncio.run(_run(writer, [_row(n) for n in range(30)]))
+
+    assert database.stored == [n for n in range(30) if n != POISON]
+    assert writer.rows_failed == 1
+    assert _lost("rejected_by_db") == lost + 1
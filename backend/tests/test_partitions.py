@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.services import partitions
+
+MARCH = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+class FakeConnection:
+    """Records SQL; answers the few queries partitions.py makes from canned state."""
+
+    def __init__(self, names, default_rows=()):
+        self.names = list(names)
+        self.default_rows = list(default_rows)  # created_at of rows in the default partition
+        self.sql: list[str] = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.sql.append(sql)
+        if "FROM pg_inherits" in sql:
+            return SimpleNamespace(scalars=lambda: list(self.names))
+        if "SELECT DISTINCT date_trunc" in sql:
+            months = sorted({partitions.month_floor(row) for row in self.default_rows})
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: months))
+        if sql.startswith("WITH moved AS"):
+            self.default_rows = [row for row in self.default_rows if not params["lower"] <= row < params["upper"]]
+        elif sql.startswith("DELETE FROM"):
+            self.default_rows = [row for row in self.default_rows if row >= params["cutoff"]]
+        elif sql.startswith("CREATE TABLE") and not sql.endswith(" DEFAULT"):
+            self.names.append(sql.split('"')[1])
+        return SimpleNamespace()
+
+    async def scalar(self, statement, params=None):
+        sql = str(statement)
+        self.sql.append(sql)
+        if "count(*)" in sql:
+            return len(self.default_rows)
+        return any(params["lower"] <= row < params["upper"] for row in self.default_rows)
+
+
+def test_missing_month_is_created_in_place():
+    conn = FakeConnection([partitions.DEFAULT_PARTITION])
+    created = asyncio.run(partitions.ensure_partitions(conn, MARCH, MARCH))
+    assert created == ["request_logs_p2026_03"]
+    assert any("PARTITION OF request_logs FOR VALUES FROM ('2026-03-01" in sql for sql in conn.sql)
+    assert not any("ATTACH" in sql for sql in conn.sql)
+
+
+def test_rows_in_default_partition_are_moved_and_attached():
+    stray = [datetime(2026, 3, 5, tzinfo=timezone.utc), datetime(2026, 3, 30, tzinfo=timezone.utc)]
+    conn = FakeConnection([partitions.DEFAULT_PARTITION], stray)
+    asyncio.run(partitions.ensure_partitions(conn, MARCH, MARCH))
+
+    creates = [sql for sql in conn.sql if sql.startswith("CREATE TABLE")]
+    assert creates == [
+        'CREATE TABLE "request_logs_p2026_03" (LIKE request_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    ]
+    assert any(sql.startswith('ALTER TABLE request_logs ATTACH PARTITION "request_logs_p2026_03"') for sql in conn.sql)
+    assert conn.default_rows == []
+
+
+def test_rehome_deletes_rows_past_retention():
+    stray = [datetime(2025, 1, 2, tzinfo=timezone.utc), datetime(2026, 3, 2, tzinfo=timezone.utc)]
+    conn = FakeConnection([partitions.DEFAULT_PARTITION], stray)
+    found = asyncio.run(partitions._rehome_default_rows(conn, cutoff=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    assert found == 2
+    assert conn.default_rows == []
+    assert "request_logs_p2026_03" in conn.names
+    assert "request_logs_p2025_01" not in conn.names
+
+
+def test_no_default_partition_no_rehome():
+    conn = FakeConnection(["request_logs_p2026_03"])
+    assert asyncio.run(partitions._rehome_default_rows(conn, None)) == 0
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+
+from app.services import pricing
+from app.services.pricing import DEFAULT_RATES, ModelRates, PriceBook, calculate_cost
+from recompute_costs import cost_expression
+
+BASE = {"m": {"input": 3.0, "output": 15.0}, "other": {"input": 1.0, "output": 5.0}}
+JUNE = datetime(2026, 6, 1, tzinfo=timezone.utc)
+FUTURE = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def book() -> PriceBook:
+    return PriceBook(BASE, [
+        {"effective_from": "2030-01-01T00:00:00Z", "pricing": {"m": {"input": 30.0, "output": 150.0}}},
+        {"effective_from": "2026-06-01T00:00:00Z", "pricing": {"m": {"input": 2.0, "output": 10.0}}},
+    ])
+
+
+def test_versions_apply_from_their_effective_instant(book):
+    assert book.rates_for("m", datetime(2026, 5, 31, 23, 59, tzinfo=timezone.utc)).input == 3_000_000
+    assert book.rates_for("m", JUNE).input == 2_000_000
+    assert book.rates_for("m", FUTURE).input == 30_000_000
+    # Unlisted models keep their previous price
+    assert book.rates_for("other", FUTURE) == book.rates_for("other", JUNE)
+    assert [start for start, _, _ in book.periods()] == [pricing._EPOCH, JUNE, FUTURE]
+
+
+def test_future_versions_are_not_charged_yet(book):
+    assert book.rates_for("m") == book.rates_for("m", datetime.now(timezone.utc))
+    assert book.rates_for("m").input != 30_000_000
+
+
+def test_naive_effective_from_is_utc():
+    book = PriceBook(BASE, [{"effective_from": "2026-06-01", "pricing": {"m": {"input": 2.0, "output": 10.0}}}])
+    assert book.tables[1].effective_from == JUNE
+
+
+def test_unknown_model_uses_default_rates(book):
+    assert book.rates_for("no-such-model", JUNE) == DEFAULT_RATES
+
+
+def test_cache_prices_default_to_multipliers():
+    rates = ModelRates.from_prices({"input": 3.0, "output": 15.0})
+    assert (rates.cache_write, rates.cache_read) == (3_750_000, 300_000)
+    rates = ModelRates.from_prices({"input": 3.0, "output": 15.0, "cache_write": 4.0, "cache_read": 0.5})
+    assert (rates.cache_write, rates.cache_read) == (4_000_000, 500_000)
+
+
+def test_cost_is_rounded_half_up_once():
+    rates = ModelRates.from_prices({"input": 0.5, "output": 0.5})
+    assert rates.cost_micros(1, 0) == 1  # 0.5 micro-USD
+    assert rates.cost_micros(1, 1) == 1  # 1.0, not 0.5 + 0.5 rounded separately
+    assert rates.cost_micros(0, 0) == 0
+    assert ModelRates.from_prices({"input": 0.1, "output": 0.1}).cost_micros(4, 0) == 0
+
+
+def test_calculate_cost_in_usd(monkeypatch, book):
+    monkeypatch.setattr(pricing, "price_book", book)
+    cost = calculate_cost("m", 1_000_000, 1_000_000, 1_000_000, 1_000_000, at=JUNE)
+    assert cost == Decimal("2") + Decimal("10") + Decimal("2.5") + Decimal("0.2")
+    assert calculate_cost("m", 1234, 567) == calculate_cost("m", 1234, 567, at=datetime.now(timezone.utc))
+
+
+@pytest.mark.parametrize("tokens", [(1234, 567, 0, 0), (1, 1, 1, 1), (250_000, 4_000, 10_000, 90_000)])
+def test_recompute_matches_calculate_cost(tokens):
+    logs = Table(
+        "logs", MetaData(),
+        *(Column(name, Integer) for name in (
+            "input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens",
+        )),
+    )
+    rates = DEFAULT_RATES
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        logs.create(conn)
+        conn.execute(logs.insert().values(dict(zip(logs.c.keys(), tokens))))
+        sql_cost = conn.execute(select(cost_expression(logs, *rates))).scalar_one()
+    assert Decimal(str(sql_cost)) == Decimal(rates.cost_micros(*tokens)).scaleb(-6)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.routers import proxy
+from app.services.resilience import RetryTrace
+
+UPSTREAM_KEY_ID = uuid.UUID(int=7)
+WAITERS = 4
+
+
+class FakeLease:
+    credential = SimpleNamespace(id=UPSTREAM_KEY_ID)
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    recorded = SimpleNamespace(rows=[], released=[], calls=0)
+
+    async def fetch_buffered(body, forward_headers, credentials, labels):
+        recorded.calls += 1
+        trace = RetryTrace(retries=2, retry_statuses=[529, 529], attempts=3, lease=FakeLease())
+        trace.started = time.monotonic()
+        await asyncio.sleep(0.05)
+        trace.headers_at = time.monotonic()
+        trace.upstream_seconds = 0.05
+        return proxy._BufferedResponse(
+            status_code=200,
+            headers={"content-type": "application/json"},
+            body=b'{"model": "claude-sonnet-4-5"}',
+            model="claude-sonnet-4-5",
+            usage={"input_tokens": 100, "output_tokens": 50},
+            trace=trace,
+        )
+
+    monkeypatch.setattr(proxy, "_fetch_buffered", fetch_buffered)
+    monkeypatch.setattr(proxy, "log_request", lambda **row: recorded.rows.append(row))
+    monkeypatch.setattr(proxy.rate_limiter, "release", lambda key_id, tokens=0: recorded.released.append(tokens))
+    return recorded
+
+
+def test_leader_and_waiters(recorded):
+    api_key = SimpleNamespace(id=uuid.uuid4(), key_prefix="cua-test")
+
+    async def run():
+        start = time.monotonic()
+        return await asyncio.gather(*(
+            proxy._handle_coalesced(api_key, b"{}", {}, (), "claude-sonnet-4-5", start, "flight", None)
+            for _ in range(WAITERS + 1)
+        ))
+
+    responses = asyncio.run(run())
+
+    assert recorded.calls == 1
+    assert all(response.body == b'{"model": "claude-sonnet-4-5"}' for response in responses)
+
+    leader, *followers = recorded.rows
+    assert leader["cache_status"] is None
+    assert leader["upstream_key_id"] == UPSTREAM_KEY_ID
+    assert leader["upstream_ttfb_ms"] is not None
+    assert leader["metadata"]["upstream_retries"] == 2
+
+    assert len(followers) == WAITERS
+    for row in followers:
+        assert row["cache_status"] == "coalesced"
+        assert row["upstream_key_id"] is None
+        assert row["metadata"] is None
+        assert "upstream_ttfb_ms" not in row
+        assert row["input_tokens"] == 100  # usage is still reported, at no cost
+        assert row["latency_ms"] >= 40
+
+    # Only the leader's tokens count against the tokens/min budget
+    assert recorded.released == [150] + [0] * WAITERS
@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.response_cache import CachedResponse, ResponseCache
+
+
+def _cache(tmp_path, disk_max_bytes=1 << 20) -> ResponseCache:
+    return ResponseCache(
+        max_bytes=1 << 20, max_entry_bytes=1 << 16, ttl_seconds=60,
+        disk_dir=str(tmp_path), disk_max_bytes=disk_max_bytes,
+    )
+
+
+def _entry(size: int) -> CachedResponse:
+    return CachedResponse(b"x" * size, "application/json", "claude-sonnet-4-5", {"input_tokens": 1})
+
+
+def _bytes_on_disk(tmp_path) -> int:
+    return sum(os.path.getsize(path) for path in tmp_path.rglob("*") if path.is_file())
+
+
+def test_concurrent_writes_keep_byte_count(tmp_path):
+    cache = _cache(tmp_path, disk_max_bytes=20_000)
+    expires_at = time.time() + 60
+
+    def write(n):
+        # A few keys written over and over, with varying sizes, past the budget
+        cache._disk_write(f"{n % 40:064x}", _entry(100 + n % 700), expires_at)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(write, range(2000)))
+
+    assert cache._disk_bytes == _bytes_on_disk(tmp_path)
+    assert cache._disk_bytes <= 20_000
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_expired_entry_is_removed(tmp_path):
+    cache = _cache(tmp_path)
+    key = "ab" * 32
+    cache._disk_write(key, _entry(10), time.time() - 1)
+    assert cache._disk_read(key) is None
+    assert cache._disk_bytes == _bytes_on_disk(tmp_path) == 0
+
+
+def test_malformed_header_is_a_miss(tmp_path):
+    cache = _cache(tmp_path)
+    for key, header in (("aa" * 32, b'{"model": "m"}'), ("bb" * 32, b"[1, 2]"), ("cc" * 32, b"not json")):
+        path = tmp_path / key[:2] / key
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(header + b"\nbody")
+        assert cache._disk_read(key) is None
+
+    key = "dd" * 32
+    cache._disk_write(key, _entry(10), time.time() + 60)
+    entry, _ = cache._disk_read(key)
+    assert entry == _entry(10)
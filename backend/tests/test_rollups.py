@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import rollups, sketch
+from app.services.analytics_service import UsageQuery, get_performance
+
+KEY = uuid.UUID(int=1)
+
+
+def _row(minute: int, **fields) -> SimpleNamespace:
+    row = {
+        "created_at": datetime(2026, 3, 1, 10, minute, tzinfo=timezone.utc),
+        "api_key_id": KEY,
+        "model": "claude-sonnet-4-5",
+        "input_tokens": 10,
+        "output_tokens": 20,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "cost_usd": Decimal("0.001"),
+        "latency_ms": 500,
+        "cache_status": None,
+        "status_code": 200,
+        "endpoint": "/v1/messages",
+        "ttft_ms": None,
+        "upstream_ttfb_ms": 300,
+        "proxy_overhead_ms": 0.4,
+        "stream_duration_ms": None,
+        "output_tokens_per_sec": None,
+    }
+    row.update(fields)
+    assert set(row) == {column.key for column in rollups.SOURCE_COLUMNS}
+    return SimpleNamespace(**row)
+
+
+def test_aggregate_sums_and_sketches():
+    rows = [
+        _row(1),
+        _row(2, ttft_ms=200, stream_duration_ms=1000, output_tokens_per_sec=40.0),
+        _row(3, ttft_ms=250, stream_duration_ms=3000, output_tokens_per_sec=20.0),
+        _row(4, cache_status="hit", upstream_ttfb_ms=None, proxy_overhead_ms=2.5),
+    ]
+    (delta,) = rollups.aggregate(rows)
+
+    assert delta["bucket"] == datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+    assert delta["request_count"] == 4
+    assert delta["cache_hits"] == 1
+    assert (delta["stream_duration_ms_sum"], delta["stream_duration_count"]) == (4000, 2)
+    assert (delta["output_tokens_per_sec_sum"], delta["output_tokens_per_sec_count"]) == (60.0, 2)
+
+    assert sum(delta["latency_sketch"].values()) == 4
+    assert sum(delta["ttft_sketch"].values()) == 2
+    assert delta["ttfb_sketch"] == {str(sketch.bin_index(300)): 3}
+    # Overhead is sketched in microseconds, so sub-millisecond values keep their resolution
+    assert delta["overhead_sketch"] == {str(sketch.bin_index(400)): 3, str(sketch.bin_index(2500)): 1}
+
+
+def test_aggregate_groups_by_dimensions():
+    deltas = rollups.aggregate([_row(1), _row(2, status_code=529), _row(3, model="claude-opus-4-6")])
+    assert sorted((delta["model"], delta["status_code"]) for delta in deltas) == [
+        ("claude-opus-4-6", 200), ("claude-sonnet-4-5", 200), ("claude-sonnet-4-5", 529),
+    ]
+    daily = rollups.aggregate([_row(1), _row(59)], rollups.day_floor)
+    assert daily[0]["bucket"] == datetime(2026, 3, 1, tzinfo=timezone.utc)
+    assert daily[0]["request_count"] == 2
+
+
+def test_performance_is_served_from_rollups():
+    totals = [SimpleNamespace(
+        group="claude-sonnet-4-5", requests=10, stream_duration_ms_sum=4000, stream_duration_count=2,
+        output_tokens_per_sec_sum=60.0, output_tokens_per_sec_count=2,
+    )]
+    bins = [
+        SimpleNamespace(group="claude-sonnet-4-5", metric="upstream_ttfb_ms", bin=sketch.bin_index(300), n=10),
+        SimpleNamespace(group="claude-sonnet-4-5", metric="proxy_overhead_us", bin=sketch.bin_index(400), n=10),
+    ]
+
+    class FakeSession:
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, statement):
+            self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+            rows = totals if len(self.statements) == 1 else bins
+            return SimpleNamespace(all=lambda: rows)
+
+    db = FakeSession()
+    query = UsageQuery(
+        start=datetime(2026, 1, 1, 7, 30, tzinfo=timezone.utc), end=datetime(2026, 3, 1, tzinfo=timezone.utc),
+    )
+    (row,) = asyncio.run(get_performance(db, uuid.uuid4(), query))
+
+    assert not any("percentile_cont" in sql for sql in db.statements)
+    assert all("request_rollups_daily" in sql for sql in db.statements)
+    assert row["requests"] == 10
+    assert row["avg_stream_duration_ms"] == 2000.0
+    assert row["avg_output_tokens_per_sec"] == 30.0
+    assert abs(row["upstream_ttfb_ms"]["p50"] - 300) <= 300 * sketch.RELATIVE_ACCURACY
+    assert abs(row["proxy_overhead_ms"]["p99"] - 0.4) <= 0.4 * sketch.RELATIVE_ACCURACY + 0.05
+    assert row["ttft_ms"] == {"p50": None, "p95": None}
@@ -0,0 +1,64 @@
+import math
+import random
+
+import pytest
+
+from app.services.sketch import MAX_INDEX, MAX_VALUE_MS, RELATIVE_ACCURACY, bin_index, bin_value, build, quantiles
+
+FRACTIONS = (0.5, 0.9, 0.95, 0.99)
+
+
+def _exact(values: list[float], fraction: float) -> float:
+    # Same rank convention as quantiles()
+    ordered = sorted(values)
+    return ordered[math.ceil(fraction * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("value", [1, 1.5, 7, 99.9, 100, 250, 1234.5, 60_000, MAX_VALUE_MS])
+def test_bin_value_within_relative_accuracy(value):
+    representative = bin_value(bin_index(value))
+    assert abs(representative - value) <= RELATIVE_ACCURACY * value * (1 + 1e-9)
+
+
+def test_values_are_clamped():
+    assert bin_index(0) == bin_index(-5) == bin_index(1) == 0
+    assert bin_index(MAX_VALUE_MS * 10) == MAX_INDEX
+    assert MAX_INDEX < 500
+
+
+def test_empty_sketch():
+    assert build([]) == {}
+    assert build([None, None]) == {}
+    assert quantiles([], FRACTIONS) == {fraction: None for fraction in FRACTIONS}
+
+
+def test_build_skips_nulls():
+    assert build([10, None, 10, 500]) == {str(bin_index(10)): 2, str(bin_index(500)): 1}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_quantiles_within_error_bound(seed):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(5, 1.2) for _ in range(5000)]
+    bins = [(int(index), count) for index, count in build(values).items()]
+    estimates = quantiles(bins, FRACTIONS)
+    for fraction in FRACTIONS:
+        exact = _exact(values, fraction)
+        assert abs(estimates[fraction] - exact) <= RELATIVE_ACCURACY * exact * (1 + 1e-9)
+
+
+def test_repeated_indexes_merge_like_one_sketch():
+    rng = random.Random(7)
+    values = [rng.uniform(1, 2000) for _ in range(3000)]
+    parts = [build(values[i:i + 500]) for i in range(0, len(values), 500)]
+    unmerged = [(index, count) for part in parts for index, count in part.items()]
+    merged = [(int(index), count) for index, count in build(values).items()]
+    assert len(unmerged) > len(merged)
+    assert quantiles(unmerged, FRACTIONS) == quantiles(merged, FRACTIONS)
+
+
+def test_single_bin():
+    assert quantiles([(bin_index(42), 3)], (0.0, 1.0)) == {
+        0.0: bin_value(bin_index(42)),
+        1.0: bin_value(bin_index(42)),
+    }
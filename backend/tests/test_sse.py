@@ -0,0 +1,60 @@
+import json
+
+from app.services import sse
+from app.services.sse import SSEUsageSniffer
+
+
+def _event(name: str, data: dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+STREAM = b"".join([
+    _event("message_start", {
+        "type": "message_start",
+        "message": {"model": "claude-sonnet-4-5", "usage": {"input_tokens": 12, "cache_read_input_tokens": 3}},
+    }),
+    _event("content_block_start", {"type": "content_block_start", "index": 0}),
+    _event("content_block_delta", {"type": "content_block_delta", "delta": {"text": "Hi"}}),
+    _event("content_block_delta", {"type": "content_block_delta", "delta": {"text": "!"}}),
+    _event("ping", {"type": "ping"}),
+    _event("content_block_stop", {"type": "content_block_stop", "index": 0}),
+    _event("message_delta", {"type": "message_delta", "usage": {"output_tokens": 7}}),
+    _event("message_stop", {"type": "message_stop"}),
+])
+
+
+def _assert_usage(sniffer: SSEUsageSniffer) -> None:
+    assert sniffer.model == "claude-sonnet-4-5"
+    assert sniffer.input_tokens == 12
+    assert sniffer.output_tokens == 7
+    assert sniffer.cache_read_input_tokens == 3
+    assert sniffer.first_token_at is not None
+
+
+def test_usage_from_single_chunk():
+    sniffer = SSEUsageSniffer("requested-model")
+    sniffer.feed(STREAM)
+    _assert_usage(sniffer)
+
+
+def test_usage_with_every_chunk_boundary():
+    for size in (1, 2, 3, 7, 64):
+        sniffer = SSEUsageSniffer("requested-model")
+        for pos in range(0, len(STREAM), size):
+            sniffer.feed(STREAM[pos:pos + size])
+        _assert_usage(sniffer)
+
+
+def test_only_usage_events_are_decoded(monkeypatch):
+    decoded = []
+    real_loads = json.loads
+
+    def spy(data, *args, **kwargs):
+        decoded.append(data)
+        return real_loads(data, *args, **kwargs)
+
+    monkeypatch.setattr(sse.json, "loads", spy)
+    sniffer = SSEUsageSniffer("requested-model")
+    sniffer.feed(STREAM)
+    assert len(decoded) == 2
+    _assert_usage(sniffer)
@@ -76,6 +76,22 @@ export const getByKey = (period = '30d') =>
     `/analytics/by-key?period=${period}`
   );
 
+export const getDashboard = (period = '30d', granularity = 'day') =>
+  request<{
+    summary: {
+      total_requests: number;
+      total_input_tokens: number;
+      total_output_tokens: number;
+      total_cost: number;
+      avg_latency_ms: number;
+      cache_hits: number;
+      period: string;
+    };
+    cost_over_time: Array<{ date: string; requests: number; cost: number; input_tokens: number; output_tokens: number }>;
+    by_model: Array<{ model: string; requests: number; cost: number; input_tokens: number; output_tokens: number }>;
+    by_key: Array<{ key_prefix: string; label: string | null; requests: number; cost: number }>;
+  }>(`/analytics/dashboard?period=${period}&granularity=${granularity}`);
+
 export const getRequestLogs = (page = 1, limit = 50) =>
   request<{
     total: number;
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { getSummary, getCostOverTime, getByModel, getByKey } from '../lib/api';
+import { getDashboard } from '../lib/api';
 import CostCard from '../components/CostCard';
 import RequestsChart from '../components/RequestsChart';
 import ModelBreakdown from '../components/ModelBreakdown';
@@ -93,17 +93,12 @@ export default function DashboardPage() {
 
   useEffect(() => {
     setLoading(true);
-    Promise.all([
-      getSummary(period),
-      getCostOverTime(period),
-      getByModel(period),
-      getByKey(period),
-    ])
-      .then(([s, c, m, k]) => {
-        setSummary(s);
-        setCostData(c);
-        setModelData(m);
-        setKeyData(k);
+    getDashboard(period)
+      .then((d) => {
+        setSummary(d.summary);
+        setCostData(d.cost_over_time);
+        setModelData(d.by_model);
+        setKeyData(d.by_key);
       })
       .catch(console.error)
       .finally(() => setLoading(false));
@@ -118,7 +113,7 @@ export default function DashboardPage() {
         <h1 className="text-[22px] font-bold tracking-tight">Dashboard</h1>
         <div className="flex items-center gap-3">
           <div className="flex rounded-lg overflow-hidden" style={{ background: 'rgba(255,255,255,0.05)', border: '1px solid rgba(255,255,255,0.07)' }}>
-            {['7d', '30d', '90d'].map((p) => (
+            {['7d', '30d', '90d', '1y'].map((p) => (
               <button
                 key={p}
                 onClick={() => setPeriod(p)}